@@ -0,0 +1,94 @@
+import time
+from contextlib import ExitStack, contextmanager
+from unittest import mock
+
+import numpy as np
+
+from dss.database import VILLAGE_ATTRIBUTES, village_record_type
+
+
+class FakeDatabase:
+    """
+    In-memory stand-in for the dss.database fetch functions, so DSS code paths can be
+    benchmarked without PostgreSQL. Latency per call can be added to model round trips.
+    """
+
+    def __init__(self, villages, rules, schemes=None, scheme_embeddings=None, latency=0.0):
+        self.villages = {row["village_id"]: row for row in villages}
+        self.rules = rules
+        self.schemes = schemes or []
+        self.scheme_embeddings = scheme_embeddings
+        self.latency = latency
+        self.calls = 0
+
+    def _round_trip(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def fetch_village_dss_data(self, village_id=None, patta_holder_id=None):
+        self._round_trip()
+        return self.villages.get(village_id)
+
+    def fetch_village_record(self, village_id, columns=VILLAGE_ATTRIBUTES):
+        self._round_trip()
+        row = self.villages.get(village_id)
+        if row is None:
+            return None
+        return village_record_type(tuple(columns))._make(row.get(column) for column in columns)
+
+    def fetch_eligibility_rules(self):
+        self._round_trip()
+        return list(self.rules)
+
+    def find_similar_schemes(self, query_embedding, limit=5):
+        """Cosine-distance ranking like pgvector's `ORDER BY description_embedding <=> q LIMIT n`."""
+        self._round_trip()
+        if self.scheme_embeddings is None or not len(self.schemes):
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        scores = self.scheme_embeddings @ (query / np.linalg.norm(query))
+        top = np.argpartition(-scores, min(limit, len(scores) - 1))[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [self.schemes[i] for i in top]
+
+    @contextmanager
+    def patched(self):
+        """Replaces the database functions in every module that imported them."""
+        targets = {
+            "dss.dss_engine.fetch_eligibility_rules": self.fetch_eligibility_rules,
+            "dss.dss_engine.fetch_village_record": self.fetch_village_record,
+            "dss.mcp_protocol.fetch_village_record": self.fetch_village_record,
+            "dss.mcp_protocol.fetch_eligibility_rules": self.fetch_eligibility_rules,
+            "dss.mcp_protocol.find_similar_schemes": self.find_similar_schemes,
+        }
+        with ExitStack() as stack:
+            for target, replacement in targets.items():
+                stack.enter_context(mock.patch(target, replacement))
+            yield self
+
+
+class FakeModelServices:
+    """Deterministic LLM and embedding stand-ins for MCPProtocol with configurable latency."""
+
+    def __init__(self, llm_latency=0.0, embedding_latency=0.0, dim=1536, seed=0):
+        self.llm_latency = llm_latency
+        self.embedding_latency = embedding_latency
+        self.rng = np.random.default_rng(seed)
+        self.dim = dim
+
+    def generate_embedding(self, text):
+        if self.embedding_latency:
+            time.sleep(self.embedding_latency)
+        return self.rng.standard_normal(self.dim).astype(np.float32)
+
+    def llm_response(self, prompt):
+        if self.llm_latency:
+            time.sleep(self.llm_latency)
+        return f"Synthetic response to a prompt of {len(prompt)} characters."
+
+    @contextmanager
+    def patched(self, protocol):
+        with mock.patch.object(protocol, "_generate_embedding", self.generate_embedding), \
+                mock.patch.object(protocol, "_get_llm_response", self.llm_response):
+            yield self
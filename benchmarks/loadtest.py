@@ -0,0 +1,220 @@
+import argparse
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+# Closed-loop load test for POST /api/dss/recommendations.
+#
+#   python -m benchmarks.loadtest --url http://localhost:5000 --concurrency 32 --duration 60 \
+#       --mix village=0.6,patta_holder=0.2,query=0.2 --start-mocks --llm-latency 0.8
+#
+# With --start-mocks the mock model servers are started in-process; the API must have been
+# started with LLM_API_URL / EMBEDDING_API_URL pointing at them (see mock_model_servers.py).
+# Per-stage latencies come from the endpoint's Server-Timing header.
+
+QUERIES = [
+    "What schemes are available for farmers?",
+    "I am interested in schemes related to water conservation and irrigation.",
+    "Support for building a house in a tribal village",
+    "Employment guarantee schemes near me",
+    "Drinking water tap connection for my household",
+]
+
+
+def parse_mix(text):
+    """'village=0.6,patta_holder=0.2,query=0.2' -> normalised {kind: weight}."""
+    mix = {}
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        if kind.strip() not in ("village", "patta_holder", "query"):
+            raise argparse.ArgumentTypeError(f"Unknown request kind '{kind}'")
+        mix[kind.strip()] = float(weight or 1)
+    total = sum(mix.values())
+    return {kind: weight / total for kind, weight in mix.items()}
+
+
+def parse_id_range(text):
+    start, _, end = text.partition("-")
+    return int(start), int(end or start)
+
+
+def parse_server_timing(header):
+    """'llm;dur=812.3, total;dur=840.1' -> {'llm': 0.8123, 'total': 0.8401} in seconds."""
+    stages = {}
+    for entry in (header or "").split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip() == "dur":
+                try:
+                    stages[name] = float(value) / 1000
+                except ValueError:
+                    pass
+    return stages
+
+
+def build_request(kind, rng, village_ids, patta_holder_ids, query_rate):
+    """Body for one request of the given kind; location requests carry a query with probability query_rate."""
+    if kind == "village":
+        body = {"type": "village", "id": rng.randint(*village_ids)}
+    elif kind == "patta_holder":
+        body = {"type": "patta_holder", "id": rng.randint(*patta_holder_ids)}
+    else:
+        return {"query": rng.choice(QUERIES)}
+    if rng.random() < query_rate:
+        body["query"] = rng.choice(QUERIES)
+    return body
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = []  # (kind, status, client_seconds, {stage: seconds})
+
+    def add(self, kind, status, seconds, stages):
+        with self.lock:
+            self.samples.append((kind, status, seconds, stages))
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def summarize(values):
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "p50_ms": percentile(values, 50) * 1000 if values else None,
+        "p95_ms": percentile(values, 95) * 1000 if values else None,
+        "p99_ms": percentile(values, 99) * 1000 if values else None,
+        "max_ms": values[-1] * 1000 if values else None,
+    }
+
+
+def worker(url, mix, deadline, recorder, seed, args):
+    rng = random.Random(seed)
+    kinds, weights = zip(*mix.items())
+    session = requests.Session()
+    while time.perf_counter() < deadline:
+        kind = rng.choices(kinds, weights)[0]
+        body = build_request(kind, rng, args.village_ids, args.patta_holder_ids, args.query_rate)
+        start = time.perf_counter()
+        try:
+            response = session.post(url, json=body, timeout=args.timeout)
+            status = response.status_code
+            stages = parse_server_timing(response.headers.get("Server-Timing"))
+        except requests.RequestException:
+            status, stages = "error", {}
+        recorder.add(kind, status, time.perf_counter() - start, stages)
+        if args.think_time:
+            time.sleep(rng.expovariate(1 / args.think_time))
+
+
+def run_load_test(args):
+    url = args.url.rstrip("/") + "/api/dss/recommendations"
+    recorder = Recorder()
+    if args.warmup:
+        warm_deadline = time.perf_counter() + args.warmup
+        warm = [threading.Thread(target=worker, args=(url, args.mix, warm_deadline, Recorder(), -i - 1, args))
+                for i in range(args.concurrency)]
+        for t in warm:
+            t.start()
+        for t in warm:
+            t.join()
+
+    start = time.perf_counter()
+    deadline = start + args.duration
+    threads = [threading.Thread(target=worker, args=(url, args.mix, deadline, recorder, args.seed + i, args))
+               for i in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    samples = recorder.samples
+    ok = [s for s in samples if s[1] == 200]
+    by_stage = defaultdict(list)
+    by_kind = defaultdict(list)
+    for kind, _, seconds, stages in ok:
+        by_kind[kind].append(seconds)
+        by_stage["client"].append(seconds)
+        for stage, value in stages.items():
+            by_stage[stage].append(value)
+    statuses = defaultdict(int)
+    for sample in samples:
+        statuses[str(sample[1])] += 1
+
+    return {
+        "config": {
+            "url": url, "concurrency": args.concurrency, "duration_s": args.duration,
+            "mix": args.mix, "query_rate": args.query_rate, "think_time_s": args.think_time,
+        },
+        "requests": len(samples),
+        "throughput_rps": len(ok) / elapsed,
+        "error_rate": 1 - len(ok) / len(samples) if samples else None,
+        "status_counts": dict(statuses),
+        "latency_by_stage": {stage: summarize(values) for stage, values in by_stage.items()},
+        "latency_by_kind": {kind: summarize(values) for kind, values in by_kind.items()},
+    }
+
+
+def print_report(report):
+    print(f"{report['requests']} requests, {report['throughput_rps']:.1f} req/s, "
+          f"error rate {report['error_rate'] or 0:.2%}, statuses {report['status_counts']}")
+    print(f"{'stage':16s} {'count':>7s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s}")
+    for section in ("latency_by_stage", "latency_by_kind"):
+        for name, stats in report[section].items():
+            if stats["count"]:
+                print(f"{name:16s} {stats['count']:7d} {stats['p50_ms']:9.1f} {stats['p95_ms']:9.1f} {stats['p99_ms']:9.1f}")
+        print()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test for /api/dss/recommendations.")
+    parser.add_argument("--url", default="http://localhost:5000", help="Base URL of the DSS API")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent closed-loop clients")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Unmeasured warm-up seconds")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("village=0.6,patta_holder=0.2,query=0.2"))
+    parser.add_argument("--query-rate", type=float, default=0.5, help="Share of village/patta_holder requests that also carry a query")
+    parser.add_argument("--village-ids", type=parse_id_range, default=(1, 1000), help="Range like 1-1000")
+    parser.add_argument("--patta-holder-ids", type=parse_id_range, default=(1, 1000), help="Range like 1-1000")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean pause between a client's requests (s)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--start-mocks", action="store_true", help="Run the mock LLM/embedding servers in-process")
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--embedding-latency", type=float, default=0.02)
+    parser.add_argument("--llm-port", type=int, default=8000)
+    parser.add_argument("--embedding-port", type=int, default=8001)
+    args = parser.parse_args(argv)
+
+    servers = []
+    if args.start_mocks:
+        from benchmarks.mock_model_servers import start_servers
+        servers = start_servers(args.llm_port, args.embedding_port, args.llm_latency, args.embedding_latency)
+
+    try:
+        report = run_load_test(args)
+    finally:
+        for server in servers:
+            server.shutdown()
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote report to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-ins for the LLM and embedding services used by MCPProtocol, with tunable latency.
+# They speak the OpenAI-compatible formats MCPProtocol sends:
+#   python -m benchmarks.mock_model_servers --llm-latency 0.8 --embedding-latency 0.03
+#   LLM_API_URL=http://localhost:8000/v1/chat/completions \
+#   EMBEDDING_API_URL=http://localhost:8001/v1/embeddings python -m dss.dss_api
+
+
+class LatencyModel:
+    """Log-normal service time with the given median and spread, like a real model server's tail."""
+
+    def __init__(self, median, sigma=0.25, seed=None):
+        self.median = median
+        self.sigma = sigma
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def sample(self):
+        if self.median <= 0:
+            return 0.0
+        with self.lock:
+            return self.median * self.rng.lognormvariate(0.0, self.sigma)
+
+
+def _make_handler(kind, latency, dim, tokens_per_second):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, as real model servers
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                return self._send(400, {"error": "invalid JSON"})
+
+            time.sleep(latency.sample())
+            if kind == "embedding":
+                text = payload.get("input", "")
+                rng = random.Random(hash(text))
+                body = {"object": "list", "data": [{"object": "embedding", "index": 0,
+                                                    "embedding": [rng.uniform(-1, 1) for _ in range(dim)]}]}
+            else:
+                prompt = payload.get("messages", [{}])[-1].get("content", "")
+                content = f"Mock recommendation for a prompt of {len(prompt)} characters."
+                if tokens_per_second:
+                    # Simulated decode time on top of the time to first token
+                    time.sleep(len(content.split()) / tokens_per_second)
+                body = {"object": "chat.completion", "model": payload.get("model"),
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}]}
+            self._send(200, body)
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass  # a line per request would dominate a load test
+
+    return Handler
+
+
+def start_servers(llm_port=8000, embedding_port=8001, llm_latency=0.5, embedding_latency=0.02,
+                  sigma=0.25, dim=1536, tokens_per_second=0.0, host="127.0.0.1"):
+    """Starts both mock servers on background threads and returns them (call .shutdown() to stop)."""
+    servers = [
+        ThreadingHTTPServer((host, llm_port), _make_handler("llm", LatencyModel(llm_latency, sigma), dim, tokens_per_second)),
+        ThreadingHTTPServer((host, embedding_port), _make_handler("embedding", LatencyModel(embedding_latency, sigma), dim, 0)),
+    ]
+    for server in servers:
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return servers
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock LLM and embedding servers with tunable latency.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--llm-port", type=int, default=8000)
+    parser.add_argument("--embedding-port", type=int, default=8001)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Median LLM response time in seconds")
+    parser.add_argument("--embedding-latency", type=float, default=0.02, help="Median embedding response time in seconds")
+    parser.add_argument("--sigma", type=float, default=0.25, help="Log-normal spread of both latencies")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Extra simulated LLM decode time per output token")
+    parser.add_argument("--dim", type=int, default=1536, help="Embedding dimension")
+    args = parser.parse_args()
+
+    start_servers(args.llm_port, args.embedding_port, args.llm_latency, args.embedding_latency,
+                  args.sigma, args.dim, args.tokens_per_second, args.host)
+    print(f"Mock LLM on http://{args.host}:{args.llm_port}/v1/chat/completions, "
+          f"embeddings on http://{args.host}:{args.embedding_port}/v1/embeddings")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,423 @@
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+from benchmarks import synthetic
+from benchmarks.fakes import FakeDatabase, FakeModelServices
+
+# Run every benchmark with:
+#   python -m benchmarks.run --output bench.json
+# and compare against an earlier run (non-zero exit on regressions):
+#   python -m benchmarks.run --compare bench.json --threshold 1.25
+
+BENCHMARKS = {}
+
+
+class Skip(Exception):
+    """Raised by a benchmark whose dependencies or services are not available."""
+
+
+def benchmark(name):
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+def measure(fn, repeat, number=1, warmup=1):
+    """Times fn over `repeat` rounds of `number` calls; returns per-call statistics in seconds."""
+    with redirect_stdout(io.StringIO()):
+        for _ in range(warmup):
+            fn()
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            times.append((time.perf_counter() - start) / number)
+    times.sort()
+    return {
+        "min": times[0],
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "p95": times[min(len(times) - 1, int(round(0.95 * (len(times) - 1))))],
+        "max": times[-1],
+        "rounds": repeat,
+        "calls_per_round": number,
+    }
+
+
+# DSS
+
+@benchmark("dss.rule_engine.evaluate")
+def bench_rule_engine(config):
+    from dss.dss_engine import RuleEngine
+
+    villages = synthetic.random_villages(config.villages, seed=config.seed)
+    rules = synthetic.random_rules(rules_per_scheme=config.rules_per_scheme, seed=config.seed)
+    with FakeDatabase(villages, rules).patched():
+        engine = RuleEngine()
+
+    def run():
+        for village in villages:
+            for scheme_name in synthetic.SCHEMES:
+                engine.evaluate(scheme_name, village)
+
+    result = measure(run, config.repeat)
+    result["params"] = {"villages": len(villages), "rules": len(rules), "schemes": len(synthetic.SCHEMES)}
+    result["per_evaluation_us"] = result["median"] / (len(villages) * len(synthetic.SCHEMES)) * 1e6
+    return result
+
+
+@benchmark("dss.rule_engine.evaluate.large_ruleset")
+def bench_rule_engine_large(config):
+    from dss.dss_engine import RuleEngine
+
+    # Rules of many schemes loaded, only the recommended ones evaluated: exposes per-call rule scans
+    extra = [f"Scheme {i}" for i in range(config.extra_schemes)]
+    villages = synthetic.random_villages(config.villages // 4, seed=config.seed)
+    rules = synthetic.random_rules(rules_per_scheme=config.rules_per_scheme, seed=config.seed,
+                                   schemes=synthetic.SCHEMES + extra)
+    with FakeDatabase(villages, rules).patched():
+        engine = RuleEngine()
+
+    def run():
+        for village in villages:
+            for scheme_name in synthetic.SCHEMES:
+                engine.evaluate(scheme_name, village)
+
+    result = measure(run, config.repeat)
+    result["params"] = {"villages": len(villages), "rules": len(rules), "schemes": len(synthetic.SCHEMES) + len(extra)}
+    result["per_evaluation_us"] = result["median"] / (len(villages) * len(synthetic.SCHEMES)) * 1e6
+    return result
+
+
+@benchmark("dss.dss_engine.get_recommendations")
+def bench_get_recommendations(config):
+    from dss.dss_engine import DSSEngine
+
+    villages = synthetic.random_villages(config.villages, seed=config.seed)
+    rules = synthetic.random_rules(rules_per_scheme=config.rules_per_scheme, seed=config.seed)
+    database = FakeDatabase(villages, rules)
+    with database.patched():
+        engine = DSSEngine()
+
+        def run():
+            for village_id in range(1, len(villages) + 1):
+                engine.get_recommendations("village", village_id)
+
+        result = measure(run, config.repeat)
+    result["params"] = {"villages": len(villages), "rules": len(rules)}
+    result["per_request_us"] = result["median"] / len(villages) * 1e6
+    return result
+
+
+@benchmark("dss.mcp_protocol.get_scheme_recommendations_for_user")
+def bench_mcp_context(config):
+    from dss.mcp_protocol import MCPProtocol
+
+    villages = synthetic.random_villages(config.villages, seed=config.seed)
+    rules = synthetic.random_rules(rules_per_scheme=config.rules_per_scheme, seed=config.seed)
+    schemes, embeddings = synthetic.random_scheme_embeddings(config.schemes, seed=config.seed)
+    with redirect_stdout(io.StringIO()):
+        protocol = MCPProtocol("http://llm.invalid", "http://embeddings.invalid")
+    # Zero model latency: this measures context assembly and the database fakes only
+    with FakeDatabase(villages, rules, schemes, embeddings).patched(), FakeModelServices().patched(protocol):
+        ids = list(range(1, min(len(villages), 200) + 1))
+
+        def run():
+            for village_id in ids:
+                protocol.get_scheme_recommendations_for_user("schemes for farmers with irrigation", village_id=village_id)
+
+        result = measure(run, config.repeat)
+    result["params"] = {"requests": len(ids), "rules": len(rules), "schemes": len(schemes)}
+    result["per_request_us"] = result["median"] / len(ids) * 1e6
+    return result
+
+
+@benchmark("dss.database.find_similar_schemes")
+def bench_find_similar_schemes(config):
+    import numpy as np
+
+    if config.live_db:
+        from dss.database import find_similar_schemes
+        rng = np.random.default_rng(config.seed)
+        result = measure(lambda: find_similar_schemes(rng.standard_normal(1536)), config.repeat, number=10)
+        result["params"] = {"backend": "postgresql"}
+        return result
+
+    schemes, embeddings = synthetic.random_scheme_embeddings(config.schemes, seed=config.seed)
+    database = FakeDatabase([], [], schemes, embeddings)
+    query = np.random.default_rng(config.seed).standard_normal(1536).astype(np.float32)
+    result = measure(lambda: database.find_similar_schemes(query), config.repeat, number=100)
+    result["params"] = {"backend": "in-memory", "schemes": len(schemes)}
+    return result
+
+
+@benchmark("dss.database.fetch_village")
+def bench_fetch_village(config):
+    if not config.live_db:
+        raise Skip("needs --live-db (compares SELECT * with the projected, prepared fetch)")
+    from dss.database import VILLAGE_ATTRIBUTES, fetch_village_dss_data, fetch_village_record
+    from dss.dss_engine import RuleEngine
+
+    columns = RuleEngine().columns
+    ids = list(range(1, 201))
+    full = measure(lambda: [fetch_village_dss_data(village_id=i) for i in ids], config.repeat)
+    projected = measure(lambda: [fetch_village_record(i, columns) for i in ids], config.repeat)
+    projected["params"] = {"requests": len(ids), "columns": len(columns), "all_columns": len(VILLAGE_ATTRIBUTES)}
+    projected["select_star_median"] = full["median"]
+    projected["speedup"] = full["median"] / projected["median"]
+    return projected
+
+
+@benchmark("dss.village_dss_data.refresh")
+def bench_village_dss_refresh(config):
+    if not config.live_db:
+        raise Skip("needs --live-db (builds the materialized view in PostgreSQL)")
+    from dss.database import get_db_connection
+
+    conn = get_db_connection()
+    try:
+        conn.autocommit = True
+        cur = conn.cursor()
+
+        def run():
+            cur.execute("REFRESH MATERIALIZED VIEW village_dss_data")
+
+        result = measure(run, max(1, config.repeat // 3), warmup=0)
+        cur.execute("SELECT count(*) FROM village_dss_data")
+        result["params"] = {"rows": cur.fetchone()[0]}
+        cur.close()
+    finally:
+        conn.close()
+    return result
+
+
+# CV
+
+def _require(*modules):
+    for module in modules:
+        try:
+            __import__(module)
+        except ImportError as e:
+            raise Skip(f"missing dependency: {e.name}")
+
+
+def _scene(config, workdir, size):
+    path = os.path.join(workdir, f"scene_{size}.tif")
+    labels = os.path.join(workdir, f"labels_{size}.geojson")
+    if not os.path.exists(path):
+        _, transform = synthetic.write_geotiff(path, height=size, width=size, seed=config.seed)
+        synthetic.write_labels(labels, transform, height=size, width=size, seed=config.seed)
+    return path, labels
+
+
+def _inference(config, workdir):
+    import torch
+    from cv_models.inference import ModelInference
+    from cv_models.model import build_model
+
+    model_path = os.path.join(workdir, f"{config.variant}.pth")
+    if not os.path.exists(model_path):
+        torch.manual_seed(config.seed)
+        torch.save(build_model(config.variant, in_channels=3, num_classes=5).state_dict(), model_path)
+    with redirect_stdout(io.StringIO()):
+        return ModelInference(model_path, num_classes=5, device="cpu", variant=config.variant)
+
+
+def _create_tiles(config, label_mode):
+    _require("rasterio", "geopandas", "cv2")
+    from cv_models.data_preprocessing import SatelliteImageProcessor
+
+    image_path, label_path = _scene(config, config.workdir, config.scene_size)
+    processor = SatelliteImageProcessor(image_path, label_path, tile_size=(256, 256), label_mode=label_mode)
+    with redirect_stdout(io.StringIO()):
+        processor.load_data()
+    result = measure(processor.create_tiles, max(1, config.repeat // 3))
+    result["params"] = {"scene": config.scene_size, "tile": 256, "labels": len(processor.labels_gdf), "label_mode": label_mode}
+    if label_mode == "scene":
+        # Slices of the scene raster must match the per-tile rasterization they replace
+        with redirect_stdout(io.StringIO()):
+            _, masks = processor.create_tiles()
+            processor.label_mode = "per_tile"
+            _, expected = processor.create_tiles()
+        mismatched = int((masks != expected).any(axis=(1, 2)).sum())
+        if mismatched:
+            raise RuntimeError(f"scene and per_tile label modes disagree on {mismatched} of {len(masks)} tile masks")
+        result["params"]["masks_checked"] = len(masks)
+    processor.image_dataset.close()
+    return result
+
+
+@benchmark("cv.data_preprocessing.create_tiles")
+def bench_create_tiles(config):
+    return _create_tiles(config, "scene")
+
+
+@benchmark("cv.data_preprocessing.create_tiles.per_tile_labels")
+def bench_create_tiles_per_tile(config):
+    return _create_tiles(config, "per_tile")
+
+
+@benchmark("cv.inference.postprocess_mask")
+def bench_postprocess_mask(config):
+    _require("torch", "rasterio", "geopandas")
+    from rasterio.transform import from_origin
+
+    inference = _inference(config, config.workdir)
+    logits = synthetic.synthetic_logits(config.scene_size, config.scene_size, seed=config.seed)
+    transform = from_origin(78.0, 22.0, 1e-4, 1e-4)
+    result = measure(lambda: inference.postprocess_mask(logits, transform, "EPSG:4326"), config.repeat)
+    result["params"] = {"mask": config.scene_size, "num_classes": 5}
+    return result
+
+
+@benchmark("cv.inference.predict_and_vectorize")
+def bench_predict_and_vectorize(config):
+    _require("torch", "rasterio", "geopandas")
+
+    inference = _inference(config, config.workdir)
+    size = config.scene_size // 2
+    image_path, _ = _scene(config, config.workdir, size)
+    result = measure(lambda: inference.predict_and_vectorize(image_path), max(1, config.repeat // 3))
+    result["params"] = {"scene": size, "variant": config.variant}
+    return result
+
+
+# Startup
+
+def _cold_import(config, module, dependencies):
+    """Times importing `module` in a fresh interpreter (a cold start) and reports heavy modules it pulled in."""
+    _require(*dependencies)
+    env = {**os.environ, "DSS_PRELOAD": "0", "CELERY_PRELOAD": "0"}
+    command = [sys.executable, "-c", f"import {module}"]
+    result = measure(lambda: subprocess.run(command, env=env, check=True, capture_output=True), max(3, config.repeat // 3))
+    probe = subprocess.run(
+        [sys.executable, "-c", f"import sys, {module}; print('HEAVY:' + ','.join(m for m in ('torch', 'rasterio', 'geopandas', 'shapely') if m in sys.modules))"],
+        env=env, check=True, capture_output=True, text=True,
+    )
+    heavy = [line for line in probe.stdout.splitlines() if line.startswith("HEAVY:")][-1][len("HEAVY:"):]
+    result["params"] = {"module": module, "heavy_modules_loaded": heavy.split(",") if heavy else []}
+    return result
+
+
+@benchmark("startup.dss_api")
+def bench_startup_dss_api(config):
+    return _cold_import(config, "dss.dss_api", ("flask", "psycopg2", "numpy", "requests"))
+
+
+@benchmark("startup.celery_tasks")
+def bench_startup_celery_tasks(config):
+    # The producer side: importing the tasks module to enqueue work must not load torch
+    return _cold_import(config, "cv_models.celery_tasks", ("celery",))
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(config):
+    results = {}
+    for name, fn in BENCHMARKS.items():
+        if config.only and not any(name.startswith(prefix) for prefix in config.only):
+            continue
+        print(f"Running {name} ...", end=" ", flush=True)
+        try:
+            results[name] = {"status": "ok", **fn(config)}
+            print(f"median {results[name]['median'] * 1000:.2f} ms")
+        except Skip as e:
+            results[name] = {"status": "skipped", "reason": str(e)}
+            print(f"skipped ({e})")
+        except ImportError as e:
+            results[name] = {"status": "skipped", "reason": f"missing dependency: {e.name}"}
+            print(f"skipped (missing dependency: {e.name})")
+        except Exception as e:
+            results[name] = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+            print(f"error: {e}")
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "config": {k: v for k, v in vars(config).items() if k not in ("workdir", "output", "compare")},
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Prints median ratios against a baseline run; returns the names that regressed beyond threshold."""
+    regressions = []
+    for name, result in current["results"].items():
+        before = baseline.get("results", {}).get(name, {})
+        if result.get("status") != "ok" or before.get("status") != "ok":
+            continue
+        ratio = result["median"] / before["median"] if before["median"] else float("inf")
+        flag = "REGRESSION" if ratio > threshold else ""
+        print(f"{name:55s} {before['median'] * 1000:10.2f} ms -> {result['median'] * 1000:10.2f} ms  x{ratio:.2f} {flag}")
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for the DSS and CV hot paths.")
+    parser.add_argument("--only", nargs="*", help="Run benchmarks whose name starts with one of these prefixes (e.g. dss cv.inference)")
+    parser.add_argument("--output", help="Write JSON results to this file (default: stdout)")
+    parser.add_argument("--compare", help="Baseline JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Median slowdown ratio reported as a regression")
+    parser.add_argument("--quick", action="store_true", help="Smaller inputs and fewer rounds, for smoke runs")
+    parser.add_argument("--live-db", action="store_true", help="Also run benchmarks against the configured PostgreSQL")
+    parser.add_argument("--variant", default="unet_small", help="UNET variant for the inference benchmarks")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--list", action="store_true", help="List benchmark names and exit")
+    config = parser.parse_args(argv)
+
+    if config.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+
+    config.repeat = 3 if config.quick else 15
+    config.villages = 200 if config.quick else 2000
+    config.rules_per_scheme = 4
+    config.extra_schemes = 50 if config.quick else 300
+    config.schemes = 200 if config.quick else 2000
+    config.scene_size = 512 if config.quick else 1024
+
+    with tempfile.TemporaryDirectory(prefix="dss_bench_") as workdir:
+        config.workdir = workdir
+        report = run_benchmarks(config)
+
+    text = json.dumps(report, indent=2, default=str)
+    if config.output:
+        with open(config.output, "w") as f:
+            f.write(text)
+        print(f"Wrote results to {config.output}")
+    else:
+        print(text)
+
+    if config.compare:
+        with open(config.compare) as f:
+            regressions = compare(report, json.load(f), config.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed by more than x{config.threshold}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+import random
+
+import numpy as np
+
+SCHEMES = ["PM-KISAN", "Jal Jeevan Mission", "MGNREGA", "DAJGUA"]
+LAND_TYPES = ["Agricultural", "Forest", "Barren", "Residential", "Wetland"]
+WATER_QUALITY = ["Good", "Moderate", "Poor"]
+
+# Attributes of a village_dss_data row with a generator and the operators rules may use on them
+NUMERIC_ATTRIBUTES = {
+    "water_index": lambda rng: round(rng.uniform(0, 1), 3),
+    "population": lambda rng: rng.randint(50, 20000),
+    "forest_area_percentage": lambda rng: round(rng.uniform(0, 100), 2),
+    "nearest_groundwater_level": lambda rng: round(rng.uniform(1, 60), 2),
+    "distance_to_canal": lambda rng: round(rng.uniform(0, 0.5), 4),
+    "asset_count": lambda rng: rng.randint(0, 500),
+    "farmland_area_sq_m": lambda rng: round(rng.uniform(0, 5e6), 1),
+    "water_body_count": lambda rng: rng.randint(0, 40),
+    "homestead_count": lambda rng: rng.randint(0, 300),
+    "forest_cover_area_sq_m": lambda rng: round(rng.uniform(0, 5e6), 1),
+}
+CATEGORICAL_ATTRIBUTES = {
+    "land_type": lambda rng: rng.choice(LAND_TYPES),
+    "nearest_groundwater_quality": lambda rng: rng.choice(WATER_QUALITY),
+    "has_forest": lambda rng: rng.random() < 0.4,
+    "has_road_access": lambda rng: rng.random() < 0.7,
+}
+
+
+def random_villages(n, seed=0, missing_rate=0.02):
+    """Rows shaped like village_dss_data (without geometry), with a few missing attributes."""
+    rng = random.Random(seed)
+    villages = []
+    for village_id in range(1, n + 1):
+        row = {
+            "village_id": village_id,
+            "village_name": f"Village {village_id}",
+            "district_id": 1 + village_id % 50,
+            "district_name": f"District {1 + village_id % 50}",
+            "state_id": 1 + village_id % 4,
+            "state_name": f"State {1 + village_id % 4}",
+        }
+        for attribute, generate in {**NUMERIC_ATTRIBUTES, **CATEGORICAL_ATTRIBUTES}.items():
+            row[attribute] = None if rng.random() < missing_rate else generate(rng)
+        villages.append(row)
+    return villages
+
+
+def random_rules(rules_per_scheme=4, seed=0, schemes=SCHEMES):
+    """Rows shaped like fetch_eligibility_rules() output, using every supported operator."""
+    rng = random.Random(seed)
+    rules = []
+    for scheme_id, scheme_name in enumerate(schemes, start=1):
+        for _ in range(rules_per_scheme):
+            if rng.random() < 0.7:
+                attribute = rng.choice(list(NUMERIC_ATTRIBUTES))
+                operator = rng.choice([">", "<", ">=", "<="])
+                value = str(NUMERIC_ATTRIBUTES[attribute](rng))
+            else:
+                attribute = rng.choice(list(CATEGORICAL_ATTRIBUTES))
+                operator = rng.choice(["=", "LIKE"])
+                value = str(CATEGORICAL_ATTRIBUTES[attribute](rng))
+                if operator == "LIKE":
+                    value = value[:4].lower()
+            rules.append({
+                "scheme_id": scheme_id,
+                "scheme_name": scheme_name,
+                "description": f"Synthetic description of {scheme_name}",
+                "description_embedding": None,
+                "attribute": attribute,
+                "operator": operator,
+                "value": value,
+            })
+    return rules
+
+
+def random_scheme_embeddings(n_schemes=200, dim=1536, seed=0):
+    """Unit-normalised scheme embeddings for the similarity search benchmark."""
+    rng = np.random.default_rng(seed)
+    embeddings = rng.standard_normal((n_schemes, dim)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    schemes = [
+        {"scheme_id": i + 1, "scheme_name": f"Scheme {i + 1}", "description": f"Synthetic scheme {i + 1}"}
+        for i in range(n_schemes)
+    ]
+    return schemes, embeddings
+
+
+def _blob_mask(height, width, n_blobs, num_classes, rng):
+    """Class-index mask made of random ellipses, a stand-in for segmented assets."""
+    mask = np.zeros((height, width), dtype=np.uint8)
+    yy, xx = np.mgrid[0:height, 0:width]
+    for _ in range(n_blobs):
+        cy, cx = rng.integers(0, height), rng.integers(0, width)
+        ry, rx = rng.integers(4, max(5, height // 12)), rng.integers(4, max(5, width // 12))
+        mask[((yy - cy) / ry) ** 2 + ((xx - cx) / rx) ** 2 <= 1] = rng.integers(1, num_classes)
+    return mask
+
+
+def synthetic_mask(height, width, num_classes=5, n_blobs=60, seed=0):
+    return _blob_mask(height, width, n_blobs, num_classes, np.random.default_rng(seed))
+
+
+def synthetic_logits(height, width, num_classes=5, n_blobs=60, seed=0):
+    """(1, num_classes, H, W) logits whose argmax is a blob mask, for postprocess_mask."""
+    import torch
+    mask = synthetic_mask(height, width, num_classes, n_blobs, seed)
+    logits = np.zeros((1, num_classes, height, width), dtype=np.float32)
+    np.put_along_axis(logits[0], mask[None].astype(np.int64), 1.0, axis=0)
+    return torch.from_numpy(logits)
+
+
+def write_geotiff(path, height=1024, width=1024, seed=0, origin=(78.0, 22.0), pixel_size=1e-4):
+    """Writes a synthetic 3-band uint8 GeoTIFF in EPSG:4326. Returns (path, transform)."""
+    import rasterio
+    from rasterio.transform import from_origin
+
+    rng = np.random.default_rng(seed)
+    mask = _blob_mask(height, width, 80, 5, rng)
+    image = rng.integers(40, 90, size=(3, height, width), dtype=np.uint8)
+    palette = np.array([[60, 60, 60], [90, 160, 60], [40, 70, 170], [150, 110, 90], [30, 110, 40]], dtype=np.uint8)
+    image = np.where(mask[None] > 0, palette[mask].transpose(2, 0, 1), image).astype(np.uint8)
+
+    transform = from_origin(origin[0], origin[1], pixel_size, pixel_size)
+    with rasterio.open(
+        path, "w", driver="GTiff", height=height, width=width, count=3, dtype="uint8",
+        crs="EPSG:4326", transform=transform, tiled=True, blockxsize=256, blockysize=256,
+    ) as dst:
+        dst.write(image)
+    return path, transform
+
+
+def write_labels(path, transform, height=1024, width=1024, n_polygons=200, num_classes=5, seed=0):
+    """Writes random labelled polygons (class_id 1..num_classes-1) covering the synthetic image."""
+    import geopandas as gpd
+    from shapely.geometry import box
+
+    rng = np.random.default_rng(seed)
+    geometries, class_ids = [], []
+    for _ in range(n_polygons):
+        col, row = rng.integers(0, width - 8), rng.integers(0, height - 8)
+        w, h = rng.integers(4, max(5, width // 10)), rng.integers(4, max(5, height // 10))
+        x0, y0 = transform * (col, row)
+        x1, y1 = transform * (min(width, col + w), min(height, row + h))
+        geometries.append(box(min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)))
+        class_ids.append(int(rng.integers(1, num_classes)))
+    gpd.GeoDataFrame({"class_id": class_ids}, geometry=geometries, crs="EPSG:4326").to_file(path, driver="GeoJSON")
+    return path
@@ -0,0 +1,209 @@
+import fcntl
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+# Scratch directory for artifacts exchanged between pipeline stages. It must be visible to
+# every worker that handles a workflow (local disk for a single host, a shared mount otherwise).
+ARTIFACT_SCRATCH_DIR = os.getenv("ARTIFACT_SCRATCH_DIR", "/tmp/cv_artifacts")
+# Artifacts older than this are treated as orphans of failed workflows and removed by cleanup()
+ARTIFACT_TTL_SECONDS = int(os.getenv("ARTIFACT_TTL_SECONDS", 24 * 3600))
+
+
+class ArtifactStore:
+    """
+    Zero-copy hand-off of intermediate data between Celery stages.
+
+    Stages exchange small JSON-safe references instead of pickling arrays or GeoDataFrames
+    through the result backend:
+      * "npy": an .npy file in the scratch store, opened memory-mapped by the reader
+      * "shm": a POSIX shared-memory segment (same host only)
+      * "parquet": a GeoParquet file for vector data
+      * "file": any other file a stage writes itself (e.g. a COG), see reserve_path()
+
+    Each artifact carries a reference count stored next to it. put_* starts the count at
+    `refs` (one per expected consumer); consumers call release() once done and the data is
+    deleted when the count reaches zero.
+    """
+
+    def __init__(self, root=ARTIFACT_SCRATCH_DIR):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def _new_path(self, suffix):
+        return os.path.join(self.root, f"{uuid.uuid4().hex}{suffix}")
+
+    @contextmanager
+    def _locked(self, ref):
+        with open(f"{self._key(ref)}.lock", "a+") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _key(self, ref):
+        return ref["path"] if "path" in ref else os.path.join(self.root, f"shm-{ref['name']}")
+
+    def _write_refs(self, ref, count):
+        with open(f"{self._key(ref)}.refs", "w") as f:
+            f.write(str(count))
+
+    def _read_refs(self, ref):
+        try:
+            with open(f"{self._key(ref)}.refs") as f:
+                return int(f.read() or 0)
+        except FileNotFoundError:
+            return 0
+
+    # Arrays
+
+    def put_array(self, array, refs=1):
+        """Writes an array to the scratch store and returns its reference."""
+        path = self._new_path(".npy")
+        tmp_path = f"{path}.tmp"
+        out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=array.dtype, shape=array.shape)
+        out[...] = array
+        out.flush()
+        del out
+        os.replace(tmp_path, path)
+        ref = {"kind": "npy", "path": path, "shape": list(array.shape), "dtype": str(array.dtype)}
+        self._write_refs(ref, refs)
+        return ref
+
+    def create_array(self, shape, dtype, refs=1):
+        """
+        Allocates an empty memory-mapped array in the scratch store for writers to fill in
+        place (e.g. a scene-sized mask that several stages on the host write into).
+        Returns (ref, array).
+        """
+        path = self._new_path(".npy")
+        array = np.lib.format.open_memmap(path, mode="w+", dtype=np.dtype(dtype), shape=tuple(shape))
+        ref = {"kind": "npy", "path": path, "shape": list(shape), "dtype": str(np.dtype(dtype))}
+        self._write_refs(ref, refs)
+        return ref, array
+
+    def put_shared_array(self, array, refs=1):
+        """Copies an array into a shared-memory segment; readers on the same host map it without copying."""
+        segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        # The segment outlives this process; its lifetime is governed by the reference count
+        resource_tracker.unregister(segment._name, "shared_memory")
+        np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+        segment.close()
+        ref = {"kind": "shm", "name": segment.name, "shape": list(array.shape), "dtype": str(array.dtype)}
+        self._write_refs(ref, refs)
+        return ref
+
+    @contextmanager
+    def open_array(self, ref, writable=False):
+        """Maps an array artifact without copying it. The array is only valid inside the block."""
+        if ref["kind"] == "npy":
+            array = np.load(ref["path"], mmap_mode="r+" if writable else "r")
+            try:
+                yield array
+            finally:
+                del array
+        elif ref["kind"] == "shm":
+            segment = shared_memory.SharedMemory(name=ref["name"])
+            resource_tracker.unregister(segment._name, "shared_memory")
+            array = np.ndarray(tuple(ref["shape"]), dtype=np.dtype(ref["dtype"]), buffer=segment.buf)
+            array.flags.writeable = writable
+            try:
+                yield array
+            finally:
+                del array
+                segment.close()
+        else:
+            raise ValueError(f"Not an array artifact: {ref['kind']}")
+
+    def reserve_path(self, suffix, refs=1):
+        """Reserves a scratch file for a stage to write (e.g. with GDAL) and returns its reference."""
+        ref = {"kind": "file", "path": self._new_path(suffix)}
+        self._write_refs(ref, refs)
+        return ref
+
+    # Vector data
+
+    def put_geodataframe(self, gdf, refs=1):
+        """Writes a GeoDataFrame as GeoParquet and returns its reference."""
+        path = self._new_path(".parquet")
+        tmp_path = f"{path}.tmp"
+        gdf.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+        ref = {"kind": "parquet", "path": path, "rows": len(gdf)}
+        self._write_refs(ref, refs)
+        return ref
+
+    def read_geodataframe(self, ref):
+        import geopandas as gpd
+        return gpd.read_parquet(ref["path"])
+
+    # Lifetime
+
+    def retain(self, ref, count=1):
+        """Adds consumers to an artifact, e.g. before fanning it out to more tasks."""
+        with self._locked(ref):
+            self._write_refs(ref, self._read_refs(ref) + count)
+
+    def release(self, ref):
+        """Drops one reference; the artifact is deleted when none remain. Returns True if deleted."""
+        with self._locked(ref):
+            remaining = self._read_refs(ref) - 1
+            if remaining > 0:
+                self._write_refs(ref, remaining)
+                return False
+            self._delete(ref)
+        try:
+            os.remove(f"{self._key(ref)}.lock")
+        except FileNotFoundError:
+            pass
+        return True
+
+    def _delete(self, ref):
+        if ref["kind"] == "shm":
+            try:
+                segment = shared_memory.SharedMemory(name=ref["name"])
+                resource_tracker.unregister(segment._name, "shared_memory")
+                segment.close()
+                segment.unlink()
+            except FileNotFoundError:
+                pass
+        else:
+            try:
+                os.remove(ref["path"])
+            except FileNotFoundError:
+                pass
+        try:
+            os.remove(f"{self._key(ref)}.refs")
+        except FileNotFoundError:
+            pass
+
+    def cleanup(self, max_age_seconds=ARTIFACT_TTL_SECONDS):
+        """
+        Removes artifacts whose last reference change is older than max_age_seconds, which
+        only happens when a workflow failed before its consumers released them.
+        Returns the number of artifacts removed.
+        """
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        for entry in os.scandir(self.root):
+            if not entry.name.endswith(".refs") or entry.stat().st_mtime >= cutoff:
+                continue
+            key = entry.path[:-len(".refs")]
+            name = os.path.basename(key)
+            if name.startswith("shm-"):
+                ref = {"kind": "shm", "name": name[len("shm-"):]}
+            else:
+                ref = {"kind": "file", "path": key}
+            with self._locked(ref):
+                self._delete(ref)
+            try:
+                os.remove(f"{key}.lock")
+            except FileNotFoundError:
+                pass
+            removed += 1
+        return removed
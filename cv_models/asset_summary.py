@@ -0,0 +1,107 @@
+import time
+
+import shapely
+from psycopg2.extras import execute_values
+
+from dss.database import get_db_connection
+
+# Segmentation classes produced by the UNET (0 is background). Must match the pivot in
+# the village_asset_totals view in dss_schema.sql.
+ASSET_CLASSES = {
+    1: "farmland",
+    2: "water_body",
+    3: "homestead",
+    4: "forest_cover",
+}
+
+# Recomputes the summary rows of the given villages from the assets table. Areas are the
+# asset area clipped to the village, measured on the spheroid so they are in square metres.
+_RECOMPUTE_SUMMARY_SQL = """
+    INSERT INTO village_asset_summary (village_id, class_id, asset_count, total_area_sq_m, updated_at)
+    SELECT v.village_id, a.class_id, COUNT(*),
+           SUM(ST_Area(ST_Intersection(a.geometry, v.geometry)::geography)), now()
+    FROM villages v
+    JOIN assets a ON a.geometry && v.geometry AND ST_Intersects(a.geometry, v.geometry)
+    WHERE v.village_id = ANY(%s)
+    GROUP BY v.village_id, a.class_id
+"""
+
+_AFFECTED_VILLAGES_SQL = """
+    SELECT DISTINCT v.village_id
+    FROM assets a
+    JOIN villages v ON a.geometry && v.geometry AND ST_Intersects(a.geometry, v.geometry)
+    WHERE a.source_image = %s
+"""
+
+
+def store_assets(cur, assets_gdf, source_image, page_size=1000):
+    """
+    Replaces the assets detected in source_image with the rows of assets_gdf.
+    Returns the ids of villages whose assets changed (before or after the replace).
+    """
+    cur.execute(_AFFECTED_VILLAGES_SQL, (source_image,))
+    affected = {row[0] for row in cur.fetchall()}
+    cur.execute("DELETE FROM assets WHERE source_image = %s", (source_image,))
+
+    if len(assets_gdf):
+        if assets_gdf.crs is not None and assets_gdf.crs.to_epsg() != 4326:
+            assets_gdf = assets_gdf.to_crs(epsg=4326)
+        wkb = shapely.to_wkb(assets_gdf.geometry.values)
+        rows = [
+            (int(class_id), float(area), source_image, geom)
+            for class_id, area, geom in zip(assets_gdf["class_id"], assets_gdf["area_sq_m"], wkb)
+        ]
+        execute_values(
+            cur,
+            "INSERT INTO assets (class_id, area_sq_m, source_image, geometry) VALUES %s",
+            rows,
+            template="(%s, %s, %s, ST_Multi(ST_GeomFromWKB(%s, 4326)))",
+            page_size=page_size,
+        )
+        cur.execute(_AFFECTED_VILLAGES_SQL, (source_image,))
+        affected.update(row[0] for row in cur.fetchall())
+    return sorted(affected)
+
+
+def update_village_asset_summary(cur, village_ids):
+    """Recomputes village_asset_summary for just the given villages."""
+    if not village_ids:
+        return
+    cur.execute("DELETE FROM village_asset_summary WHERE village_id = ANY(%s)", (list(village_ids),))
+    cur.execute(_RECOMPUTE_SUMMARY_SQL, (list(village_ids),))
+
+
+def aggregate_inference_run(assets_gdf, source_image, refresh_dss_view=False):
+    """
+    Persists the assets from one inference run and incrementally updates the per-village
+    summary for the villages they touch. The village_dss_data view (which joins the summary)
+    is refreshed on a schedule by refresh_dss_view_task; refresh_dss_view refreshes it right
+    away instead, which rebuilds the whole view, so it is off for routine runs.
+    Returns a dict describing what was updated.
+    """
+    start = time.perf_counter()
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        village_ids = store_assets(cur, assets_gdf, source_image)
+        update_village_asset_summary(cur, village_ids)
+        cur.execute("SELECT bump_data_version('village_asset_summary')")
+        conn.commit()
+
+        if refresh_dss_view and village_ids:
+            cur.execute("SELECT refresh_village_dss_data()")
+            conn.commit()
+        cur.close()
+    except Exception as e:
+        print(f"Error aggregating assets for {source_image}: {e}")
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+    seconds = time.perf_counter() - start
+    print(f"Stored {len(assets_gdf)} assets from {source_image}; updated summaries for {len(village_ids)} villages in {seconds:.2f}s")
+    return {"assets_stored": len(assets_gdf), "villages_updated": len(village_ids), "seconds": round(seconds, 3)}
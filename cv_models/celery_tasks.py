@@ -1,5 +1,12 @@
-from celery import Celery
-from cv_models.inference import ModelInference
+import time
+_import_start = time.perf_counter()
+# Only light imports here: producers import this module just to enqueue tasks, so torch,
+# rasterio and geopandas (via cv_models.*) are imported inside the tasks that need them.
+from celery import Celery, chord, group
+from celery.signals import task_postrun, task_prerun, worker_init, worker_process_init
+import importlib
+import threading
+from dss.metrics import TASK_LATENCY, TASKS_TOTAL, record_startup, start_metrics_server
 import os
 
 # Configure Celery
@@ -16,25 +23,333 @@ celery_app = Celery(
 # Optional: Configure Celery to discover tasks automatically
 # celery_app.autodiscover_tasks(['cv_models'])
 
+# Task metrics: every worker process serves its own /metrics on CELERY_METRICS_PORT + its pool
+# index (0, 1, ...), so each prefork child can be scraped as a separate target. The same port
+# answers /healthz and /ready (ready once the child has warmed its models).
+CELERY_METRICS_PORT = os.getenv('CELERY_METRICS_PORT')
+_task_starts = {}
+
+# CELERY_PRELOAD=1 imports the pipeline modules (torch, rasterio, geopandas, ...) in the
+# worker's main process before the pool forks, so children start with them already loaded.
+# CELERY_WARM_MODELS ("model_path:num_classes[:variant],...") lists models every child loads
+# on a background thread right after the fork, reporting ready when they are loaded. The
+# warm-up must not block worker_process_init, or Celery kills children that take longer than
+# worker_proc_alive_timeout to come up. Models are not loaded before the fork because CUDA
+# cannot be used in forked children.
+CELERY_PRELOAD = os.getenv('CELERY_PRELOAD', '0') == '1'
+CELERY_WARM_MODELS = os.getenv('CELERY_WARM_MODELS', '')
+_worker_ready = threading.Event()
+
+record_startup('celery_tasks', 'imports', time.perf_counter() - _import_start)
+
+
+PIPELINE_MODULES = (
+    'rasterio',
+    'cv_models.artifacts',
+    'cv_models.asset_summary',
+    'cv_models.cog',
+    'cv_models.inference',
+    'cv_models.scene_chunks',
+)
+
+
+def _import_pipeline():
+    for name in PIPELINE_MODULES:
+        importlib.import_module(name)
+
+
+def _parse_warm_models(spec):
+    """'a.pth:5:unet,b.pth:5' -> [('a.pth', 5, 'unet'), ('b.pth', 5, 'unet')]"""
+    models = []
+    for entry in filter(None, (part.strip() for part in spec.split(','))):
+        model_path, num_classes, *variant = entry.split(':')
+        models.append((model_path, int(num_classes), variant[0] if variant else 'unet'))
+    return models
+
+
+@worker_init.connect
+def _preload_pipeline(**kwargs):
+    if CELERY_PRELOAD:
+        start = time.perf_counter()
+        _import_pipeline()
+        record_startup('celery_worker', 'preload', time.perf_counter() - start)
+        print(f"Preloaded pipeline modules in {time.perf_counter() - start:.2f}s")
+
+
+@worker_process_init.connect
+def _start_worker_process(**kwargs):
+    if CELERY_METRICS_PORT:
+        from billiard import current_process
+        port = int(CELERY_METRICS_PORT) + (getattr(current_process(), 'index', 0) or 0)
+        start_metrics_server(port, ready=_worker_ready.is_set)
+        print(f"Serving task metrics on :{port}/metrics")
+    if CELERY_WARM_MODELS:
+        threading.Thread(target=_warm_models, name='warm-models', daemon=True).start()
+    else:
+        _worker_ready.set()
+
+
+def _warm_models():
+    start = time.perf_counter()
+    try:
+        for model_path, num_classes, model_variant in _parse_warm_models(CELERY_WARM_MODELS):
+            _get_inference(model_path, num_classes, model_variant)
+        record_startup('celery_worker', 'warm_models', time.perf_counter() - start)
+    except Exception as e:
+        # Tasks still load their models on demand
+        print(f"Model warm-up failed: {e}")
+    finally:
+        _worker_ready.set()
+
+@task_prerun.connect
+def _record_task_start(task_id=None, **kwargs):
+    _task_starts[task_id] = time.perf_counter()
+
+@task_postrun.connect
+def _record_task_end(task_id=None, task=None, state=None, **kwargs):
+    start = _task_starts.pop(task_id, None)
+    if start is not None:
+        TASK_LATENCY.observe(time.perf_counter() - start, task=task.name, state=state or 'UNKNOWN')
+    TASKS_TOTAL.inc(task=task.name, state=state or 'UNKNOWN')
+
+DSS_VIEW_REFRESH_SECONDS = float(os.getenv('DSS_VIEW_REFRESH_SECONDS', '900'))
+
+# Periodic maintenance (requires celery beat)
+celery_app.conf.beat_schedule = {
+    # Remove intermediate artifacts left behind by failed workflows
+    'cleanup-artifacts': {'task': 'cv_models.celery_tasks.cleanup_artifacts_task', 'schedule': 3600.0},
+    # Inference runs only update village_asset_summary; the DSS view picks them up here
+    'refresh-dss-view': {'task': 'cv_models.celery_tasks.refresh_dss_view_task', 'schedule': DSS_VIEW_REFRESH_SECONDS},
+}
+
 @celery_app.task(bind=True)
-def process_satellite_image_task(self, image_path, model_path, num_classes, output_geojson_path):
+def process_satellite_image_task(self, image_path, model_path, num_classes, output_geojson_path, aggregate_assets=True, model_variant="unet", tta="none", tta_scales=None, skip_empty=False):
     """
     Celery task to process a satellite image, perform inference,
     and convert raster output to vector polygons.
+    With aggregate_assets the detected assets are stored in PostGIS and the
+    per-village asset summaries joined into village_dss_data are updated.
+    model_variant selects a registered UNET variant (see MODEL_VARIANTS in model.py).
+    tta selects a test-time augmentation mode (see TTA_MODES in inference.py) and
+    tta_scales optional multi-scale factors; the result reports their inference cost.
+    skip_empty discards nodata/cloud areas found by a coarse overview pass (see cog.py).
     """
+    from cv_models.asset_summary import aggregate_inference_run
+
     try:
         print(f"Starting image processing for: {image_path}")
-        inference_processor = ModelInference(model_path, num_classes=num_classes)
-        vector_assets_gdf = inference_processor.predict_and_vectorize(image_path, output_geojson_path)
+        inference_processor = _get_inference(model_path, num_classes, model_variant)
+        vector_assets_gdf = inference_processor.predict_and_vectorize(
+            image_path, output_geojson_path, tta=tta, tta_scales=tta_scales, skip_empty=skip_empty
+        )
         
         print(f"Finished processing {image_path}. Detected {len(vector_assets_gdf)} assets.")
+
+        aggregation = None
+        if aggregate_assets:
+            aggregation = aggregate_inference_run(vector_assets_gdf, image_path)
+
         return {
             "status": "SUCCESS",
             "image_path": image_path,
             "output_geojson_path": output_geojson_path,
-            "num_assets_detected": len(vector_assets_gdf)
+            "num_assets_detected": len(vector_assets_gdf),
+            "asset_aggregation": aggregation,
+            "inference": {
+                "model_variant": model_variant,
+                "tta": tta,
+                "tta_scales": tta_scales,
+                "views": inference_processor.last_num_views,
+                "seconds": round(inference_processor.last_inference_seconds, 3),
+                "timings": {stage: round(seconds, 3) for stage, seconds in inference_processor.last_timings.items()},
+            }
         }
     except Exception as e:
         self.update_state(state='FAILURE', meta={'exc_type': type(e).__name__, 'exc_message': str(e)})
         print(f"Error processing {image_path}: {e}")
-        raise
\ No newline at end of file
+        raise
+
+
+# Models loaded by this worker process, reused across image and chunk tasks
+_inference_cache = {}
+# Held while loading so a task and the warm-up thread do not load the same model twice
+_inference_lock = threading.Lock()
+
+
+def _get_inference(model_path, num_classes, model_variant):
+    key = (model_path, num_classes, model_variant)
+    with _inference_lock:
+        if key not in _inference_cache:
+            from cv_models.inference import ModelInference
+            _inference_cache[key] = ModelInference(model_path, num_classes=num_classes, variant=model_variant)
+        return _inference_cache[key]
+
+
+def _report_chunk_progress(task, parent_id, chunks_total):
+    """Counts finished chunks in the result backend and publishes it as the scene task's progress."""
+    client = getattr(celery_app.backend, "client", None)
+    chunks_done = None
+    if client is not None:
+        key = f"scene-progress:{parent_id}"
+        chunks_done = client.incr(key)
+        client.expire(key, 24 * 3600)
+    task.update_state(task_id=parent_id, state='PROGRESS',
+                      meta={'stage': 'inference', 'chunks_done': chunks_done, 'chunks_total': chunks_total})
+
+
+@celery_app.task(bind=True)
+def process_large_scene_task(self, image_path, model_path, num_classes, output_geojson_path, chunk_size=2048, halo=64,
+                             aggregate_assets=True, model_variant="unet", tta="none", tta_scales=None,
+                             prepare_cog=True, skip_empty=True):
+    """
+    Chunked variant of process_satellite_image_task for very large scenes.
+    The scene is split into chunk_size windows that are predicted by parallel subtasks
+    (a chord); merge_scene_chunks_task then joins polygons across chunk seams, writes
+    the GeoJSON and aggregates assets. The task is replaced by the chord, so its id
+    reports PROGRESS while chunks finish and ends with the merge task's result.
+    With prepare_cog, scenes that are not tiled COGs are first converted into the scratch
+    store so chunk reads are block-aligned; with skip_empty, a coarse pass over the
+    overviews drops chunks that are entirely nodata, black or cloud.
+    """
+    import rasterio
+    from cv_models.artifacts import ArtifactStore
+    from cv_models.cog import aligned_chunk_size, content_mask, convert_to_cog, gdal_env, is_cog, window_has_content
+    from cv_models.scene_chunks import chunk_window, plan_chunks
+
+    store = ArtifactStore()
+    read_path, cog_ref = image_path, None
+    if prepare_cog and not is_cog(image_path):
+        self.update_state(state='PROGRESS', meta={'stage': 'prepare'})
+        cog_ref = store.reserve_path(".tif")
+        read_path = convert_to_cog(image_path, cog_ref["path"])
+
+    with gdal_env(), rasterio.open(read_path) as src:
+        chunk_size = aligned_chunk_size(src, chunk_size)
+        chunks = plan_chunks(src.width, src.height, chunk_size)
+        num_planned = len(chunks)
+        if skip_empty:
+            content, factor = content_mask(src)
+            chunks = [chunk for chunk in chunks if window_has_content(content, factor, chunk_window(chunk))]
+    print(f"Splitting {image_path} into {num_planned} chunks of up to {chunk_size}px; {num_planned - len(chunks)} skipped as empty")
+    self.update_state(state='PROGRESS', meta={'stage': 'inference', 'chunks_done': 0, 'chunks_total': len(chunks)})
+
+    body = merge_scene_chunks_task.s(image_path, output_geojson_path, chunk_size, aggregate_assets=aggregate_assets,
+                                     read_path=read_path, cog_ref=cog_ref)
+    if not chunks:
+        return self.replace(body.clone(args=([],)))
+    header = group(
+        predict_chunk_task.s(read_path, chunk, model_path, num_classes, self.request.id, len(chunks),
+                             halo=halo, model_variant=model_variant, tta=tta, tta_scales=tta_scales)
+        for chunk in chunks
+    )
+    return self.replace(chord(header, body))
+
+
+@celery_app.task(bind=True, autoretry_for=(Exception,), retry_backoff=True, retry_kwargs={'max_retries': 3}, acks_late=True)
+def predict_chunk_task(self, image_path, chunk, model_path, num_classes, parent_id, chunks_total, halo=64,
+                       model_variant="unet", tta="none", tta_scales=None):
+    """
+    Predicts and polygonizes one chunk of a scene. Failed chunks are retried on their own
+    with backoff; the chunks that already finished keep their results.
+    The polygons are handed to the merge step as an artifact reference, not through Redis.
+    """
+    import rasterio
+    from cv_models.artifacts import ArtifactStore
+    from cv_models.cog import gdal_env
+    from cv_models.scene_chunks import chunk_window
+
+    inference_processor = _get_inference(model_path, num_classes, model_variant)
+    with gdal_env(), rasterio.open(image_path) as src:
+        window = chunk_window(chunk)
+        mask = inference_processor.predict_window(src, window, halo=halo, tta=tta, tta_scales=tta_scales)
+        chunk_gdf = inference_processor.vectorize_mask(mask, src.window_transform(window), src.crs)
+    _report_chunk_progress(self, parent_id, chunks_total)
+    return {"index": chunk["index"], "polygons": ArtifactStore().put_geodataframe(chunk_gdf)}
+
+
+@celery_app.task(bind=True)
+def merge_scene_chunks_task(self, chunk_results, image_path, output_geojson_path, chunk_size, aggregate_assets=True,
+                            read_path=None, cog_ref=None):
+    """
+    Reduce step of process_large_scene_task: merges polygons split by chunk seams and
+    stores the result like process_satellite_image_task. read_path is the file the chunks
+    were read from (a prepared COG); cog_ref is released once the scene is done.
+    """
+    import rasterio
+    from cv_models.artifacts import ArtifactStore
+    from cv_models.asset_summary import aggregate_inference_run
+    from cv_models.scene_chunks import merge_chunk_polygons, seam_lines
+
+    try:
+        self.update_state(state='PROGRESS', meta={'stage': 'merge', 'chunks_done': len(chunk_results), 'chunks_total': len(chunk_results)})
+        store = ArtifactStore()
+        with rasterio.open(read_path or image_path) as src:
+            seams = seam_lines(src.width, src.height, chunk_size, src.transform)
+            crs = src.crs
+        chunk_results = sorted(chunk_results, key=lambda result: result["index"])
+        chunk_gdfs = [store.read_geodataframe(result["polygons"]) for result in chunk_results]
+        vector_assets_gdf = merge_chunk_polygons(chunk_gdfs, seams, crs)
+        for result in chunk_results:
+            store.release(result["polygons"])
+        if cog_ref:
+            store.release(cog_ref)
+
+        if output_geojson_path:
+            vector_assets_gdf.to_file(output_geojson_path, driver='GeoJSON')
+            print(f"Vectorized assets saved to {output_geojson_path}")
+        print(f"Merged {len(chunk_results)} chunks of {image_path}. Detected {len(vector_assets_gdf)} assets.")
+
+        aggregation = None
+        if aggregate_assets:
+            aggregation = aggregate_inference_run(vector_assets_gdf, image_path)
+
+        return {
+            "status": "SUCCESS",
+            "image_path": image_path,
+            "output_geojson_path": output_geojson_path,
+            "num_assets_detected": len(vector_assets_gdf),
+            "num_chunks": len(chunk_results),
+            "asset_aggregation": aggregation,
+        }
+    except Exception as e:
+        self.update_state(state='FAILURE', meta={'exc_type': type(e).__name__, 'exc_message': str(e)})
+        print(f"Error merging chunks of {image_path}: {e}")
+        raise
+
+
+@celery_app.task
+def cleanup_artifacts_task(max_age_seconds=None):
+    """Deletes scratch artifacts orphaned by failed workflows."""
+    from cv_models.artifacts import ArtifactStore
+
+    store = ArtifactStore()
+    removed = store.cleanup(max_age_seconds) if max_age_seconds is not None else store.cleanup()
+    print(f"Removed {removed} orphaned artifacts from {store.root}")
+    return {"removed": removed}
+
+
+@celery_app.task
+def refresh_dss_view_task():
+    """Refreshes village_dss_data (concurrently, so reads continue) and bumps its data version."""
+    from dss.database import get_db_connection
+
+    start = time.perf_counter()
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute("SELECT refresh_village_dss_data()")
+        version = cur.fetchone()[0]
+        conn.commit()
+        cur.close()
+    except Exception as e:
+        print(f"Error refreshing village_dss_data: {e}")
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        if conn:
+            conn.close()
+    seconds = time.perf_counter() - start
+    print(f"Refreshed village_dss_data (version {version}) in {seconds:.2f}s")
+    return {"version": version, "seconds": round(seconds, 3)}
@@ -0,0 +1,146 @@
+import math
+import os
+
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.shutil import copy as rio_copy
+from rasterio.windows import Window
+
+# GDAL settings for scene reads. The block cache is sized for whole-scene chunks; the
+# directory listing is skipped because sidecar files (.aux.xml, .ovr) are not used.
+GDAL_OPTIONS = {
+    "GDAL_CACHEMAX": int(os.getenv("GDAL_CACHEMAX_MB", 512)),
+    "GDAL_NUM_THREADS": os.getenv("GDAL_NUM_THREADS", "ALL_CPUS"),
+    "GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR",
+    "VSI_CACHE": True,
+    "VSI_CACHE_SIZE": 64 * 1024 * 1024,
+}
+
+COG_BLOCKSIZE = 512
+COG_COMPRESSION = os.getenv("COG_COMPRESSION", "DEFLATE")
+
+# Pixels brighter than this in every band (8-bit imagery) are treated as cloud by the pre-pass
+CLOUD_THRESHOLD = 235
+
+
+def gdal_env(**overrides):
+    """rasterio.Env with the tuned GDAL cache/threading settings; wrap scene reads in it."""
+    return rasterio.Env(**{**GDAL_OPTIONS, **overrides})
+
+
+def is_cog(path):
+    """True if the file is internally tiled and has overviews, i.e. already suits windowed reads."""
+    with rasterio.open(path) as src:
+        return bool(src.profile.get("tiled", False) and src.overviews(1))
+
+
+def convert_to_cog(src_path, dst_path, blocksize=COG_BLOCKSIZE, compress=COG_COMPRESSION, resampling="AVERAGE"):
+    """
+    Writes src_path as a tiled, compressed Cloud-Optimized GeoTIFF with overviews.
+    Uses GDAL's COG driver (GDAL >= 3.1); older GDALs get an equivalent tiled GTiff with
+    internal overviews built explicitly. Returns dst_path.
+    """
+    tmp_path = f"{dst_path}.tmp.tif"
+    with gdal_env():
+        if _has_driver("COG"):
+            rio_copy(
+                src_path, tmp_path, driver="COG",
+                BLOCKSIZE=blocksize, COMPRESS=compress, PREDICTOR="YES",
+                OVERVIEWS="AUTO", RESAMPLING=resampling, NUM_THREADS="ALL_CPUS", BIGTIFF="IF_SAFER",
+            )
+        else:
+            _convert_with_gtiff(src_path, tmp_path, blocksize, compress, resampling)
+    os.replace(tmp_path, dst_path)
+    return dst_path
+
+
+def _has_driver(name):
+    with rasterio.Env() as env:
+        return name in env.drivers()
+
+
+def _convert_with_gtiff(src_path, dst_path, blocksize, compress, resampling):
+    with rasterio.open(src_path) as src:
+        profile = src.profile.copy()
+        profile.update(driver="GTiff", tiled=True, blockxsize=blocksize, blockysize=blocksize,
+                       compress=compress, BIGTIFF="IF_SAFER")
+        with rasterio.open(dst_path, "w", **profile) as dst:
+            for _, window in dst.block_windows(1):
+                dst.write(src.read(window=window), window=window)
+            factors = [2 ** i for i in range(1, 16) if max(src.width, src.height) / 2 ** i >= blocksize]
+            dst.build_overviews(factors, Resampling[resampling.lower()])
+            dst.update_tags(ns="rio_overview", resampling=resampling.lower())
+
+
+def aligned_chunk_size(src, chunk_size):
+    """Rounds chunk_size to a whole number of the file's blocks so chunk reads never split a block."""
+    block_h, block_w = src.block_shapes[0]
+    block = max(block_h, block_w)
+    if block >= min(src.width, src.height):
+        return chunk_size
+    return max(block, int(round(chunk_size / block)) * block)
+
+
+def block_windows(src, target_size):
+    """Row-major windows of about target_size pixels aligned to the file's internal blocks."""
+    size = aligned_chunk_size(src, target_size)
+    for row_off in range(0, src.height, size):
+        for col_off in range(0, src.width, size):
+            yield Window(col_off, row_off, min(size, src.width - col_off), min(size, src.height - row_off))
+
+
+def content_mask(src, max_dim=1024, cloud_threshold=CLOUD_THRESHOLD):
+    """
+    Coarse pre-pass: reads the scene at roughly max_dim pixels on its long side (GDAL serves
+    this from the overviews) and returns (mask, factor) where mask is True for pixels with
+    content, i.e. not nodata, not all-zero and not cloud-bright in every band, and factor is
+    the number of full-resolution pixels per coarse pixel.
+    """
+    factor = max(1, math.ceil(max(src.width, src.height) / max_dim))
+    out_shape = (src.count, math.ceil(src.height / factor), math.ceil(src.width / factor))
+    data = src.read(out_shape=out_shape, resampling=Resampling.nearest)
+    bands = data[:3] if src.count >= 3 else data
+
+    valid = src.dataset_mask(out_shape=out_shape[1:], resampling=Resampling.nearest) > 0
+    empty = np.all(bands == 0, axis=0)
+    cloud = np.all(bands >= cloud_threshold, axis=0) if bands.dtype == np.uint8 else np.zeros_like(empty)
+    return valid & ~empty & ~cloud, factor
+
+
+def window_has_content(mask, factor, window, min_fraction=0.001):
+    """True if at least min_fraction of the window's coarse pixels have content."""
+    row0 = int(window.row_off) // factor
+    col0 = int(window.col_off) // factor
+    row1 = max(row0 + 1, math.ceil((window.row_off + window.height) / factor))
+    col1 = max(col0 + 1, math.ceil((window.col_off + window.width) / factor))
+    region = mask[row0:row1, col0:col1]
+    return region.size > 0 and region.mean() >= min_fraction
+
+
+def prepare_scene(image_path, output_path):
+    """
+    Input-preparation stage: converts a scene to a COG at output_path unless it already is one.
+    Returns the path inference should read from.
+    """
+    if is_cog(image_path):
+        return image_path
+    print(f"Converting {image_path} to a cloud-optimized GeoTIFF")
+    return convert_to_cog(image_path, output_path)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert scenes to tiled, compressed COGs with overviews.")
+    parser.add_argument("inputs", nargs="+")
+    parser.add_argument("--output-dir", required=True)
+    parser.add_argument("--blocksize", type=int, default=COG_BLOCKSIZE)
+    parser.add_argument("--compress", default=COG_COMPRESSION)
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for path in args.inputs:
+        out = os.path.join(args.output_dir, os.path.splitext(os.path.basename(path))[0] + ".cog.tif")
+        convert_to_cog(path, out, blocksize=args.blocksize, compress=args.compress)
+        print(f"Wrote {out}")
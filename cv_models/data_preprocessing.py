@@ -1,18 +1,84 @@
 import rasterio
 import geopandas as gpd
 import numpy as np
+import shapely
 from shapely.geometry import mapping, box
-from rasterio.mask import mask
+from rasterio import windows
 from rasterio.features import rasterize
 import cv2
 import os
+import tempfile
+from cv_models.cog import gdal_env
+from dss.metrics import observe_stage
+import time
+
+# Scenes with more pixels than this get their label raster as a block-filled memory map
+LABEL_MEMMAP_PIXELS = int(os.getenv("LABEL_MEMMAP_PIXELS", str(256 * 1024 * 1024)))
+LABEL_BLOCK_SIZE = 4096
+
+def rasterize_labels(labels_gdf, out_shape, transform, class_priority=None, block_size=None, out=None):
+    """
+    Burns all label polygons into one uint8 class raster in a single pass. Overlaps are
+    resolved by priority: shapes are drawn in ascending priority so the highest one wins,
+    by default the highest class_id (the same result as np.maximum over per-class masks).
+    class_priority optionally maps class_id -> priority. Class 0 (background) is skipped.
+
+    With block_size the raster is filled block by block, each block burning only the
+    labels that intersect it, so `out` can be a memory-mapped array larger than RAM.
+    Returns `out` (allocated if not given).
+    """
+    if out is None:
+        out = np.zeros(out_shape, dtype=np.uint8)
+    labels = labels_gdf[labels_gdf["class_id"] != 0]
+    if labels.empty:
+        return out
+    priority = labels["class_id"].map(class_priority).fillna(-1) if class_priority else labels["class_id"]
+    labels = labels.iloc[np.argsort(priority.to_numpy(), kind="stable")]
+    shapes = list(zip(labels.geometry.values, labels["class_id"].astype(int)))
+
+    height, width = out_shape
+    if block_size is None:
+        out[...] = rasterize(shapes, out_shape=out_shape, transform=transform, fill=0, all_touched=True, dtype=rasterio.uint8)
+        return out
+
+    tree = shapely.STRtree(labels.geometry.values)
+    for row_off in range(0, height, block_size):
+        for col_off in range(0, width, block_size):
+            window = windows.Window(col_off, row_off, min(block_size, width - col_off), min(block_size, height - row_off))
+            # Sorted tree indices keep the priority order of the shapes
+            hits = np.sort(tree.query(box(*windows.bounds(window, transform))))
+            if not len(hits):
+                continue
+            out[row_off:row_off + window.height, col_off:col_off + window.width] = rasterize(
+                [shapes[i] for i in hits],
+                out_shape=(window.height, window.width),
+                transform=windows.transform(window, transform),
+                fill=0,
+                all_touched=True,
+                dtype=rasterio.uint8,
+            )
+    return out
 
 class SatelliteImageProcessor:
-    def __init__(self, image_path, label_path, tile_size=(256, 256), overlap=0.25):
+    def __init__(self, image_path, label_path, tile_size=(256, 256), overlap=0.25,
+                 label_mode="scene", class_priority=None, label_block_size=None):
+        """
+        label_mode: "scene" rasterizes all labels once for the whole scene and slices each
+        tile's mask out of it; "per_tile" rasterizes every tile separately, class by class.
+        class_priority: optional {class_id: priority} deciding which class wins where labels
+        overlap in scene mode (default, and always in per_tile mode: the highest class_id).
+        label_block_size: fill the scene raster block by block into a memory map; used
+        automatically (LABEL_BLOCK_SIZE) for scenes above LABEL_MEMMAP_PIXELS pixels.
+        """
+        if label_mode not in ("scene", "per_tile"):
+            raise ValueError(f"Unknown label_mode '{label_mode}'. Use 'scene' or 'per_tile'.")
         self.image_path = image_path
         self.label_path = label_path
         self.tile_size = tile_size
         self.overlap = overlap
+        self.label_mode = label_mode
+        self.class_priority = class_priority
+        self.label_block_size = label_block_size
         self.image_dataset = None
         self.labels_gdf = None
 
@@ -23,11 +89,38 @@ class SatelliteImageProcessor:
         print(f"Loaded image: {self.image_path}")
         print(f"Loaded labels: {self.label_path} with {len(self.labels_gdf)} features.")
 
+    def rasterize_scene_labels(self, scratch_dir=None):
+        """
+        Rasterizes every label once into a scene-sized class raster aligned with the image.
+        Large scenes (or an explicit label_block_size) are filled block by block into a
+        memory-mapped .npy in scratch_dir.
+        """
+        width, height = self.image_dataset.width, self.image_dataset.height
+        block_size = self.label_block_size
+        if block_size is None and width * height > LABEL_MEMMAP_PIXELS:
+            block_size = LABEL_BLOCK_SIZE
+        out = None
+        if block_size is not None:
+            path = os.path.join(scratch_dir or tempfile.gettempdir(), "scene_labels.npy")
+            out = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8, shape=(height, width))
+        return rasterize_labels(
+            self.labels_gdf, (height, width), self.image_dataset.transform,
+            class_priority=self.class_priority, block_size=block_size, out=out,
+        )
+
     def create_tiles(self):
         """Generates image tiles and corresponding segmentation masks."""
         if self.image_dataset is None or self.labels_gdf is None:
             raise ValueError("Data not loaded. Call load_data() first.")
-
+        if self.label_mode == "scene":
+            with tempfile.TemporaryDirectory() as scratch_dir:
+                start = time.perf_counter()
+                scene_labels = self.rasterize_scene_labels(scratch_dir)
+                return self._create_tiles(scene_labels, time.perf_counter() - start)
+        return self._create_tiles(None, 0.0)
+
+    def _create_tiles(self, scene_labels, rasterize_seconds):
+        """Tiles the image; masks are slices of scene_labels, or rasterized per tile if it is None."""
         width, height = self.image_dataset.width, self.image_dataset.height
         tile_w, tile_h = self.tile_size
         stride_w = int(tile_w * (1 - self.overlap))
@@ -35,57 +128,72 @@ class SatelliteImageProcessor:
 
         tiles = []
         masks = []
+        # Per-tile progress lines slowed this loop down; count and time instead, report once
+        labelled_tiles = 0
+        read_seconds = 0.0
 
         for y in range(0, height - tile_h + 1, stride_h):
             for x in range(0, width - tile_w + 1, stride_w):
-                # Define tile bounding box
-                bbox = box(
-                    self.image_dataset.xy(x, y)[0],
-                    self.image_dataset.xy(x, y)[1],
-                    self.image_dataset.xy(x + tile_w, y + tile_h)[0],
-                    self.image_dataset.xy(x + tile_w, y + tile_h)[1]
-                )
-
-                # Extract image tile
-                out_image, out_transform = mask(self.image_dataset, [bbox], crop=True)
+                # The image tile and its label mask come from the same pixel window
+                window = windows.Window(x, y, tile_w, tile_h)
+                start = time.perf_counter()
+                out_image = self.image_dataset.read(window=window)
+                read_seconds += time.perf_counter() - start
                 # Ensure image has 3 channels (RGB) and is in HWC format
                 if out_image.shape[0] == 4: # Assuming RGBA or similar, drop alpha
                     out_image = out_image[:3, :, :]
                 out_image = np.transpose(out_image, (1, 2, 0)) # C, H, W -> H, W, C
 
-                # Rasterize labels to create mask for the current tile
-                tile_labels = self.labels_gdf.cx[bbox.bounds[0]:bbox.bounds[2], bbox.bounds[1]:bbox.bounds[3]]
-                
-                mask_image = np.zeros((tile_h, tile_w), dtype=np.uint8)
-                if not tile_labels.empty:
-                    # Assuming 'class_id' column exists in labels_gdf for multi-class segmentation
-                    # Class ID 0 is typically reserved for background
-                    for class_id in tile_labels['class_id'].unique():
-                        if class_id == 0: # Skip background class if present in labels
-                            continue
-                        class_geometries = tile_labels[tile_labels['class_id'] == class_id].geometry
-                        shapes_for_class = [(geom, class_id) for geom in class_geometries]
-                        
-                        # Rasterize each class into the mask_image
-                        # Use merge_alg=MergeAlg.replace to ensure higher class_id overwrites lower if overlaps
-                        rasterized_class_mask = rasterize(
-                            shapes=shapes_for_class,
-                            out_shape=(tile_h, tile_w),
-                            transform=out_transform,
-                            fill=0, # Background value
-                            all_touched=True,
-                            dtype=rasterio.uint8
-                        )
-                        mask_image = np.maximum(mask_image, rasterized_class_mask) # Combine masks, higher class_id takes precedence
-                        print(f"  Rasterized class_id {class_id} for tile at ({x}, {y})")
+                if scene_labels is not None:
+                    # Labels were rasterized once for the scene; the tile mask is a view of its slice,
+                    # copied when the masks are stacked below
+                    mask_image = scene_labels[y:y + tile_h, x:x + tile_w]
+                    labelled_tiles += bool(mask_image.any())
                 else:
-                    print(f"  No labels found for tile at ({x}, {y})")
+                    start = time.perf_counter()
+                    out_transform = self.image_dataset.window_transform(window)
+                    bbox = box(*windows.bounds(window, self.image_dataset.transform))
+                    mask_image, has_labels = self._rasterize_tile_labels(bbox, out_transform, tile_h, tile_w)
+                    rasterize_seconds += time.perf_counter() - start
+                    labelled_tiles += has_labels
 
                 tiles.append(out_image)
                 masks.append(mask_image)
-        
+
+        observe_stage("create_tiles_read", read_seconds)
+        observe_stage("create_tiles_rasterize", rasterize_seconds)
+        print(f"Created {len(tiles)} tiles ({labelled_tiles} with labels): "
+              f"{read_seconds:.2f}s reading, {rasterize_seconds:.2f}s rasterizing labels ({self.label_mode})")
         return np.array(tiles), np.array(masks)
 
+    def _rasterize_tile_labels(self, bbox, out_transform, tile_h, tile_w):
+        """Per-tile mode: rasterizes the labels intersecting one tile, class by class."""
+        tile_labels = self.labels_gdf.cx[bbox.bounds[0]:bbox.bounds[2], bbox.bounds[1]:bbox.bounds[3]]
+        
+        mask_image = np.zeros((tile_h, tile_w), dtype=np.uint8)
+        if tile_labels.empty:
+            return mask_image, False
+        # Assuming 'class_id' column exists in labels_gdf for multi-class segmentation
+        # Class ID 0 is typically reserved for background
+        for class_id in tile_labels['class_id'].unique():
+            if class_id == 0: # Skip background class if present in labels
+                continue
+            class_geometries = tile_labels[tile_labels['class_id'] == class_id].geometry
+            shapes_for_class = [(geom, class_id) for geom in class_geometries]
+            
+            # Rasterize each class into the mask_image
+            # Use merge_alg=MergeAlg.replace to ensure higher class_id overwrites lower if overlaps
+            rasterized_class_mask = rasterize(
+                shapes=shapes_for_class,
+                out_shape=(tile_h, tile_w),
+                transform=out_transform,
+                fill=0, # Background value
+                all_touched=True,
+                dtype=rasterio.uint8
+            )
+            mask_image = np.maximum(mask_image, rasterized_class_mask) # Combine masks, higher class_id takes precedence
+        return mask_image, True
+
     def normalize_image(self, image_tile):
         """Normalizes image pixel values to 0-1."""
         return image_tile.astype(np.float32) / 255.0
@@ -107,7 +215,10 @@ class SatelliteImageProcessor:
     def run_pipeline(self):
         """Runs the complete preprocessing pipeline."""
         self.load_data()
-        tiles, masks = self.create_tiles()
+        # Tile reads go through GDAL's block cache; tuned settings avoid re-decoding
+        # compressed blocks shared by overlapping tiles
+        with gdal_env():
+            tiles, masks = self.create_tiles()
         
         processed_images = []
         processed_masks = []
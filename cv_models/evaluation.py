@@ -0,0 +1,189 @@
+import numpy as np
+import torch
+
+
+class ConfusionMatrix:
+    """
+    num_classes x num_classes confusion matrix accumulated on the model's device.
+    Rows are ground truth, columns are predictions. Updates are a single bincount per
+    batch with no host transfer; metrics are computed with one transfer at the end.
+    """
+
+    def __init__(self, num_classes, device="cpu", ignore_index=None):
+        self.num_classes = num_classes
+        self.ignore_index = ignore_index
+        self.matrix = torch.zeros((num_classes, num_classes), dtype=torch.int64, device=device)
+
+    def update(self, predictions, targets):
+        """predictions: (N, H, W) class indices or (N, C, H, W) logits; targets: (N, H, W)."""
+        if predictions.dim() == targets.dim() + 1:
+            predictions = torch.argmax(predictions, dim=1)
+        predictions = predictions.reshape(-1)
+        targets = targets.reshape(-1).to(predictions.device)
+
+        valid = (targets >= 0) & (targets < self.num_classes)
+        if self.ignore_index is not None:
+            valid &= targets != self.ignore_index
+        indices = targets[valid] * self.num_classes + predictions[valid]
+        self.matrix += torch.bincount(indices, minlength=self.num_classes ** 2).reshape(self.num_classes, self.num_classes)
+
+    def all_reduce(self):
+        """Sums the matrix over all ranks of a torch.distributed job."""
+        import torch.distributed as dist
+        dist.all_reduce(self.matrix, op=dist.ReduceOp.SUM)
+
+    def reset(self):
+        self.matrix.zero_()
+
+    def compute(self):
+        """
+        Returns overall pixel accuracy, per-class IoU / F1 / Dice (F1 and Dice coincide for
+        hard masks), and their means over classes present in the ground truth or predictions.
+        """
+        matrix = self.matrix.double().cpu().numpy()
+        true_positive = np.diag(matrix)
+        false_positive = matrix.sum(axis=0) - true_positive
+        false_negative = matrix.sum(axis=1) - true_positive
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            iou = true_positive / (true_positive + false_positive + false_negative)
+            precision = true_positive / (true_positive + false_positive)
+            recall = true_positive / (true_positive + false_negative)
+            f1 = 2 * precision * recall / (precision + recall)
+            dice = 2 * true_positive / (2 * true_positive + false_positive + false_negative)
+
+        # Classes absent from both ground truth and predictions have undefined scores
+        present = (true_positive + false_positive + false_negative) > 0
+        total = matrix.sum()
+        return {
+            "pixel_accuracy": float(true_positive.sum() / total) if total else 0.0,
+            "per_class_iou": np.where(present, iou, np.nan).tolist(),
+            "per_class_f1": np.where(present, np.nan_to_num(f1), np.nan).tolist(),
+            "per_class_dice": np.where(present, dice, np.nan).tolist(),
+            "mean_iou": float(np.nanmean(iou[present])) if present.any() else 0.0,
+            "mean_f1": float(np.nanmean(np.nan_to_num(f1[present]))) if present.any() else 0.0,
+            "mean_dice": float(np.nanmean(dice[present])) if present.any() else 0.0,
+        }
+
+
+def evaluate_loader(loader, model, device, num_classes):
+    """Runs the model over a tile loader and returns segmentation metrics."""
+    confusion = ConfusionMatrix(num_classes, device=device)
+    was_training = model.training
+    model.eval()
+    with torch.no_grad():
+        for x, y in loader:
+            confusion.update(model(x.to(device)), y.to(device))
+    if was_training:
+        model.train()
+    return confusion.compute()
+
+
+def _window_starts(length, window, stride):
+    starts = list(range(0, max(length - window, 0) + 1, stride))
+    # Make sure the last window reaches the far edge
+    if starts[-1] + window < length:
+        starts.append(length - window)
+    return starts
+
+
+def sliding_window_predict(model, image, num_classes, window=256, overlap=0.25, batch_size=8):
+    """
+    Predicts class logits for a full scene of any size.
+    image: (C, H, W) float tensor on the model's device. Windows overlapping by `overlap`
+    are batched through the model and their logits averaged where they overlap.
+    Returns (num_classes, H, W) logits.
+    """
+    _, height, width = image.shape
+    # Pad scenes smaller than a window so every window has the model's input size
+    pad_h, pad_w = max(window - height, 0), max(window - width, 0)
+    if pad_h or pad_w:
+        # Reflect padding must be smaller than the padded dimension, as in UNET.forward
+        mode = "reflect" if pad_h < height and pad_w < width else "replicate"
+        image = torch.nn.functional.pad(image, (0, pad_w, 0, pad_h), mode=mode)
+    _, padded_h, padded_w = image.shape
+
+    stride = max(1, int(window * (1 - overlap)))
+    positions = [(y, x) for y in _window_starts(padded_h, window, stride) for x in _window_starts(padded_w, window, stride)]
+
+    logits = torch.zeros((num_classes, padded_h, padded_w), dtype=torch.float32, device=image.device)
+    counts = torch.zeros((1, padded_h, padded_w), dtype=torch.float32, device=image.device)
+    with torch.no_grad():
+        for i in range(0, len(positions), batch_size):
+            batch_positions = positions[i:i + batch_size]
+            batch = torch.stack([image[:, y:y + window, x:x + window] for y, x in batch_positions])
+            output = model(batch).float()
+            for (y, x), window_logits in zip(batch_positions, output):
+                logits[:, y:y + window, x:x + window] += window_logits
+                counts[:, y:y + window, x:x + window] += 1
+    logits /= counts
+    return logits[:, :height, :width]
+
+
+def evaluate_scene(model, image_path, label_path, num_classes, device, window=256, overlap=0.25, batch_size=8, confusion=None):
+    """
+    Evaluates the model on a full validation scene with sliding-window inference.
+    Labels are rasterized once for the whole scene. Pass a ConfusionMatrix to accumulate
+    over several scenes; returns the (possibly shared) ConfusionMatrix.
+    """
+    import geopandas as gpd
+    import rasterio
+    from cv_models.data_preprocessing import rasterize_labels
+
+    confusion = confusion or ConfusionMatrix(num_classes, device=device)
+    with rasterio.open(image_path) as src:
+        image_array = src.read()
+        if image_array.shape[0] == 4:
+            image_array = image_array[:3]
+        labels = gpd.read_file(label_path)
+        if labels.crs is not None and src.crs is not None and labels.crs != src.crs:
+            labels = labels.to_crs(src.crs)
+        # Higher class ids take precedence, matching SatelliteImageProcessor.create_tiles
+        target = rasterize_labels(labels, (src.height, src.width), src.transform)
+
+    image = torch.from_numpy(image_array.astype(np.float32) / 255.0).to(device)
+    was_training = model.training
+    model.eval()
+    logits = sliding_window_predict(model, image, num_classes, window=window, overlap=overlap, batch_size=batch_size)
+    if was_training:
+        model.train()
+    confusion.update(logits.unsqueeze(0), torch.from_numpy(target.astype(np.int64)).unsqueeze(0).to(device))
+    return confusion
+
+
+def format_metrics(metrics, class_names=None):
+    """Formats a metrics dict from ConfusionMatrix.compute() for logging."""
+    lines = [
+        f"Pixel accuracy: {metrics['pixel_accuracy'] * 100:.2f}% | mIoU: {metrics['mean_iou']:.4f} | "
+        f"mean F1: {metrics['mean_f1']:.4f} | mean Dice: {metrics['mean_dice']:.4f}"
+    ]
+    for class_id, (iou, f1) in enumerate(zip(metrics["per_class_iou"], metrics["per_class_f1"])):
+        name = (class_names or {}).get(class_id, f"class {class_id}")
+        lines.append(f"  {name}: IoU {iou:.4f}, F1 {f1:.4f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+    from cv_models.model import MODEL_VARIANTS, load_model
+
+    parser = argparse.ArgumentParser(description="Sliding-window evaluation of a trained UNET on full validation scenes.")
+    parser.add_argument("--model", default="trained_unet_model.pth")
+    parser.add_argument("--image", nargs="+", required=True, help="Validation scene(s)")
+    parser.add_argument("--labels", nargs="+", required=True, help="Label file for each scene, in the same order")
+    parser.add_argument("--num-classes", type=int, default=5)
+    parser.add_argument("--variant", default="unet", choices=sorted(MODEL_VARIANTS))
+    parser.add_argument("--window", type=int, default=256)
+    parser.add_argument("--overlap", type=float, default=0.25)
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args()
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model = load_model(args.model, variant=args.variant, num_classes=args.num_classes, map_location=device).to(device)
+
+    confusion = ConfusionMatrix(args.num_classes, device=device)
+    for image_path, label_path in zip(args.image, args.labels):
+        print(f"Evaluating {image_path}")
+        evaluate_scene(model, image_path, label_path, args.num_classes, device,
+                       window=args.window, overlap=args.overlap, batch_size=args.batch_size, confusion=confusion)
+    print(format_metrics(confusion.compute()))
@@ -1,18 +1,48 @@
+import time
 import torch
+import torch.nn.functional as F
 import numpy as np
 import rasterio
 from rasterio.features import shapes
+from rasterio.windows import Window
 from shapely.geometry import shape
 import geopandas as gpd
-from cv_models.model import UNET # Assuming UNET is defined in model.py
+from cv_models.model import load_model # Builds UNET variants registered in model.py
+from cv_models.cog import content_mask, gdal_env
+from dss.metrics import timer
+
+# Test-time augmentation views as (forward transform, inverse transform) on NCHW tensors
+TTA_TRANSFORMS = {
+    "identity": (lambda x: x, lambda y: y),
+    "hflip": (lambda x: x.flip(-1), lambda y: y.flip(-1)),
+    "vflip": (lambda x: x.flip(-2), lambda y: y.flip(-2)),
+    "rot180": (lambda x: x.rot90(2, (-2, -1)), lambda y: y.rot90(-2, (-2, -1))),
+    "rot90": (lambda x: x.rot90(1, (-2, -1)), lambda y: y.rot90(-1, (-2, -1))),
+    "rot270": (lambda x: x.rot90(3, (-2, -1)), lambda y: y.rot90(-3, (-2, -1))),
+    "transpose": (lambda x: x.transpose(-2, -1), lambda y: y.transpose(-2, -1)),
+    "antitranspose": (lambda x: x.rot90(1, (-2, -1)).flip(-1), lambda y: y.flip(-1).rot90(-1, (-2, -1))),
+}
+# Views that swap height and width; only usable on square inputs
+_SHAPE_SWAPPING = {"rot90", "rot270", "transpose", "antitranspose"}
+
+# Named TTA modes. Cost grows linearly with the number of views (and scales).
+TTA_MODES = {
+    "none": ["identity"],
+    "flip": ["identity", "hflip"],
+    "flip4": ["identity", "hflip", "vflip", "rot180"],
+    "d4": ["identity", "hflip", "vflip", "rot180", "rot90", "rot270", "transpose", "antitranspose"],
+}
 
 class ModelInference:
-    def __init__(self, model_path, in_channels=3, num_classes=1, device="cuda" if torch.cuda.is_available() else "cpu"):
+    def __init__(self, model_path, in_channels=3, num_classes=1, device="cuda" if torch.cuda.is_available() else "cpu", variant="unet"):
         self.device = device
-        self.model = UNET(in_channels=in_channels, num_classes=num_classes).to(self.device)
-        self.model.load_state_dict(torch.load(model_path, map_location=self.device))
+        # Pruned checkpoints carry their own variant and widths; plain state_dicts use `variant`
+        self.model = load_model(model_path, variant=variant, in_channels=in_channels,
+                                num_classes=num_classes, map_location=self.device).to(self.device)
         self.model.eval()
-        print(f"Model loaded from {model_path} and moved to {self.device}")
+        # Per-stage seconds (tile_read, forward_pass, polygonize) of the last prediction
+        self.last_timings = {}
+        print(f"Model ({variant}) loaded from {model_path} and moved to {self.device}")
 
     def preprocess_image(self, image_array):
         """
@@ -25,6 +55,66 @@ class ModelInference:
         image = torch.from_numpy(image).unsqueeze(0) # Add batch dimension
         return image.to(self.device)
 
+    def predict_logits(self, image_tensor, tta="none", scales=None, max_views_per_batch=8):
+        """
+        Runs the model with optional test-time augmentation and returns (1, num_classes, H, W) logits.
+        All augmented views of an input are stacked into one batch (up to max_views_per_batch)
+        so TTA costs one larger forward pass rather than one pass per view. De-augmented
+        logits are accumulated in place into a single output buffer and averaged.
+        scales: optional multi-scale factors, e.g. (0.75, 1.0, 1.25).
+        """
+        if tta not in TTA_MODES:
+            raise ValueError(f"Unknown TTA mode '{tta}'. Available modes: {sorted(TTA_MODES)}")
+        _, _, height, width = image_tensor.shape
+        output = None
+        num_views = 0
+
+        with torch.no_grad():
+            for scale in scales or (1.0,):
+                x = image_tensor
+                if scale != 1.0:
+                    x = F.interpolate(image_tensor, scale_factor=scale, mode="bilinear", align_corners=False)
+                square = x.shape[-2] == x.shape[-1]
+                views = [name for name in TTA_MODES[tta] if square or name not in _SHAPE_SWAPPING]
+
+                for i in range(0, len(views), max_views_per_batch):
+                    chunk = views[i:i + max_views_per_batch]
+                    batch = torch.cat([TTA_TRANSFORMS[name][0](x) for name in chunk])
+                    with timer("forward_pass", self.last_timings):
+                        predictions = self.model(batch)
+                    for name, prediction in zip(chunk, predictions.split(1)):
+                        restored = TTA_TRANSFORMS[name][1](prediction)
+                        if scale != 1.0:
+                            restored = F.interpolate(restored, size=(height, width), mode="bilinear", align_corners=False)
+                        if output is None:
+                            output = restored.float().clone()
+                        else:
+                            output.add_(restored)
+                        num_views += 1
+
+        self.last_num_views = num_views
+        return output.div_(num_views)
+
+    def measure_tta_cost(self, image_array, modes=None, scales=None, runs=3):
+        """
+        Reports mean latency per TTA mode on an HWC image, with its overhead relative to
+        plain inference, so a mode can be chosen against a latency budget.
+        """
+        image = self.preprocess_image(image_array)
+        results = {}
+        for mode in modes or TTA_MODES:
+            self.predict_logits(image, tta=mode, scales=scales)  # warm-up
+            start = time.perf_counter()
+            for _ in range(runs):
+                self.predict_logits(image, tta=mode, scales=scales)
+            results[mode] = {"ms": (time.perf_counter() - start) / runs * 1000, "views": self.last_num_views}
+        baseline = results.get("none", {}).get("ms")
+        for mode, result in results.items():
+            result["overhead"] = result["ms"] / baseline if baseline else None
+            print(f"TTA {mode}: {result['views']} views, {result['ms']:.1f} ms"
+                  + (f" ({result['overhead']:.2f}x)" if baseline else ""))
+        return results
+
     def postprocess_mask(self, prediction_tensor, original_transform, original_crs):
         """
         Converts model prediction (tensor) into vector polygons.
@@ -33,7 +123,16 @@ class ModelInference:
         # prediction_tensor is (1, num_classes, H, W)
         predicted_mask = torch.argmax(prediction_tensor, dim=1).squeeze().cpu().numpy()
         # predicted_mask is now (H, W) with class indices
+        return self.vectorize_mask(predicted_mask, original_transform, original_crs)
 
+    def vectorize_mask(self, predicted_mask, transform, crs):
+        """
+        Polygonizes an (H, W) class-index mask into a GeoDataFrame with class_id and area_sq_m.
+        """
+        with timer("polygonize", self.last_timings):
+            return self._polygonize(predicted_mask, transform, crs)
+
+    def _polygonize(self, predicted_mask, transform, crs):
         # Generate shapes from the multi-class mask
         # Iterate over each class to extract polygons
         all_geometries = []
@@ -46,7 +145,7 @@ class ModelInference:
             results = (
                 {'properties': {'class_id': class_id, 'raster_val': v}, 'geometry': s}
                 for i, (s, v) in enumerate(
-                    shapes(class_mask, transform=original_transform))
+                    shapes(class_mask, transform=transform))
             )
             
             for geom in results:
@@ -57,31 +156,82 @@ class ModelInference:
                     })
         
         if not all_geometries:
-            return gpd.GeoDataFrame({'geometry': []}, crs=original_crs)
+            return gpd.GeoDataFrame({'geometry': []}, crs=crs)
 
-        gdf = gpd.GeoDataFrame(all_geometries, crs=original_crs)
+        gdf = gpd.GeoDataFrame(all_geometries, crs=crs)
 
         # Add properties like area, etc.
         gdf['area_sq_m'] = gdf.geometry.area
         return gdf
 
-    def predict_and_vectorize(self, image_path, output_geojson_path=None):
+    def predict_window(self, src, core_window, halo=64, tta="none", tta_scales=None):
+        """
+        Predicts the class mask of one window of an open rasterio dataset.
+        The window is read with `halo` extra pixels of context on each side (clipped to the
+        image) so predictions at the window edge match a whole-scene run; only the core
+        window is returned. Returns (H, W) uint8 class indices for core_window.
+        """
+        col_start = max(0, core_window.col_off - halo)
+        row_start = max(0, core_window.row_off - halo)
+        col_end = min(src.width, core_window.col_off + core_window.width + halo)
+        row_end = min(src.height, core_window.row_off + core_window.height + halo)
+        read_window = Window(col_start, row_start, col_end - col_start, row_end - row_start)
+
+        self.last_timings = {}
+        with timer("tile_read", self.last_timings):
+            image_array = src.read(window=read_window)
+        if image_array.shape[0] == 4: # Assuming RGBA or similar, drop alpha
+            image_array = image_array[:3, :, :]
+        image_array = np.transpose(image_array, (1, 2, 0))
+
+        prediction = self.predict_logits(self.preprocess_image(image_array), tta=tta, scales=tta_scales)
+        mask = torch.argmax(prediction, dim=1).squeeze(0).cpu().numpy().astype(np.uint8)
+
+        top = int(core_window.row_off - read_window.row_off)
+        left = int(core_window.col_off - read_window.col_off)
+        return mask[top:top + int(core_window.height), left:left + int(core_window.width)]
+
+    def predict_and_vectorize(self, image_path, output_geojson_path=None, tta="none", tta_scales=None, skip_empty=False):
         """
         Performs inference on a satellite image and saves vectorized assets.
+        tta / tta_scales enable batched test-time augmentation (see predict_logits).
+        With skip_empty, a coarse pass over the image's overviews finds nodata, black and
+        cloud areas: scenes without content skip inference, and predictions inside such
+        areas are discarded instead of being vectorized as assets.
         """
-        with rasterio.open(image_path) as src:
-            image_array = src.read()
+        with gdal_env(), rasterio.open(image_path) as src:
+            content = None
+            self.last_num_views, self.last_inference_seconds = 0, 0.0
+            self.last_timings = {}
+            if skip_empty:
+                content, factor = content_mask(src)
+                if not content.any():
+                    print(f"No content found in {image_path}; skipping inference.")
+                    vector_assets_gdf = gpd.GeoDataFrame({'geometry': []}, crs=src.crs)
+                    if output_geojson_path:
+                        vector_assets_gdf.to_file(output_geojson_path, driver='GeoJSON')
+                    return vector_assets_gdf
+
+            with timer("tile_read", self.last_timings):
+                image_array = src.read()
             # Assuming image_array is C, H, W. Convert to HWC for preprocessing.
             if image_array.shape[0] == 4: # Assuming RGBA or similar, drop alpha
                 image_array = image_array[:3, :, :]
             image_array = np.transpose(image_array, (1, 2, 0)) # C, H, W -> H, W, C
 
             preprocessed_image = self.preprocess_image(image_array)
-            
-            with torch.no_grad():
-                prediction = self.model(preprocessed_image)
-            
-            vector_assets_gdf = self.postprocess_mask(prediction, src.transform, src.crs)
+
+            start = time.perf_counter()
+            prediction = self.predict_logits(preprocessed_image, tta=tta, scales=tta_scales)
+            self.last_inference_seconds = time.perf_counter() - start
+
+            if content is None:
+                vector_assets_gdf = self.postprocess_mask(prediction, src.transform, src.crs)
+            else:
+                predicted_mask = torch.argmax(prediction, dim=1).squeeze(0).cpu().numpy()
+                full_content = np.repeat(np.repeat(content, factor, axis=0), factor, axis=1)[:src.height, :src.width]
+                predicted_mask[~full_content] = 0
+                vector_assets_gdf = self.vectorize_mask(predicted_mask, src.transform, src.crs)
             
             if output_geojson_path:
                 vector_assets_gdf.to_file(output_geojson_path, driver='GeoJSON')
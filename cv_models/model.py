@@ -1,15 +1,39 @@
 import torch
 import torch.nn as nn
-import torchvision.transforms.functional as TF
+import torch.nn.functional as F
 
 class DoubleConv(nn.Module):
-    def __init__(self, in_channels, out_channels):
+    def __init__(self, in_channels, out_channels, mid_channels=None):
         super(DoubleConv, self).__init__()
+        # mid_channels is only smaller than out_channels after structured pruning
+        mid_channels = mid_channels or out_channels
         self.conv = nn.Sequential(
-            nn.Conv2d(in_channels, out_channels, 3, 1, 1, bias=False),
+            nn.Conv2d(in_channels, mid_channels, 3, 1, 1, bias=False),
+            nn.BatchNorm2d(mid_channels),
+            nn.ReLU(inplace=True),
+            nn.Conv2d(mid_channels, out_channels, 3, 1, 1, bias=False),
             nn.BatchNorm2d(out_channels),
             nn.ReLU(inplace=True),
-            nn.Conv2d(out_channels, out_channels, 3, 1, 1, bias=False),
+        )
+
+    def forward(self, x):
+        return self.conv(x)
+
+class SeparableDoubleConv(nn.Module):
+    """
+    DoubleConv built from depthwise-separable convolutions: a 3x3 depthwise conv followed
+    by a 1x1 pointwise conv. Roughly 8x fewer multiply-adds than DoubleConv at equal width.
+    """
+    def __init__(self, in_channels, out_channels, mid_channels=None):
+        super(SeparableDoubleConv, self).__init__()
+        mid_channels = mid_channels or out_channels
+        self.conv = nn.Sequential(
+            nn.Conv2d(in_channels, in_channels, 3, 1, 1, groups=in_channels, bias=False),
+            nn.Conv2d(in_channels, mid_channels, 1, bias=False),
+            nn.BatchNorm2d(mid_channels),
+            nn.ReLU(inplace=True),
+            nn.Conv2d(mid_channels, mid_channels, 3, 1, 1, groups=mid_channels, bias=False),
+            nn.Conv2d(mid_channels, out_channels, 1, bias=False),
             nn.BatchNorm2d(out_channels),
             nn.ReLU(inplace=True),
         )
@@ -19,16 +43,22 @@ class DoubleConv(nn.Module):
 
 class UNET(nn.Module):
     def __init__(
-        self, in_channels=3, num_classes=1, features=[64, 128, 256, 512],
+        self, in_channels=3, num_classes=1, features=[64, 128, 256, 512], separable=False,
     ):
         super(UNET, self).__init__()
+        self.num_classes = num_classes
+        self.features = list(features)
+        self.separable = separable
+        block = SeparableDoubleConv if separable else DoubleConv
+        # Inputs are padded to a multiple of this so every pooled size halves exactly
+        self.size_multiple = 2 ** len(features)
         self.ups = nn.ModuleList()
         self.downs = nn.ModuleList()
         self.pool = nn.MaxPool2d(kernel_size=2, stride=2)
 
         # Down part of UNET
         for feature in features:
-            self.downs.append(DoubleConv(in_channels, feature))
+            self.downs.append(block(in_channels, feature))
             in_channels = feature
 
         # Up part of UNET
@@ -38,12 +68,21 @@ class UNET(nn.Module):
                     feature*2, feature, kernel_size=2, stride=2,
                 )
             )
-            self.ups.append(DoubleConv(feature*2, feature))
+            self.ups.append(block(feature*2, feature))
 
-        self.bottleneck = DoubleConv(features[-1], features[-1]*2)
+        self.bottleneck = block(features[-1], features[-1]*2)
         self.final_conv = nn.Conv2d(features[0], num_classes, kernel_size=1)
 
     def forward(self, x):
+        # Pad to a multiple of 2**depth so skip connections always match the upsampled
+        # tensors, instead of resizing them at every decoder stage; cropped back below.
+        height, width = x.shape[-2:]
+        pad_h = (-height) % self.size_multiple
+        pad_w = (-width) % self.size_multiple
+        if pad_h or pad_w:
+            mode = "reflect" if pad_h < height and pad_w < width else "replicate"
+            x = F.pad(x, (0, pad_w, 0, pad_h), mode=mode)
+
         skip_connections = []
 
         for down in self.downs:
@@ -58,13 +97,65 @@ class UNET(nn.Module):
             x = self.ups[idx](x)
             skip_connection = skip_connections[idx//2]
 
-            if x.shape != skip_connection.shape:
-                x = TF.resize(x, size=skip_connection.shape[2:])
-
             concat_skip = torch.cat((skip_connection, x), dim=1)
             x = self.ups[idx+1](concat_skip)
 
-        return self.final_conv(x)
+        x = self.final_conv(x)
+        if pad_h or pad_w:
+            x = x[..., :height, :width]
+        return x
+
+# Named model variants selectable from training, ModelInference and the Celery task.
+# Approximate CPU cost relative to "unet" at 256x256: small ~0.25x, lite ~0.07x, mobile ~0.04x.
+MODEL_VARIANTS = {
+    "unet": {"features": [64, 128, 256, 512], "separable": False},
+    "unet_small": {"features": [32, 64, 128, 256], "separable": False},
+    "unet_lite": {"features": [32, 64, 128, 256], "separable": True},
+    "unet_mobile": {"features": [16, 32, 64, 128], "separable": True},
+}
+
+def build_model(variant="unet", in_channels=3, num_classes=1, mid_channels=None):
+    """
+    Builds a registered UNET variant. mid_channels maps block names (e.g. "downs.0",
+    "bottleneck") to the reduced inner width of a structurally pruned model.
+    """
+    if variant not in MODEL_VARIANTS:
+        raise ValueError(f"Unknown model variant '{variant}'. Available variants: {sorted(MODEL_VARIANTS)}")
+    model = UNET(in_channels=in_channels, num_classes=num_classes, **MODEL_VARIANTS[variant])
+    for name, mid in (mid_channels or {}).items():
+        block = model.get_submodule(name)
+        first_conv = block.conv[0]
+        out_channels = block.conv[-2].num_features
+        in_ch = first_conv.in_channels
+        parent_name, _, child = name.rpartition(".")
+        parent = model.get_submodule(parent_name) if parent_name else model
+        new_block = type(block)(in_ch, out_channels, mid_channels=mid)
+        if isinstance(parent, nn.ModuleList):
+            parent[int(child)] = new_block
+        else:
+            setattr(parent, child, new_block)
+    return model
+
+def load_model(checkpoint_path, variant="unet", in_channels=3, num_classes=1, map_location="cpu"):
+    """
+    Loads a model from either a plain state_dict (saved by train.py) or a checkpoint
+    dict with a "config" entry (saved by cv_models/pruning.py), which records the
+    variant and pruned widths needed to rebuild the architecture.
+    """
+    checkpoint = torch.load(checkpoint_path, map_location=map_location)
+    if isinstance(checkpoint, dict) and "config" in checkpoint and "state_dict" in checkpoint:
+        config = checkpoint["config"]
+        model = build_model(
+            config.get("variant", variant),
+            in_channels=config.get("in_channels", in_channels),
+            num_classes=config.get("num_classes", num_classes),
+            mid_channels=config.get("mid_channels"),
+        )
+        model.load_state_dict(checkpoint["state_dict"])
+    else:
+        model = build_model(variant, in_channels=in_channels, num_classes=num_classes)
+        model.load_state_dict(checkpoint)
+    return model
 
 if __name__ == "__main__":
     # Example usage
@@ -76,4 +167,12 @@ if __name__ == "__main__":
     print(f"Input shape: {x.shape}")
     print(f"Output shape: {preds.shape}")
     assert preds.shape[1] == num_classes
-    assert preds.shape[2:] == x.shape[2:]
\ No newline at end of file
+    assert preds.shape[2:] == x.shape[2:]
+
+    # Inputs that are not a multiple of 16 are padded internally, not resized
+    for variant in MODEL_VARIANTS:
+        odd = torch.randn((1, 3, 250, 190))
+        out = build_model(variant, num_classes=num_classes)(odd)
+        params = sum(p.numel() for p in build_model(variant, num_classes=num_classes).parameters())
+        print(f"{variant}: output {tuple(out.shape)}, {params / 1e6:.2f}M parameters")
+        assert out.shape[2:] == odd.shape[2:]
\ No newline at end of file
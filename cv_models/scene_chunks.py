@@ -0,0 +1,70 @@
+import geopandas as gpd
+import numpy as np
+import shapely
+from rasterio.windows import Window
+
+
+def plan_chunks(width, height, chunk_size=2048):
+    """
+    Splits a width x height scene into non-overlapping chunk windows (row-major order).
+    Windows are plain dicts so they serialize through the Celery broker as JSON.
+    """
+    chunks = []
+    for row_off in range(0, height, chunk_size):
+        for col_off in range(0, width, chunk_size):
+            chunks.append({
+                "index": len(chunks),
+                "col_off": col_off,
+                "row_off": row_off,
+                "width": min(chunk_size, width - col_off),
+                "height": min(chunk_size, height - row_off),
+            })
+    return chunks
+
+
+def chunk_window(chunk):
+    return Window(chunk["col_off"], chunk["row_off"], chunk["width"], chunk["height"])
+
+
+def seam_lines(width, height, chunk_size, transform):
+    """
+    Internal chunk boundaries of a scene as lines in the image CRS. Polygons touching one
+    of these may continue in the neighbouring chunk and have to be merged.
+    """
+    lines = []
+    for col in range(chunk_size, width, chunk_size):
+        lines.append([transform * (col, 0), transform * (col, height)])
+    for row in range(chunk_size, height, chunk_size):
+        lines.append([transform * (0, row), transform * (width, row)])
+    return shapely.linestrings(lines) if lines else np.array([], dtype=object)
+
+
+def merge_chunk_polygons(chunk_gdfs, seams, crs):
+    """
+    Combines the polygon GeoDataFrames of all chunks into one. Chunks are polygonized on
+    the same pixel grid, so a polygon cut by a seam has pieces whose edges coincide exactly;
+    per class, the pieces touching a seam are dissolved and split back into connected parts.
+    Polygons away from the seams are kept as they are.
+    """
+    chunk_gdfs = [gdf for gdf in chunk_gdfs if not gdf.empty]
+    if not chunk_gdfs:
+        return gpd.GeoDataFrame({"geometry": []}, crs=crs)
+    class_ids = np.concatenate([gdf["class_id"].to_numpy(dtype=np.int64) for gdf in chunk_gdfs])
+    geoms = np.concatenate([np.asarray(gdf.geometry.values) for gdf in chunk_gdfs])
+
+    on_seam = np.zeros(len(geoms), dtype=bool)
+    if len(seams):
+        tree = shapely.STRtree(geoms)
+        on_seam[np.unique(tree.query(seams, predicate="intersects")[1])] = True
+
+    out_geoms = [geoms[~on_seam]]
+    out_classes = [class_ids[~on_seam]]
+    for class_id in np.unique(class_ids[on_seam]):
+        selected = on_seam & (class_ids == class_id)
+        parts = shapely.get_parts(shapely.union_all(geoms[selected]))
+        out_geoms.append(parts)
+        out_classes.append(np.full(len(parts), class_id, dtype=np.int64))
+
+    gdf = gpd.GeoDataFrame({"class_id": np.concatenate(out_classes)}, geometry=np.concatenate(out_geoms), crs=crs)
+    gdf["area_sq_m"] = gdf.geometry.area
+    return gdf
@@ -1,11 +1,14 @@
+import os
 import torch
 import torch.nn as nn
 import torch.optim as optim
 from torch.utils.data import Dataset, DataLoader
 from torchvision import transforms
 import numpy as np
-from cv_models.model import UNET
+from cv_models.model import build_model
 from cv_models.data_preprocessing import SatelliteImageProcessor # Assuming this is ready
+from cv_models.training_engine import TrainingEngine, autocast_context
+from cv_models.evaluation import evaluate_loader, format_metrics
 
 # Placeholder for a custom dataset. In a real scenario, this would load processed tiles.
 class SatelliteDataset(Dataset):
@@ -36,13 +39,15 @@ class SatelliteDataset(Dataset):
         return image, mask
 
 def train_fn(loader, model, optimizer, loss_fn, scaler, device):
-    loop = 0
-    for batch_idx, (data, targets) in enumerate(loader):
+    # Single-epoch loop kept for compatibility; main() uses TrainingEngine.
+    running_loss = torch.zeros((), device=device)
+    num_batches = 0
+    for data, targets in loader:
         data = data.to(device=device)
         targets = targets.to(device=device)
 
-        # forward
-        with torch.cuda.amp.autocast():
+        # forward (bfloat16 autocast on CPU, float16 on CUDA)
+        with autocast_context(device):
             predictions = model(data)
             loss = loss_fn(predictions, targets)
 
@@ -52,33 +57,15 @@ def train_fn(loader, model, optimizer, loss_fn, scaler, device):
         scaler.step(optimizer)
         scaler.update()
 
-        loop += 1
-        if loop % 10 == 0:
-            print(f"Loss after {loop} batches: {loss.item():.4f}")
+        running_loss += loss.detach()
+        num_batches += 1
+    print(f"Mean loss over {num_batches} batches: {running_loss.item() / max(num_batches, 1):.4f}")
 
 def get_metrics(loader, model, device, num_classes):
-    # For multi-class, accuracy and Dice score need to be calculated per class or averaged.
-    # This is a simplified version for overall accuracy.
-    total_correct_pixels = 0
-    total_pixels = 0
-    model.eval()
-
-    with torch.no_grad():
-        for x, y in loader:
-            x = x.to(device)
-            y = y.to(device) # y is now (N, H, W) with class indices
-
-            predictions = model(x) # (N, num_classes, H, W)
-            predicted_masks = torch.argmax(predictions, dim=1) # (N, H, W) with class indices
-
-            total_correct_pixels += (predicted_masks == y).sum().item()
-            total_pixels += torch.numel(y)
-
-    accuracy = total_correct_pixels / total_pixels
-    print(f"Overall Accuracy: {accuracy*100:.2f}%")
-    # For a more robust evaluation, per-class IoU or F1-score would be calculated.
-    model.train()
-    return accuracy
+    # Per-class IoU/F1/Dice from an on-device confusion matrix; one host transfer at the end.
+    metrics = evaluate_loader(loader, model, device, num_classes)
+    print(format_metrics(metrics))
+    return metrics
 
 def main():
     # Hyperparameters
@@ -86,18 +73,31 @@ def main():
     DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
     BATCH_SIZE = 16
     NUM_EPOCHS = 10
-    NUM_WORKERS = 2 # Adjust based on your system
+    NUM_WORKERS = int(os.getenv("NUM_WORKERS", min(4, max(1, (os.cpu_count() or 2) // 4)))) # Data loading processes
     IMAGE_HEIGHT = 256
     IMAGE_WIDTH = 256
     PIN_MEMORY = True
     LOAD_MODEL = False # Set to True to resume training from a checkpoint
+    CHECKPOINT_PATH = "checkpoints/unet_checkpoint.pth"
+    CHECKPOINT_EVERY = 200 # Optimizer steps between checkpoints
+    ACCUMULATION_STEPS = 1 # Micro-batches per optimizer step (effective batch = BATCH_SIZE * ACCUMULATION_STEPS)
+    CHANNELS_LAST = DEVICE == "cpu" # channels_last convolutions are faster with oneDNN on CPU
 
     # Model, Loss, Optimizer
     NUM_CLASSES = 5 # e.g., 4 asset classes + 1 background
-    model = UNET(in_channels=3, num_classes=NUM_CLASSES).to(DEVICE)
+    MODEL_VARIANT = os.getenv("MODEL_VARIANT", "unet") # See MODEL_VARIANTS in model.py
+    model = build_model(MODEL_VARIANT, in_channels=3, num_classes=NUM_CLASSES).to(DEVICE)
     loss_fn = nn.CrossEntropyLoss() # For multi-class segmentation
     optimizer = optim.Adam(model.parameters(), lr=LEARNING_RATE)
-    scaler = torch.cuda.amp.GradScaler() # For mixed precision training
+    engine = TrainingEngine(
+        model, optimizer, loss_fn, DEVICE,
+        accumulation_steps=ACCUMULATION_STEPS,
+        channels_last=CHANNELS_LAST,
+        checkpoint_path=CHECKPOINT_PATH,
+        checkpoint_every=CHECKPOINT_EVERY,
+    )
+    if LOAD_MODEL:
+        engine.load_checkpoint()
 
     # Data loading
     # Replace with your actual paths to satellite imagery and label files
@@ -120,8 +120,9 @@ def main():
         train_dataset,
         batch_size=BATCH_SIZE,
         num_workers=NUM_WORKERS,
-        pin_memory=PIN_MEMORY,
+        pin_memory=PIN_MEMORY and DEVICE == "cuda",
         shuffle=True,
+        persistent_workers=NUM_WORKERS > 0,
     )
 
     val_dataset = SatelliteDataset(val_images, val_masks)
@@ -129,17 +130,17 @@ def main():
         val_dataset,
         batch_size=BATCH_SIZE,
         num_workers=NUM_WORKERS,
-        pin_memory=PIN_MEMORY,
+        pin_memory=PIN_MEMORY and DEVICE == "cuda",
         shuffle=False,
     )
 
-    # Training loop
-    for epoch in range(NUM_EPOCHS):
-        print(f"Epoch {epoch+1}/{NUM_EPOCHS}")
-        train_fn(train_loader, model, optimizer, loss_fn, scaler, DEVICE)
-        
-        # Evaluate on validation set
-        get_metrics(val_loader, model, DEVICE, NUM_CLASSES)
+    # Training loop (resumes from the checkpoint epoch when LOAD_MODEL is set)
+    engine.fit(
+        train_loader,
+        NUM_EPOCHS,
+        val_fn=lambda m: get_metrics(val_loader, m, DEVICE, NUM_CLASSES),  # Evaluate on validation set
+    )
+    torch.save(engine.model.state_dict(), "trained_unet_model.pth")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,170 @@
+import argparse
+import os
+
+import numpy as np
+import torch
+import torch.distributed as dist
+import torch.nn as nn
+import torch.optim as optim
+from torch.nn.parallel import DistributedDataParallel as DDP
+from torch.utils.data import DataLoader
+from torch.utils.data.distributed import DistributedSampler
+
+from cv_models.data_preprocessing import SatelliteImageProcessor
+from cv_models.evaluation import ConfusionMatrix, format_metrics
+from cv_models.model import MODEL_VARIANTS, build_model
+from cv_models.train import SatelliteDataset
+from cv_models.training_engine import TrainingEngine
+
+# Distributed data-parallel CPU training for the UNET.
+#
+# Single machine, 4 processes:
+#   torchrun --standalone --nproc_per_node=4 -m cv_models.train_ddp --image img.tif --labels labels.geojson
+# Two nodes, 8 processes each (run on every node):
+#   torchrun --nnodes=2 --nproc_per_node=8 --node_rank=<0|1> --rdzv_backend=c10d \
+#            --rdzv_endpoint=<host0>:29500 -m cv_models.train_ddp --image img.tif --labels labels.geojson
+
+
+def setup_distributed(threads_per_rank=None):
+    """
+    Initialises the gloo process group from the torchrun environment and splits the
+    node's cores between the local ranks so they do not oversubscribe each other.
+    Returns (rank, local_rank, world_size).
+    """
+    rank = int(os.environ.get("RANK", 0))
+    local_rank = int(os.environ.get("LOCAL_RANK", 0))
+    world_size = int(os.environ.get("WORLD_SIZE", 1))
+    local_world_size = int(os.environ.get("LOCAL_WORLD_SIZE", 1))
+
+    if threads_per_rank is None:
+        threads_per_rank = max(1, (os.cpu_count() or 1) // local_world_size)
+    torch.set_num_threads(threads_per_rank)
+    # gloo's own all-reduce threads compete with the compute threads for the same cores
+    torch.set_num_interop_threads(1)
+
+    dist.init_process_group(backend="gloo", rank=rank, world_size=world_size)
+    if rank == 0:
+        print(f"Initialised gloo process group: world_size={world_size}, {threads_per_rank} threads per rank")
+    return rank, local_rank, world_size
+
+
+def load_tiles(image_path, label_path, tile_size, cache_path, local_rank, seed):
+    """
+    Preprocesses the scene once per node (local rank 0) and shares the tiles with the other
+    local ranks through a .npz cache. The RNG is seeded so augmentation is identical on every
+    node, which keeps the DistributedSampler shards consistent across the job.
+    """
+    if local_rank == 0 and not os.path.exists(cache_path):
+        np.random.seed(seed)
+        processor = SatelliteImageProcessor(image_path, label_path, tile_size=tile_size)
+        images, masks = processor.run_pipeline()
+        tmp_path = f"{cache_path}.tmp.npz"
+        np.savez(tmp_path, images=images, masks=masks)
+        os.replace(tmp_path, cache_path)
+    dist.barrier()
+    data = np.load(cache_path)
+    return data["images"], data["masks"]
+
+
+def distributed_metrics(loader, model, device, num_classes):
+    """Segmentation metrics over every rank's validation shard, reduced with one all_reduce."""
+    confusion = ConfusionMatrix(num_classes, device=device)
+    model.eval()
+    with torch.no_grad():
+        for x, y in loader:
+            confusion.update(model(x.to(device)), y.to(device))
+    confusion.all_reduce()
+    model.train()
+    return confusion.compute()
+
+
+def all_reduce_epoch_stats(stats, device):
+    """Sums per-rank loss and throughput counters so rank 0 can report job-wide figures."""
+    values = torch.tensor(
+        [stats.get("loss_sum", 0.0), stats.get("batches", 0), stats.get("samples", 0)],
+        dtype=torch.float64, device=device,
+    )
+    dist.all_reduce(values, op=dist.ReduceOp.SUM)
+    seconds = torch.tensor([stats.get("seconds", 0.0)], dtype=torch.float64, device=device)
+    # The slowest rank determines the epoch time
+    dist.all_reduce(seconds, op=dist.ReduceOp.MAX)
+    loss_sum, batches, samples = values.tolist()
+    return loss_sum / max(batches, 1), samples / max(seconds.item(), 1e-9)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distributed CPU training for the UNET (launch with torchrun).")
+    parser.add_argument("--image", required=True, help="Training satellite image")
+    parser.add_argument("--labels", required=True, help="Training label GeoJSON/shapefile")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=16, help="Per-rank batch size")
+    parser.add_argument("--lr", type=float, default=1e-4, help="Base learning rate, scaled linearly by world size")
+    parser.add_argument("--num-classes", type=int, default=5)
+    parser.add_argument("--variant", default="unet", choices=sorted(MODEL_VARIANTS))
+    parser.add_argument("--tile-size", type=int, default=256)
+    parser.add_argument("--num-workers", type=int, default=1, help="DataLoader workers per rank")
+    parser.add_argument("--threads-per-rank", type=int, default=None, help="Defaults to cores / local ranks")
+    parser.add_argument("--accumulation-steps", type=int, default=1)
+    parser.add_argument("--checkpoint", default="checkpoints/unet_ddp_checkpoint.pth")
+    parser.add_argument("--resume", action="store_true")
+    parser.add_argument("--cache", default="checkpoints/tiles_cache.npz")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    threads = args.threads_per_rank
+    if threads is None:
+        # Leave room for this rank's data loading workers
+        local_world_size = int(os.environ.get("LOCAL_WORLD_SIZE", 1))
+        threads = max(1, (os.cpu_count() or 1) // local_world_size - args.num_workers)
+    rank, local_rank, world_size = setup_distributed(threads)
+    device = "cpu"
+    torch.manual_seed(args.seed)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.cache)), exist_ok=True)
+    images, masks = load_tiles(args.image, args.labels, (args.tile_size, args.tile_size), args.cache, local_rank, args.seed)
+    split_idx = int(len(images) * 0.8)
+    train_dataset = SatelliteDataset(images[:split_idx], masks[:split_idx])
+    val_dataset = SatelliteDataset(images[split_idx:], masks[split_idx:])
+
+    train_sampler = DistributedSampler(train_dataset, num_replicas=world_size, rank=rank, shuffle=True, seed=args.seed)
+    # Validation shards may be padded by a few repeated samples to equalise ranks; fine for monitoring
+    val_sampler = DistributedSampler(val_dataset, num_replicas=world_size, rank=rank, shuffle=False)
+    loader_kwargs = {
+        "batch_size": args.batch_size,
+        "num_workers": args.num_workers,
+        "persistent_workers": args.num_workers > 0,
+    }
+    train_loader = DataLoader(train_dataset, sampler=train_sampler, drop_last=True, **loader_kwargs)
+    val_loader = DataLoader(val_dataset, sampler=val_sampler, **loader_kwargs)
+
+    # Convert the memory format before wrapping: DDP registers its gradient buckets on the parameters it sees
+    model = DDP(build_model(args.variant, in_channels=3, num_classes=args.num_classes).to(memory_format=torch.channels_last))
+    optimizer = optim.Adam(model.parameters(), lr=args.lr * world_size)
+    engine = TrainingEngine(
+        model, optimizer, nn.CrossEntropyLoss(), device,
+        accumulation_steps=args.accumulation_steps,
+        channels_last=True,
+        checkpoint_path=args.checkpoint,
+        is_main_process=rank == 0,
+    )
+    if args.resume:
+        engine.load_checkpoint()
+
+    while engine.epoch < args.epochs:
+        train_sampler.set_epoch(engine.epoch)
+        engine.train_epoch(train_loader)
+        mean_loss, samples_per_sec = all_reduce_epoch_stats(engine.last_epoch_stats, device)
+        metrics = distributed_metrics(val_loader, engine.model, device, args.num_classes)
+        if rank == 0:
+            print(f"[epoch {engine.epoch}/{args.epochs}] loss {mean_loss:.4f} | "
+                  f"{samples_per_sec:.1f} samples/sec across {world_size} ranks")
+            print(format_metrics(metrics))
+
+    if rank == 0:
+        torch.save(engine.model.module.state_dict(), "trained_unet_model.pth")
+    dist.barrier()
+    dist.destroy_process_group()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import contextlib
+import os
+import time
+
+import torch
+
+
+def autocast_context(device, enabled=True):
+    """
+    Returns the mixed-precision context for a device: float16 autocast on CUDA,
+    bfloat16 autocast on CPU (supported by the oneDNN kernels on AVX512/AMX CPUs).
+    """
+    if not enabled:
+        return contextlib.nullcontext()
+    device_type = torch.device(device).type
+    if device_type == "cuda":
+        return torch.autocast(device_type="cuda", dtype=torch.float16)
+    if device_type == "cpu":
+        return torch.autocast(device_type="cpu", dtype=torch.bfloat16)
+    return contextlib.nullcontext()
+
+
+def make_grad_scaler(device, enabled=True):
+    """Loss scaling is only needed for float16 on CUDA; bfloat16 has float32's exponent range."""
+    return torch.amp.GradScaler("cuda", enabled=enabled and torch.device(device).type == "cuda")
+
+
+class TrainingEngine:
+    """
+    Training loop for the segmentation models with:
+      * device-appropriate autocast (bfloat16 on CPU, float16 + GradScaler on CUDA)
+      * gradient accumulation over `accumulation_steps` micro-batches
+      * optional channels_last memory format (faster convolutions on CPU)
+      * periodic atomic checkpoints and resume (mid-epoch resume skips exactly the batches
+        already trained on, since the shuffle order is seeded per epoch)
+      * throughput logging in samples/sec
+
+    Losses are accumulated on-device and only transferred to the host every
+    `log_every` optimizer steps, so the loop does not stall on a sync each batch.
+    """
+
+    def __init__(self, model, optimizer, loss_fn, device, accumulation_steps=1, use_amp=True,
+                 channels_last=False, checkpoint_path=None, checkpoint_every=500, log_every=50,
+                 is_main_process=True, shuffle_seed=0):
+        self.device = device
+        self.channels_last = channels_last
+        self.model = model.to(device)
+        if channels_last:
+            self.model = self.model.to(memory_format=torch.channels_last)
+        self.optimizer = optimizer
+        self.loss_fn = loss_fn
+        self.accumulation_steps = max(1, accumulation_steps)
+        self.use_amp = use_amp
+        self.scaler = make_grad_scaler(device, use_amp)
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.log_every = log_every
+        # In distributed runs only rank 0 logs and writes checkpoints
+        self.is_main_process = is_main_process
+        self.shuffle_seed = shuffle_seed
+        self.epoch = 0
+        self.global_step = 0
+        # Index of the next batch within the current epoch, used to skip ahead on resume
+        self.batch_in_epoch = 0
+        self.last_epoch_stats = {}
+
+    def _prepare(self, data, targets):
+        data = data.to(self.device, non_blocking=True)
+        if self.channels_last:
+            data = data.contiguous(memory_format=torch.channels_last)
+        return data, targets.to(self.device, non_blocking=True)
+
+    def _optimizer_step(self):
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
+        self.optimizer.zero_grad(set_to_none=True)
+        self.global_step += 1
+
+    def train_epoch(self, loader):
+        """Runs one epoch and returns the mean training loss."""
+        self.model.train()
+        self.optimizer.zero_grad(set_to_none=True)
+        running_loss = torch.zeros((), device=self.device)
+        num_batches = 0
+        samples = 0
+        window_samples = 0
+        window_start = time.perf_counter()
+        epoch_start = window_start
+        skip = self.batch_in_epoch
+        num_total = len(loader)
+
+        for batch_idx, (data, targets) in enumerate(loader):
+            if batch_idx < skip:
+                # Resuming mid-epoch: these batches were already trained on before the checkpoint
+                continue
+            data, targets = self._prepare(data, targets)
+
+            # Under DDP, skip the gradient all-reduce on micro-batches that do not end in a step
+            will_step = (batch_idx + 1) % self.accumulation_steps == 0 or batch_idx + 1 == num_total
+            sync_context = contextlib.nullcontext()
+            if not will_step and hasattr(self.model, "no_sync"):
+                sync_context = self.model.no_sync()
+
+            with sync_context:
+                with autocast_context(self.device, self.use_amp):
+                    predictions = self.model(data)
+                    loss = self.loss_fn(predictions, targets)
+                self.scaler.scale(loss / self.accumulation_steps).backward()
+
+            running_loss += loss.detach()
+            num_batches += 1
+            samples += data.shape[0]
+            window_samples += data.shape[0]
+            self.batch_in_epoch = batch_idx + 1
+
+            if self.batch_in_epoch % self.accumulation_steps == 0:
+                self._optimizer_step()
+
+                if self.is_main_process and self.log_every and self.global_step % self.log_every == 0:
+                    elapsed = time.perf_counter() - window_start
+                    print(f"Step {self.global_step}: loss {running_loss.item() / num_batches:.4f}, "
+                          f"{window_samples / elapsed:.1f} samples/sec")
+                    window_samples = 0
+                    window_start = time.perf_counter()
+
+                if self.checkpoint_path and self.checkpoint_every and self.global_step % self.checkpoint_every == 0:
+                    self.save_checkpoint()
+
+        # Flush a trailing partial accumulation window
+        if self.batch_in_epoch % self.accumulation_steps != 0:
+            self._optimizer_step()
+
+        elapsed = time.perf_counter() - epoch_start
+        mean_loss = running_loss.item() / max(num_batches, 1)
+        self.last_epoch_stats = {"loss_sum": running_loss.item(), "batches": num_batches, "samples": samples, "seconds": elapsed}
+        if self.is_main_process:
+            print(f"Epoch {self.epoch + 1} done: mean loss {mean_loss:.4f}, {samples / elapsed:.1f} samples/sec over {elapsed:.1f}s")
+        self.epoch += 1
+        self.batch_in_epoch = 0
+        if self.checkpoint_path:
+            self.save_checkpoint()
+        return mean_loss
+
+    def fit(self, train_loader, num_epochs, val_fn=None):
+        """Trains until num_epochs have completed, continuing from a resumed epoch if any."""
+        while self.epoch < num_epochs:
+            if self.is_main_process:
+                print(f"Epoch {self.epoch + 1}/{num_epochs}")
+            self._seed_sampler(train_loader)
+            self.train_epoch(train_loader)
+            if val_fn is not None:
+                val_fn(self.model)
+
+    def _seed_sampler(self, loader):
+        """Makes the epoch's batch order a function of the epoch, so a resumed epoch replays it."""
+        sampler = getattr(loader, "sampler", None)
+        if hasattr(sampler, "set_epoch"):
+            # DistributedSampler reshuffles per epoch (from its own seed) only when told the epoch number
+            sampler.set_epoch(self.epoch)
+        elif isinstance(sampler, torch.utils.data.RandomSampler):
+            sampler.generator = torch.Generator().manual_seed(self.shuffle_seed + self.epoch)
+
+    def _unwrapped_model(self):
+        # DistributedDataParallel wraps the model; checkpoints store the plain module
+        return getattr(self.model, "module", self.model)
+
+    def save_checkpoint(self, path=None):
+        """Writes a checkpoint atomically: a crash mid-write never corrupts the previous one."""
+        if not self.is_main_process:
+            return
+        path = path or self.checkpoint_path
+        state = {
+            "model": self._unwrapped_model().state_dict(),
+            "optimizer": self.optimizer.state_dict(),
+            "scaler": self.scaler.state_dict(),
+            "epoch": self.epoch,
+            "global_step": self.global_step,
+            "batch_in_epoch": self.batch_in_epoch,
+        }
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp.{os.getpid()}"
+        torch.save(state, tmp_path)
+        os.replace(tmp_path, path)
+
+    def load_checkpoint(self, path=None):
+        """Restores model, optimizer and progress from a checkpoint. Returns False if none exists."""
+        path = path or self.checkpoint_path
+        if not path or not os.path.exists(path):
+            print(f"No checkpoint found at {path}; starting from scratch.")
+            return False
+        state = torch.load(path, map_location=self.device)
+        self._unwrapped_model().load_state_dict(state["model"])
+        self.optimizer.load_state_dict(state["optimizer"])
+        self.scaler.load_state_dict(state["scaler"])
+        self.epoch = state["epoch"]
+        self.global_step = state["global_step"]
+        self.batch_in_epoch = state.get("batch_in_epoch", 0)
+        if self.is_main_process:
+            print(f"Resumed from {path} at epoch {self.epoch + 1}, step {self.global_step}")
+        return True
@@ -1,5 +1,12 @@
+import functools
+import hashlib
 import os
+import threading
+import time
+from collections import namedtuple
+
 import psycopg2
+import psycopg2.pool
 from psycopg2.extras import RealDictCursor
 import numpy as np
 
@@ -16,8 +23,8 @@ def get_db_connection():
 def fetch_village_dss_data(village_id=None, patta_holder_id=None):
     """
     Fetches DSS data for a given village_id or patta_holder_id from the materialized view.
-    Note: For patta_holder_id, we assume a mapping exists to village_id or we fetch all
-    patta holders for a village and then process. For now, we'll focus on village_id.
+    A patta holder is mapped to its village through the precomputed patta_holder_villages
+    table; request paths that already hold a PattaHolderResolver pass the village_id instead.
     """
     conn = None
     try:
@@ -25,10 +32,11 @@ def fetch_village_dss_data(village_id=None, patta_holder_id=None):
         cur = conn.cursor(cursor_factory=RealDictCursor)
         if village_id:
             cur.execute("SELECT * FROM village_dss_data WHERE village_id = %s", (village_id,))
-        # elif patta_holder_id:
-        #     # TODO: Implement logic to get village_id from patta_holder_id
-        #     # For now, this path is not fully supported without patta_holder_data table
-        #     raise NotImplementedError("Fetching by patta_holder_id is not yet implemented.")
+        elif patta_holder_id:
+            cur.execute(
+                "SELECT v.* FROM village_dss_data v JOIN patta_holder_villages p ON p.village_id = v.village_id WHERE p.patta_holder_id = %s",
+                (patta_holder_id,),
+            )
         else:
             raise ValueError("Either village_id or patta_holder_id must be provided.")
         
@@ -42,6 +50,227 @@ def fetch_village_dss_data(village_id=None, patta_holder_id=None):
         if conn:
             conn.close()
 
+# village_dss_data columns other than the geometry, in view order
+VILLAGE_ATTRIBUTES = (
+    "village_id", "village_name", "district_id", "district_name", "state_id", "state_name",
+    "land_type", "water_index", "population", "has_forest", "forest_area_percentage",
+    "nearest_groundwater_level", "nearest_groundwater_quality", "has_road_access", "distance_to_canal",
+    "asset_count", "farmland_area_sq_m", "water_body_count", "water_body_area_sq_m", "homestead_count", "forest_cover_area_sq_m",
+)
+# Always fetched so records can be identified and described in prompts
+VILLAGE_IDENTITY_COLUMNS = ("village_id", "village_name", "district_name", "state_name")
+
+def project_columns(attributes):
+    """
+    The village_dss_data columns needed for the given attributes (e.g. those referenced by
+    the active rules) plus the identity columns, in view order. Unknown names raise a
+    ValueError, so a rule referring to a misspelled or missing column is caught here rather
+    than silently never matching; it also keeps anything but known column names out of the
+    generated SQL.
+    """
+    wanted = set(attributes) | set(VILLAGE_IDENTITY_COLUMNS)
+    unknown = wanted.difference(VILLAGE_ATTRIBUTES)
+    if unknown:
+        raise ValueError(f"Unknown village_dss_data attributes: {', '.join(sorted(map(str, unknown)))}")
+    return tuple(column for column in VILLAGE_ATTRIBUTES if column in wanted)
+
+@functools.lru_cache(maxsize=32)
+def village_record_type(columns):
+    """
+    Compact record type (a namedtuple, no per-instance dict) for a village_dss_data projection.
+    get() gives the dict-style access the rule engine uses, returning None for unfetched columns.
+    """
+    index = {name: i for i, name in enumerate(columns)}
+
+    class VillageRecord(namedtuple("VillageRecord", columns)):
+        __slots__ = ()
+
+        def get(self, attribute, default=None):
+            i = index.get(attribute)
+            return self[i] if i is not None else default
+
+    return VillageRecord
+
+# Prepared statements only live as long as their connection, so they are kept on pooled
+# connections shared by all request threads. Each connection remembers which statements it
+# has prepared. Read-only, so connections run in autocommit mode. DB_POOL_MAX bounds the
+# connections per process; callers wait for a free one rather than failing.
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+
+class _PreparingConnection(psycopg2.extensions.connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+_pool = None
+_pool_pid = None
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    global _pool, _pool_pid
+    # A pool inherited through fork (e.g. gunicorn --preload) shares its sockets with the
+    # parent, so each process builds its own
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = psycopg2.pool.ThreadedConnectionPool(
+                    0, DB_POOL_MAX,
+                    host=os.getenv("DB_HOST", "localhost"),
+                    database=os.getenv("DB_NAME", "sih_dss"),
+                    user=os.getenv("DB_USER", "sih_user"),
+                    password=os.getenv("DB_PASSWORD", "sih_password"),
+                    connection_factory=_PreparingConnection,
+                )
+                _pool_pid = os.getpid()
+    return _pool
+
+def _execute_prepared(name, parameter_types, sql, params):
+    """
+    Executes `sql` as the named prepared statement on a pooled connection, preparing it on
+    first use there, and returns all rows as tuples. A failed call discards the connection so
+    a later one reconnects and prepares again (e.g. after the view was recreated).
+    """
+    with _pool_slots:
+        pool = _get_pool()
+        conn = pool.getconn()
+        broken = False
+        try:
+            conn.autocommit = True
+            cur = conn.cursor()
+            if name not in conn.prepared:
+                cur.execute(f"PREPARE {name} ({', '.join(parameter_types)}) AS {sql}")
+                conn.prepared.add(name)
+            cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+            rows = cur.fetchall()
+            cur.close()
+            return rows
+        except Exception:
+            broken = True
+            raise
+        finally:
+            pool.putconn(conn, close=broken or conn.closed)
+
+def fetch_village_records(village_ids, columns=VILLAGE_ATTRIBUTES):
+    """
+    Fetches only the given village_dss_data columns (see project_columns) for a list of
+    village ids, as {village_id: VillageRecord}. Uses a prepared statement per projection on
+    a reused connection and never reads the geometry; use fetch_village_geometry for that.
+    Database errors are raised rather than reported as missing villages.
+    """
+    columns = tuple(columns)
+    record_type = village_record_type(columns)
+    name = "village_records_" + hashlib.md5(",".join(columns).encode()).hexdigest()[:12]
+    try:
+        rows = _execute_prepared(
+            name, ["integer[]"],
+            f"SELECT {', '.join(columns)} FROM village_dss_data WHERE village_id = ANY($1)",
+            ([int(village_id) for village_id in village_ids],),
+        )
+    except Exception as e:
+        print(f"Error fetching village records: {e}")
+        raise
+    records = map(record_type._make, rows)
+    return {record.village_id: record for record in records}
+
+def fetch_village_record(village_id, columns=VILLAGE_ATTRIBUTES):
+    """Single-village form of fetch_village_records; returns a VillageRecord or None."""
+    records = fetch_village_records([village_id], columns)
+    return next(iter(records.values()), None)
+
+def fetch_village_geometry(village_id, geometry_format="geojson"):
+    """
+    Fetches a village's boundary on its own, for the few callers that need it:
+    GeoJSON text (default) or WKB bytes with geometry_format='wkb'.
+    """
+    geometry_sql = "ST_AsBinary(village_geometry)" if geometry_format == "wkb" else "ST_AsGeoJSON(village_geometry, 6)"
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute(f"SELECT {geometry_sql} FROM village_dss_data WHERE village_id = %s", (village_id,))
+        row = cur.fetchone()
+        cur.close()
+        return row[0] if row else None
+    except Exception as e:
+        print(f"Error fetching village geometry: {e}")
+        return None
+    finally:
+        if conn:
+            conn.close()
+
+def iter_village_dss_data(village_ids=None, district_id=None, state_id=None, batch_size=500, columns=VILLAGE_ATTRIBUTES):
+    """
+    Yields lists of up to batch_size VillageRecords (the given columns, never the geometry)
+    for a list of village ids, a district or a state, ordered by village_id.
+    All rows come from one query read through a server-side cursor, so a whole state is
+    streamed without holding it in memory. The connection stays open until the generator
+    is exhausted or closed.
+    """
+    if village_ids is not None:
+        where, params = "village_id = ANY(%s)", (list(village_ids),)
+    elif district_id is not None:
+        where, params = "district_id = %s", (district_id,)
+    elif state_id is not None:
+        where, params = "state_id = %s", (state_id,)
+    else:
+        raise ValueError("One of village_ids, district_id or state_id must be provided.")
+
+    conn = None
+    try:
+        conn = get_db_connection()
+        columns = tuple(columns)
+        record_type = village_record_type(columns)
+        cur = conn.cursor(name="village_dss_batch")
+        cur.itersize = batch_size
+        cur.execute(f"SELECT {', '.join(columns)} FROM village_dss_data WHERE {where} ORDER BY village_id", params)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield list(map(record_type._make, rows))
+        cur.close()
+    except Exception as e:
+        print(f"Error fetching DSS data in batch: {e}")
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+def fetch_village_geometries():
+    """Fetches (village_id, WKB geometry) for every village, for building in-memory spatial indexes."""
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute("SELECT village_id, ST_AsBinary(geometry) FROM villages WHERE geometry IS NOT NULL ORDER BY village_id")
+        rows = cur.fetchall()
+        cur.close()
+        return rows
+    except Exception as e:
+        print(f"Error fetching village geometries: {e}")
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+def fetch_patta_holder_villages():
+    """Fetches the precomputed (patta_holder_id, village_id) mapping."""
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute("SELECT patta_holder_id, village_id FROM patta_holder_villages")
+        rows = cur.fetchall()
+        cur.close()
+        return rows
+    except Exception as e:
+        print(f"Error fetching patta holder villages: {e}")
+        raise
+    finally:
+        if conn:
+            conn.close()
+
 def fetch_eligibility_rules():
     """Fetches all eligibility rules from the database."""
     conn = None
@@ -104,4 +333,166 @@ def find_similar_schemes(query_embedding: np.ndarray, limit: int = 5):
         return []
     finally:
         if conn:
-            conn.close()
\ No newline at end of file
+            conn.close()
+
+def fetch_data_versions(names=None):
+    """
+    Fetches the current version counters from data_versions as a {name: version} dict.
+    Versions are bumped by bump_data_version() whenever a materialized view or tile layer
+    is refreshed, so caches can use them to detect stale entries.
+    """
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        if names:
+            cur.execute("SELECT name, version FROM data_versions WHERE name = ANY(%s)", (list(names),))
+        else:
+            cur.execute("SELECT name, version FROM data_versions")
+        versions = dict(cur.fetchall())
+        cur.close()
+        return versions
+    except Exception as e:
+        print(f"Error fetching data versions: {e}")
+        return {}
+    finally:
+        if conn:
+            conn.close()
+
+class VersionPoller:
+    """
+    Tracks the data_versions of `names` for an in-memory cache or index, polling them at most
+    every `ttl` seconds. When they move on, on_change(previous, latest) runs under the
+    poller's lock before the new versions are stored; previous is None on the first poll,
+    and versions missing from the table count as 0. If on_change raises, or returns False to
+    leave the change pending (e.g. while a rebuild runs elsewhere), it is reported again on a
+    later poll. A failed lookup keeps the versions already known.
+    """
+
+    def __init__(self, names, ttl=5.0, on_change=None):
+        self.names = tuple(dict.fromkeys(names))
+        self.ttl = ttl
+        self.on_change = on_change
+        self._versions = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self):
+        """Returns the current {name: version}, polling data_versions if they are older than ttl."""
+        now = time.monotonic()
+        if self._versions is not None and now - self._checked_at <= self.ttl:
+            return self._versions
+        with self._lock:
+            if self._versions is not None and now - self._checked_at <= self.ttl:
+                return self._versions
+            latest = fetch_data_versions(self.names)
+            if latest or self._versions is None:
+                latest = {name: latest.get(name, 0) for name in self.names}
+                if latest != self._versions:
+                    applied = self.on_change(self._versions, latest) if self.on_change else None
+                    if applied is not False:
+                        self._versions = latest
+            self._checked_at = now
+            return self._versions if self._versions is not None else latest
+
+    def expire(self):
+        """Forces a poll on the next call to current()."""
+        self._checked_at = 0.0
+
+def fetch_assets_in_bbox(bbox, zoom=None, after_id=0, limit=1000, class_ids=None, geometry_format="geojson"):
+    """
+    Fetches CV-detected assets intersecting a (min_lon, min_lat, max_lon, max_lat) bbox.
+    Uses the GiST index on assets.geometry and keyset pagination on asset_id: pass the
+    last asset_id of the previous page as after_id. When a zoom level is given, geometries
+    are simplified to about one screen pixel and assets smaller than a pixel are skipped,
+    which keeps responses bounded for dense districts.
+    geometry_format is 'geojson' (GeoJSON text) or 'wkb' (binary).
+    Returns (rows, next_after_id); next_after_id is None on the last page.
+    """
+    tolerance = 0.0
+    min_area = 0.0
+    if zoom is not None:
+        # Size of one 256px tile pixel at this zoom, in degrees and (at the equator) metres
+        tolerance = 360.0 / (256 * 2 ** zoom)
+        min_area = (156543.03 / 2 ** zoom) ** 2 if zoom < 14 else 0.0
+
+    if geometry_format == "wkb":
+        geometry_sql = "ST_AsBinary(ST_SimplifyPreserveTopology(geometry, %(tolerance)s)) AS geometry"
+    else:
+        geometry_sql = "ST_AsGeoJSON(ST_SimplifyPreserveTopology(geometry, %(tolerance)s), 6) AS geometry"
+
+    query = f"""
+        SELECT asset_id, class_id, area_sq_m, {geometry_sql}
+        FROM assets
+        WHERE geometry && ST_MakeEnvelope(%(min_lon)s, %(min_lat)s, %(max_lon)s, %(max_lat)s, 4326)
+          AND asset_id > %(after_id)s
+          {"AND area_sq_m >= %(min_area)s" if min_area else ""}
+          {"AND class_id = ANY(%(class_ids)s)" if class_ids else ""}
+        ORDER BY asset_id
+        LIMIT %(limit)s
+    """
+    params = {
+        "min_lon": bbox[0], "min_lat": bbox[1], "max_lon": bbox[2], "max_lat": bbox[3],
+        "after_id": after_id, "min_area": min_area, "tolerance": tolerance,
+        "class_ids": list(class_ids) if class_ids else None,
+        # One extra row tells us whether another page exists
+        "limit": limit + 1,
+    }
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute(query, params)
+        rows = cur.fetchall()
+        cur.close()
+        next_after_id = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_after_id = rows[-1]["asset_id"]
+        return rows, next_after_id
+    except Exception as e:
+        print(f"Error fetching assets in bbox: {e}")
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+def fetch_village_summary(village_id):
+    """
+    Fetches a socio-economic and asset summary for a village: its village_dss_data
+    attributes (without geometry) plus per-class asset counts and areas.
+    """
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute(
+            """
+            SELECT village_id, village_name, district_id, district_name, state_id, state_name,
+                   land_type, water_index, population, has_forest, forest_area_percentage,
+                   nearest_groundwater_level, nearest_groundwater_quality, has_road_access, distance_to_canal,
+                   ST_XMin(village_geometry) AS min_lon, ST_YMin(village_geometry) AS min_lat,
+                   ST_XMax(village_geometry) AS max_lon, ST_YMax(village_geometry) AS max_lat
+            FROM village_dss_data WHERE village_id = %s
+            """,
+            (village_id,),
+        )
+        summary = cur.fetchone()
+        if summary is None:
+            cur.close()
+            return None
+        # Precomputed after each inference run by cv_models/asset_summary.py
+        cur.execute(
+            "SELECT class_id, asset_count, total_area_sq_m, updated_at FROM village_asset_summary WHERE village_id = %s ORDER BY class_id",
+            (village_id,),
+        )
+        summary = dict(summary)
+        summary["assets"] = cur.fetchall()
+        cur.close()
+        return summary
+    except Exception as e:
+        print(f"Error fetching village summary: {e}")
+        return None
+    finally:
+        if conn:
+            conn.close()
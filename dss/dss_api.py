@@ -1,14 +1,140 @@
-from flask import Flask, request, jsonify
+import time
+_import_start = time.perf_counter()
+from flask import Flask, Response, g, request, jsonify, stream_with_context
+from dss.database import fetch_assets_in_bbox, fetch_village_summary, get_db_connection
 from dss.dss_engine import DSSEngine
-from dss.mcp_protocol import MCPProtocol
+from dss.geo_encoding import FORMATS, encode, geometry_format_for
+from dss.metrics import HTTP_LATENCY, PROMETHEUS_CONTENT_TYPE, SlowRequestProfiler, record_startup, render_prometheus
+from dss.mcp_protocol import PLACEHOLDER_LLM_RESPONSE, MCPProtocol
+from dss.patta_holders import PattaHolderResolver
+from dss.response_cache import RecommendationCache
+from tiles.tile_server import tiles_bp
+import json
 import os
+import threading
 
 app = Flask(__name__)
-dss_engine = DSSEngine() # Keep for potential fallback or other uses
+app.register_blueprint(tiles_bp)
+# Recommendation responses are cached per village/query and data version (see response_cache.py)
+recommendation_cache = RecommendationCache()
+# Patta holder -> village mapping, held in memory and shared by both engines
+patta_resolver = PattaHolderResolver()
 # Initialize MCPProtocol with LLM and Embedding API URLs from environment variables
 LLM_API_URL = os.getenv("LLM_API_URL", "http://localhost:8000/v1/chat/completions")
 EMBEDDING_API_URL = os.getenv("EMBEDDING_API_URL", "http://localhost:8001/v1/embeddings")
-mcp_protocol = MCPProtocol(LLM_API_URL, EMBEDDING_API_URL)
+mcp_protocol = MCPProtocol(LLM_API_URL, EMBEDDING_API_URL, patta_resolver=patta_resolver)
+
+# Set PROFILE_ON_DEMAND=1 to let clients force profiling of a request with an X-Profile: 1 header
+PROFILE_ON_DEMAND = os.getenv("PROFILE_ON_DEMAND", "0") == "1"
+profiler = SlowRequestProfiler()
+
+# The rule engine loads its rules from the database, so it is created on first use (or by the
+# /ready probe) rather than at import. DSS_PRELOAD=1 creates it at import instead, e.g. with
+# gunicorn --preload so workers fork with the rules already loaded.
+DSS_PRELOAD = os.getenv("DSS_PRELOAD", "0") == "1"
+_dss_engine = None
+_engine_lock = threading.Lock()
+
+def get_dss_engine():
+    global _dss_engine
+    if _dss_engine is None:
+        with _engine_lock:
+            if _dss_engine is None:
+                start = time.perf_counter()
+                _dss_engine = DSSEngine(cache=recommendation_cache, patta_resolver=patta_resolver)
+                record_startup("dss_api", "engine_init", time.perf_counter() - start)
+    return _dss_engine
+
+# Reverse geocoding: village polygons in an in-memory STRtree plus a local cache of village
+# records, created on the first /api/villages/locate call so other workers do not load shapely
+_village_locator = None
+_locator_lock = threading.Lock()
+
+def get_village_locator():
+    """Returns the shared (VillageIndex, VillageRecordCache) pair, building it on first use."""
+    global _village_locator
+    if _village_locator is None:
+        with _locator_lock:
+            if _village_locator is None:
+                from dss.village_index import VillageIndex, VillageRecordCache
+                start = time.perf_counter()
+                index = VillageIndex(background_rebuild=True)
+                len(index)  # builds the tree
+                _village_locator = (index, VillageRecordCache())
+                record_startup("dss_api", "village_index_init", time.perf_counter() - start)
+    return _village_locator
+
+ASSETS_DEFAULT_LIMIT = 1000
+ASSETS_MAX_LIMIT = int(os.getenv("ASSETS_MAX_LIMIT", "5000"))
+BATCH_MAX_IDS = int(os.getenv("BATCH_MAX_IDS", "5000"))
+LOCATE_MAX_POINTS = int(os.getenv("LOCATE_MAX_POINTS", "10000"))
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.profile_forced = PROFILE_ON_DEMAND and request.headers.get("X-Profile") == "1"
+    g.profiler = profiler.start(force=g.profile_forced)
+
+@app.after_request
+def record_request_metrics(response):
+    start = g.get("request_start")
+    if start is None:
+        return response
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    method, path, status = request.method, request.path, response.status_code
+    request_profiler, forced = g.get("profiler"), g.get("profile_forced", False)
+
+    def finish():
+        elapsed = time.perf_counter() - start
+        HTTP_LATENCY.observe(elapsed, endpoint=endpoint, method=method, status=status)
+        profile_path = profiler.stop(request_profiler, endpoint, elapsed, force=forced)
+        if profile_path:
+            print(f"Saved profile of {method} {path} ({elapsed * 1000:.0f} ms) to {profile_path}")
+
+    if response.is_streamed:
+        # The body (e.g. batch NDJSON) is produced after this hook returns; measure until it is sent
+        response.call_on_close(finish)
+    else:
+        finish()
+    return response
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness probe: the process is up and serving requests."""
+    return jsonify({"status": "ok"}), 200
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """
+    Readiness probe: 200 once the DSS engine is initialized with its rules and the database
+    answers. The first call initializes the engine if DSS_PRELOAD did not.
+    """
+    global _dss_engine
+    try:
+        engine = get_dss_engine()
+        if not engine.rule_engine.rules:
+            # Rules could not be loaded (or none exist yet); build the engine again next time
+            _dss_engine = None
+            return jsonify({"status": "starting", "error": "No eligibility rules loaded"}), 503
+        conn = get_db_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+        finally:
+            conn.close()
+    except Exception as e:
+        return jsonify({"status": "unavailable", "error": str(e)}), 503
+    return jsonify({"status": "ready"}), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint: request and per-stage latency histograms of this process."""
+    return Response(render_prometheus(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+def server_timing_header(timings):
+    """Formats per-stage durations (seconds) as a Server-Timing header, in milliseconds."""
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items())
 
 @app.route('/api/dss/recommendations', methods=['POST'])
 def get_recommendations():
@@ -38,17 +164,205 @@ def get_recommendations():
         return jsonify({"error": "Either 'query' or a valid 'type' and 'id' must be provided."}), 400
 
     try:
-        llm_recommendations = mcp_protocol.get_scheme_recommendations_for_user(
-            user_query=user_query,
-            village_id=village_id,
-            patta_holder_id=patta_holder_id
+        timings = {}
+        start = time.perf_counter()
+        cache_id = input_id
+        if patta_holder_id:
+            # Resolved here so the cache key follows the patta holder's current village
+            village_id = patta_resolver.resolve(patta_holder_id)
+            cache_id = f"{patta_holder_id}@{village_id}"
+        # Identical requests (same location, normalized query and data versions) share one LLM call
+        cache_key = recommendation_cache.make_key("mcp", input_type if input_id else None, cache_id, user_query)
+        llm_recommendations, cache_status = recommendation_cache.get_or_compute(
+            cache_key,
+            lambda: mcp_protocol.get_scheme_recommendations_for_user(
+                user_query=user_query,
+                village_id=village_id,
+                patta_holder_id=patta_holder_id,
+                timings=timings
+            ),
+            cacheable=lambda value: value != PLACEHOLDER_LLM_RESPONSE
         )
-        
-        return jsonify({"recommendations": llm_recommendations}), 200
+        timings["total"] = time.perf_counter() - start
+
+        response = jsonify({"recommendations": llm_recommendations})
+        response.headers["Server-Timing"] = server_timing_header(timings)
+        response.headers["X-Cache"] = cache_status
+        return response, 200
     except Exception as e:
         print(f"Error in get_recommendations API: {e}")
         return jsonify({"error": f"An internal server error occurred: {str(e)}"}), 500
 
+@app.route('/api/dss/recommendations/batch', methods=['POST'])
+def get_batch_recommendations():
+    """
+    API endpoint for rule-based recommendations for many villages in one request.
+    Input: { "type": "village", "ids": [1, 2, 3] }, { "type": "village", "district_id": 7 }
+           or { "type": "village", "state_id": 2 } ("type" defaults to "village");
+           { "type": "patta_holder", "ids": [4, 5] } for patta holders (ids only)
+    Output: NDJSON, one line per village with its recommendations (or an error), streamed
+    as batches are evaluated. All villages are read with a single query.
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({"error": "Invalid JSON input"}), 400
+
+    input_type = data.get("type", "village")
+    if input_type not in ("village", "patta_holder"):
+        return jsonify({"error": "Invalid input type. Must be 'village' or 'patta_holder'."}), 400
+
+    selectors = [key for key in ("ids", "district_id", "state_id") if data.get(key) is not None]
+    if len(selectors) != 1:
+        return jsonify({"error": "Provide exactly one of 'ids', 'district_id' or 'state_id'."}), 400
+    if input_type == "patta_holder" and selectors != ["ids"]:
+        return jsonify({"error": "Batch patta_holder requests must list 'ids'."}), 400
+
+    ids = data.get("ids")
+    if ids is not None:
+        if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            return jsonify({"error": "'ids' must be a list of integers"}), 400
+        if len(ids) > BATCH_MAX_IDS:
+            return jsonify({"error": f"At most {BATCH_MAX_IDS} ids per request"}), 400
+        ids = list(dict.fromkeys(ids))
+
+    results = get_dss_engine().iter_batch_recommendations(
+        input_type, ids=ids, district_id=data.get("district_id"), state_id=data.get("state_id")
+    )
+
+    def generate():
+        try:
+            for result in results:
+                yield json.dumps(result, default=str) + "\n"
+        except Exception as e:
+            # Headers are already sent, so the failure is reported as the last line
+            print(f"Error in get_batch_recommendations API: {e}")
+            yield json.dumps({"error": f"An internal server error occurred: {str(e)}"}) + "\n"
+        finally:
+            results.close()
+
+    return Response(stream_with_context(generate()), status=200, mimetype="application/x-ndjson")
+
+@app.route('/api/assets', methods=['GET'])
+def get_assets():
+    """
+    API endpoint to fetch mapped assets within a bounding box.
+    Query params:
+        bbox: min_lon,min_lat,max_lon,max_lat (required)
+        zoom: map zoom level; simplifies geometry and drops sub-pixel assets (optional)
+        class_id: comma-separated class ids to include (optional)
+        limit: page size, capped at ASSETS_MAX_LIMIT (default 1000)
+        cursor: next_cursor from the previous page (optional)
+        format: geojson (default), arrow (GeoArrow WKB in Arrow IPC) or fgb (FlatGeobuf)
+    For binary formats the next page cursor is returned in the X-Next-Cursor header.
+    """
+    try:
+        bbox = [float(v) for v in request.args.get("bbox", "").split(",")]
+        if len(bbox) != 4 or bbox[0] >= bbox[2] or bbox[1] >= bbox[3]:
+            raise ValueError
+    except ValueError:
+        return jsonify({"error": "'bbox' must be min_lon,min_lat,max_lon,max_lat"}), 400
+
+    # type=int silently falls back to the default, so integer parameters are parsed explicitly
+    params = {}
+    for name, default in (("zoom", None), ("limit", ASSETS_DEFAULT_LIMIT), ("cursor", 0)):
+        value = request.args.get(name)
+        try:
+            params[name] = int(value) if value not in (None, "") else default
+        except ValueError:
+            return jsonify({"error": f"'{name}' must be an integer"}), 400
+    try:
+        class_ids = [int(c) for c in request.args.get("class_id", "").split(",") if c]
+    except ValueError:
+        return jsonify({"error": "'class_id' must be a comma-separated list of integers"}), 400
+    zoom = params["zoom"]
+    limit = min(params["limit"], ASSETS_MAX_LIMIT)
+    after_id = params["cursor"]
+    if limit <= 0:
+        return jsonify({"error": "'limit' must be positive"}), 400
+
+    output_format = request.args.get("format", "geojson")
+    if output_format not in FORMATS:
+        return jsonify({"error": f"Unsupported format '{output_format}'. Use one of {sorted(FORMATS)}"}), 400
+
+    try:
+        rows, next_cursor = fetch_assets_in_bbox(
+            bbox, zoom=zoom, after_id=after_id, limit=limit, class_ids=class_ids,
+            geometry_format=geometry_format_for(output_format),
+        )
+        body = encode(rows, ["asset_id", "class_id", "area_sq_m"], output_format, next_cursor)
+    except Exception as e:
+        print(f"Error in get_assets API: {e}")
+        return jsonify({"error": f"An internal server error occurred: {str(e)}"}), 500
+
+    headers = {"X-Feature-Count": str(len(rows))}
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = str(next_cursor)
+    return Response(body, status=200, mimetype=FORMATS[output_format], headers=headers)
+
+@app.route('/api/villages/<int:village_id>/summary', methods=['GET'])
+def get_village_summary(village_id):
+    """
+    API endpoint for a village's socio-economic attributes and per-class asset summary.
+    Geometry is not included; the bbox fields can be used to request assets or tiles.
+    """
+    summary = fetch_village_summary(village_id)
+    if summary is None:
+        return jsonify({"error": f"No data found for village ID {village_id}."}), 404
+    return jsonify(summary), 200
+
+@app.route('/api/villages/locate', methods=['GET', 'POST'])
+def locate_villages():
+    """
+    API endpoint resolving coordinates (EPSG:4326) to the village that covers them, with its
+    DSS record (socio-economic attributes, no geometry).
+    Input: GET ?lon=..&lat=.. for one point, or POST { "points": [[lon, lat], ...] } for up
+    to LOCATE_MAX_POINTS points, which are matched in one vectorized tree query.
+    Output: { "results": [{ "lon", "lat", "village_id", "village" }, ...] } in input order;
+    village_id and village are null for points outside every village.
+    """
+    if request.method == "GET":
+        lon = request.args.get("lon", type=float)
+        lat = request.args.get("lat", type=float)
+        if lon is None or lat is None:
+            return jsonify({"error": "'lon' and 'lat' query parameters are required"}), 400
+        points = [(lon, lat)]
+    else:
+        data = request.get_json(silent=True)
+        if not data or not isinstance(data.get("points"), list):
+            return jsonify({"error": "Body must be { \"points\": [[lon, lat], ...] }"}), 400
+        points = data["points"]
+        if len(points) > LOCATE_MAX_POINTS:
+            return jsonify({"error": f"At most {LOCATE_MAX_POINTS} points per request"}), 400
+        try:
+            points = [(float(lon), float(lat)) for lon, lat in points]
+        except (TypeError, ValueError):
+            return jsonify({"error": "Each point must be a [lon, lat] pair of numbers"}), 400
+
+    try:
+        index, records = get_village_locator()
+        lons = [p[0] for p in points]
+        lats = [p[1] for p in points]
+        village_ids = index.locate(lons, lats).tolist()
+        found = records.get_many(v for v in village_ids if v >= 0)
+    except Exception as e:
+        print(f"Error in locate_villages API: {e}")
+        return jsonify({"error": f"An internal server error occurred: {str(e)}"}), 500
+
+    results = []
+    for (lon, lat), village_id in zip(points, village_ids):
+        record = found.get(village_id) if village_id >= 0 else None
+        results.append({
+            "lon": lon,
+            "lat": lat,
+            "village_id": village_id if village_id >= 0 else None,
+            "village": record._asdict() if record is not None else None,
+        })
+    return Response(json.dumps({"results": results}, default=str), status=200, mimetype="application/json")
+
+record_startup("dss_api", "imports", time.perf_counter() - _import_start)
+if DSS_PRELOAD:
+    get_dss_engine()
+
 if __name__ == '__main__':
     # For development purposes, set environment variables or use a .env file
     # Example:
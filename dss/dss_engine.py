@@ -1,8 +1,16 @@
-from dss.database import fetch_eligibility_rules, fetch_village_dss_data
+from dss.database import fetch_eligibility_rules, fetch_village_record, iter_village_dss_data, project_columns
+from dss.metrics import timer
+from dss.patta_holders import PattaHolderResolver
 
 class RuleEngine:
     def __init__(self):
         self.rules = self._load_rules()
+        # Grouped once so evaluating a scheme does not scan every rule, which adds up in batch requests
+        self.rules_by_scheme = {}
+        for rule in self.rules:
+            self.rules_by_scheme.setdefault(rule['scheme_name'], []).append(rule)
+        # Only the village_dss_data columns the rules reference are fetched
+        self.columns = project_columns(rule['attribute'] for rule in self.rules)
 
     def _load_rules(self):
         """Loads eligibility rules from the database."""
@@ -11,9 +19,9 @@ class RuleEngine:
     def evaluate(self, scheme_name, data):
         """
         Evaluates eligibility for a given scheme against provided data.
-        Data is expected to be a dictionary (e.g., a row from village_dss_data).
+        Data is expected to be a dictionary or a VillageRecord (e.g., a row from village_dss_data).
         """
-        scheme_rules = [rule for rule in self.rules if rule['scheme_name'] == scheme_name]
+        scheme_rules = self.rules_by_scheme.get(scheme_name)
         
         if not scheme_rules:
             return False, "No rules defined for this scheme."
@@ -64,8 +72,17 @@ class RuleEngine:
 
 
 class DSSEngine:
-    def __init__(self):
+    def __init__(self, cache=None, patta_resolver=None):
+        """
+        cache: optional RecommendationCache (dss/response_cache.py). Results are then cached
+        per input and data version, and the rules are reloaded when their version changes.
+        patta_resolver: PattaHolderResolver mapping patta holders to their villages; one
+        is created if not given.
+        """
         self.rule_engine = RuleEngine()
+        self.cache = cache
+        self.patta_resolver = patta_resolver or PattaHolderResolver()
+        self._rules_version = cache.versions().get("eligibility_rules") if cache else None
         # Define schemes and their priorities/descriptions
         self.schemes_info = {
             "PM-KISAN": {"priority": 1, "description": "Provides income support to all eligible farmer families."},
@@ -78,22 +95,108 @@ class DSSEngine:
     def get_recommendations(self, input_type, input_id):
         """
         Generates scheme recommendations based on input_type and input_id.
+        A patta holder gets the recommendations of the village it is mapped to.
         """
-        dss_data = None
-        if input_type == "village":
-            dss_data = fetch_village_dss_data(village_id=input_id)
-        elif input_type == "patta_holder":
-            # TODO: Implement patta_holder to village mapping or direct patta_holder data fetching
-            # For now, we'll assume patta_holder_id maps to a village_id for DSS data.
-            # This needs to be refined based on actual patta_holder data availability.
-            print("Warning: Patta holder logic is a placeholder. Assuming direct village data for now.")
-            dss_data = fetch_village_dss_data(village_id=input_id) # Placeholder
-        else:
-            return {"error": "Invalid input type. Must be 'village' or 'patta_holder'."}
+        if input_type == "patta_holder":
+            with timer("patta_holder_resolve"):
+                village_id = self.patta_resolver.resolve(input_id)
+            if village_id is None:
+                return {"error": f"No village mapping found for patta_holder ID {input_id}."}
+            result = self.get_recommendations("village", village_id)
+            return {**result, "patta_holder_id": input_id, "village_id": village_id}
 
-        if not dss_data:
-            return {"error": f"No DSS data found for {input_type} ID {input_id}."}
+        if self.cache is None:
+            return self._compute_recommendations(input_type, input_id)
+
+        self._refresh_rules()
+        key = self.cache.make_key("rules", input_type, input_id)
+        result, _ = self.cache.get_or_compute(
+            key,
+            lambda: self._compute_recommendations(input_type, input_id),
+            cacheable=lambda value: "error" not in value,
+        )
+        return result
+
+    def _refresh_rules(self):
+        """Reloads the rules if their version in data_versions has moved on (only with a cache)."""
+        if self.cache is None:
+            return
+        rules_version = self.cache.versions().get("eligibility_rules")
+        if rules_version != self._rules_version:
+            print(f"Eligibility rules changed (version {self._rules_version} -> {rules_version}); reloading")
+            self.rule_engine = RuleEngine()
+            self._rules_version = rules_version
 
+    def iter_batch_recommendations(self, input_type, ids=None, district_id=None, state_id=None, batch_size=500):
+        """
+        Generates recommendations for many villages at once: a list of ids, or every village
+        of a district or state. The village_dss_data rows are read with a single query and
+        evaluated batch by batch, and one result dict is yielded per village as soon as its
+        batch is done. Requested ids without DSS data are yielded last with an error.
+        Patta holders (ids only) are resolved to villages in memory first, and each village
+        is evaluated once however many of the requested patta holders live in it.
+        """
+        holders_by_village = None
+        unresolved = []
+        if input_type == "patta_holder":
+            if ids is None:
+                yield {"error": "Batch patta_holder requests must list 'ids'."}
+                return
+            with timer("patta_holder_resolve"):
+                village_of = self.patta_resolver.resolve_many(ids)
+            holders_by_village = {}
+            for patta_holder_id in ids:
+                if patta_holder_id in village_of:
+                    holders_by_village.setdefault(village_of[patta_holder_id], []).append(patta_holder_id)
+                else:
+                    unresolved.append(patta_holder_id)
+            ids = sorted(holders_by_village)
+        elif input_type != "village":
+            yield {"error": "Invalid input type. Must be 'village' or 'patta_holder'."}
+            return
+
+        self._refresh_rules()
+        missing = set(ids) if ids is not None else set()
+        rows_iter = iter_village_dss_data(village_ids=ids, district_id=district_id, state_id=state_id,
+                                          batch_size=batch_size, columns=self.rule_engine.columns)
+        try:
+            while True:
+                with timer("village_fetch"):
+                    rows = next(rows_iter, None)
+                if rows is None:
+                    break
+                with timer("rule_evaluation"):
+                    results = []
+                    for row in rows:
+                        village_id = row.village_id
+                        missing.discard(village_id)
+                        recommendations = self._recommend(row)
+                        dss_data = row._asdict()
+                        if holders_by_village is None:
+                            results.append({"type": "village", "id": village_id, "recommendations": recommendations, "dss_data_used": dss_data})
+                        else:
+                            results.extend(
+                                {"type": "patta_holder", "id": patta_holder_id, "village_id": village_id,
+                                 "recommendations": recommendations, "dss_data_used": dss_data}
+                                for patta_holder_id in holders_by_village[village_id]
+                            )
+                yield from results
+        finally:
+            # Releases the connection promptly if the consumer stops early (e.g. client disconnect)
+            rows_iter.close()
+
+        for village_id in sorted(missing):
+            if holders_by_village is None:
+                yield {"type": "village", "id": village_id, "error": f"No DSS data found for village ID {village_id}."}
+            else:
+                for patta_holder_id in holders_by_village[village_id]:
+                    yield {"type": "patta_holder", "id": patta_holder_id, "village_id": village_id,
+                           "error": f"No DSS data found for village ID {village_id}."}
+        for patta_holder_id in unresolved:
+            yield {"type": "patta_holder", "id": patta_holder_id, "error": f"No village mapping found for patta_holder ID {patta_holder_id}."}
+
+    def _recommend(self, dss_data):
+        """Evaluates every scheme against one village_dss_data row; eligible schemes sorted by priority."""
         recommendations = []
         for scheme_name, info in self.schemes_info.items():
             is_eligible, justifications = self.rule_engine.evaluate(scheme_name, dss_data)
@@ -104,8 +207,21 @@ class DSSEngine:
                     "priority": info["priority"],
                     "justifications": justifications
                 })
-        
-        # Sort recommendations by priority
         recommendations.sort(key=lambda x: x["priority"])
+        return recommendations
+
+    def _compute_recommendations(self, input_type, input_id):
+        dss_data = None
+        if input_type == "village":
+            with timer("village_fetch"):
+                dss_data = fetch_village_record(input_id, self.rule_engine.columns)
+        else:
+            return {"error": "Invalid input type. Must be 'village' or 'patta_holder'."}
+
+        if not dss_data:
+            return {"error": f"No DSS data found for {input_type} ID {input_id}."}
+
+        with timer("rule_evaluation"):
+            recommendations = self._recommend(dss_data)
 
-        return {"recommendations": recommendations, "dss_data_used": dict(dss_data)}
+        return {"recommendations": recommendations, "dss_data_used": dss_data._asdict()}
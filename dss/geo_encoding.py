@@ -0,0 +1,73 @@
+import io
+import json
+
+# Output formats accepted by the geospatial query endpoints, mapped to their MIME types
+FORMATS = {
+    "geojson": "application/geo+json",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "fgb": "application/flatgeobuf",
+}
+
+
+def geometry_format_for(output_format):
+    """Binary outputs take WKB straight from PostGIS; GeoJSON takes pre-serialized text."""
+    return "geojson" if output_format == "geojson" else "wkb"
+
+
+def encode_geojson(rows, properties, next_cursor=None):
+    """
+    Builds a GeoJSON FeatureCollection from rows whose 'geometry' is already GeoJSON text
+    (ST_AsGeoJSON), so geometries are spliced in without being parsed and re-serialized.
+    """
+    features = []
+    for row in rows:
+        props = json.dumps({key: row[key] for key in properties})
+        features.append(f'{{"type":"Feature","properties":{props},"geometry":{row["geometry"]}}}')
+    cursor = json.dumps(next_cursor)
+    return f'{{"type":"FeatureCollection","next_cursor":{cursor},"features":[{",".join(features)}]}}'
+
+
+def encode_geoarrow(rows, properties):
+    """
+    Encodes rows with WKB geometries as an Arrow IPC stream. The geometry column carries
+    the geoarrow.wkb extension type so GeoArrow-aware clients can decode it directly.
+    """
+    import pyarrow as pa
+
+    columns = {key: [row[key] for row in rows] for key in properties}
+    table = pa.table(columns)
+    geometry = pa.array([bytes(row["geometry"]) for row in rows], type=pa.binary())
+    field = pa.field("geometry", pa.binary(), metadata={
+        "ARROW:extension:name": "geoarrow.wkb",
+        "ARROW:extension:metadata": json.dumps({"crs": "OGC:CRS84"}),
+    })
+    table = table.append_column(field, geometry)
+
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def encode_flatgeobuf(rows, properties):
+    """Encodes rows with WKB geometries as a FlatGeobuf file (includes a packed spatial index)."""
+    import geopandas as gpd
+    import shapely
+
+    gdf = gpd.GeoDataFrame(
+        {key: [row[key] for row in rows] for key in properties},
+        geometry=shapely.from_wkb([bytes(row["geometry"]) for row in rows]),
+        crs="EPSG:4326",
+    )
+    buffer = io.BytesIO()
+    gdf.to_file(buffer, driver="FlatGeobuf", engine="pyogrio")
+    return buffer.getvalue()
+
+
+def encode(rows, properties, output_format, next_cursor=None):
+    """Encodes query rows in the requested output format. Returns bytes or str."""
+    if output_format == "arrow":
+        return encode_geoarrow(rows, properties)
+    if output_format == "fgb":
+        return encode_flatgeobuf(rows, properties)
+    return encode_geojson(rows, properties, next_cursor)
@@ -1,53 +1,94 @@
+import logging
 import os
 import numpy as np
-from dss.database import fetch_village_dss_data, fetch_eligibility_rules, find_similar_schemes
-# Assuming an LLM client and embedding model are available
-# from llm_client import LLMClient
-# from embedding_model import EmbeddingModel
+import requests
+from dss.database import fetch_eligibility_rules, fetch_village_record, find_similar_schemes, project_columns
+from dss.metrics import timer
+from dss.patta_holders import PattaHolderResolver
+
+# Per-request details (embedded text, prompts) go to debug logging, not stdout
+logger = logging.getLogger(__name__)
+
+# Both services are expected to speak the OpenAI-compatible /v1/embeddings and
+# /v1/chat/completions formats (vLLM, text-embeddings-inference, Ollama, ...)
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding")
+LLM_MODEL = os.getenv("LLM_MODEL", "dss-llm")
+MODEL_REQUEST_TIMEOUT = float(os.getenv("MODEL_REQUEST_TIMEOUT", "60"))
+# Returned when the LLM service cannot be reached; never cached
+PLACEHOLDER_LLM_RESPONSE = "This is a dummy LLM response based on the provided context."
 
 class MCPProtocol:
-    def __init__(self, llm_api_url: str, embedding_api_url: str):
+    def __init__(self, llm_api_url: str, embedding_api_url: str, patta_resolver: PattaHolderResolver = None):
         self.llm_api_url = llm_api_url
         self.embedding_api_url = embedding_api_url
-        # self.llm_client = LLMClient(llm_api_url)
-        # self.embedding_model = EmbeddingModel(embedding_api_url)
+        self.patta_resolver = patta_resolver or PattaHolderResolver()
+        # Keep-alive connections to the model services are reused across requests
+        self.session = requests.Session()
         print(f"MCPProtocol initialized with LLM API: {llm_api_url} and Embedding API: {embedding_api_url}")
 
     def _generate_embedding(self, text: str) -> np.ndarray:
         """Generates an embedding for the given text using the embedding model."""
-        # Placeholder for actual embedding generation
-        # In a real scenario, this would call an embedding service/model
-        print(f"Generating embedding for text: '{text[:50]}...'")
-        return np.random.rand(1536) # Dummy embedding for now
+        logger.debug("Generating embedding for text: '%s...'", text[:50])
+        try:
+            response = self.session.post(
+                self.embedding_api_url,
+                json={"model": EMBEDDING_MODEL, "input": text},
+                timeout=MODEL_REQUEST_TIMEOUT,
+            )
+            response.raise_for_status()
+            return np.asarray(response.json()["data"][0]["embedding"], dtype=np.float32)
+        except (requests.RequestException, KeyError, IndexError, ValueError) as e:
+            print(f"Embedding service unavailable ({e}); using a placeholder embedding.")
+            return np.random.rand(1536) # Dummy embedding
 
     def _get_llm_response(self, prompt: str) -> str:
         """Gets a response from the LLM based on the prompt."""
-        # Placeholder for actual LLM interaction
-        # In a real scenario, this would call the LLM client
-        print(f"Getting LLM response for prompt: '{prompt[:100]}...'")
-        return "This is a dummy LLM response based on the provided context."
-
-    def get_scheme_recommendations_for_user(self, user_query: str, village_id: int = None, patta_holder_id: int = None):
+        logger.debug("Getting LLM response for prompt: '%s...'", prompt[:100])
+        try:
+            response = self.session.post(
+                self.llm_api_url,
+                json={"model": LLM_MODEL, "messages": [{"role": "user", "content": prompt}]},
+                timeout=MODEL_REQUEST_TIMEOUT,
+            )
+            response.raise_for_status()
+            return response.json()["choices"][0]["message"]["content"]
+        except (requests.RequestException, KeyError, IndexError, ValueError) as e:
+            print(f"LLM service unavailable ({e}); using a placeholder response.")
+            return PLACEHOLDER_LLM_RESPONSE
+
+    def get_scheme_recommendations_for_user(self, user_query: str, village_id: int = None, patta_holder_id: int = None, timings: dict = None):
         """
         Orchestrates fetching data, constructing context, and getting LLM recommendations.
+        A patta_holder_id is resolved to its village unless the caller already passes village_id.
+        If a timings dict is passed, the duration of each stage (village_fetch, rules_fetch,
+        embedding, vector_search, llm) is recorded into it in seconds.
         """
         context_parts = []
 
-        # 1. Fetch user/village specific DSS data
+        # 1. Fetch all eligibility rules and scheme descriptions; the attributes they reference
+        # decide which village columns are fetched
+        with timer("rules_fetch", timings):
+            all_schemes_and_rules = fetch_eligibility_rules()
+        columns = project_columns(rule['attribute'] for rule in all_schemes_and_rules)
+
+        # 2. Fetch user/village specific DSS data
+        if patta_holder_id and not village_id:
+            with timer("patta_holder_resolve", timings):
+                village_id = self.patta_resolver.resolve(patta_holder_id)
+            if village_id is None:
+                context_parts.append(f"Patta holder ID {patta_holder_id} provided, but it is not mapped to any village.")
         if village_id:
-            village_data = fetch_village_dss_data(village_id=village_id)
+            with timer("village_fetch", timings):
+                village_data = fetch_village_record(village_id, columns)
+            holder = f"Patta holder ID {patta_holder_id} " if patta_holder_id else "User "
             if village_data:
-                context_parts.append(f"User is in Village ID {village_id} with the following attributes: {village_data}")
+                attributes = ", ".join(f"{name}={value}" for name, value in zip(village_data._fields, village_data))
+                context_parts.append(f"{holder}is in Village ID {village_id} with the following attributes: {attributes}")
             else:
                 context_parts.append(f"No DSS data found for Village ID {village_id}.")
-        elif patta_holder_id:
-            # TODO: Implement logic to get village_id from patta_holder_id and then fetch data
-            context_parts.append(f"Patta holder ID {patta_holder_id} provided. Village data fetching by patta_holder_id is not yet implemented.")
-        else:
+        elif not patta_holder_id:
             context_parts.append("No specific location provided for the user.")
 
-        # 2. Fetch all eligibility rules and scheme descriptions
-        all_schemes_and_rules = fetch_eligibility_rules()
         if all_schemes_and_rules:
             context_parts.append("\nAvailable Schemes and their Eligibility Rules:")
             for rule in all_schemes_and_rules:
@@ -57,8 +98,10 @@ class MCPProtocol:
 
         # 3. Perform vector similarity search based on user query
         if user_query:
-            query_embedding = self._generate_embedding(user_query)
-            similar_schemes = find_similar_schemes(query_embedding)
+            with timer("embedding", timings):
+                query_embedding = self._generate_embedding(user_query)
+            with timer("vector_search", timings):
+                similar_schemes = find_similar_schemes(query_embedding)
             if similar_schemes:
                 context_parts.append("\nSchemes semantically similar to your query:")
                 for scheme in similar_schemes:
@@ -83,7 +126,8 @@ class MCPProtocol:
         """
 
         # 5. Get response from LLM
-        llm_response = self._get_llm_response(prompt)
+        with timer("llm", timings):
+            llm_response = self._get_llm_response(prompt)
         return llm_response
 
 # Example Usage (for testing purposes)
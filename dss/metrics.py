@@ -0,0 +1,250 @@
+import cProfile
+import functools
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency buckets (seconds) shared by all histograms: sub-millisecond rule evaluation up to
+# multi-minute scene inference
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# Sampling profiler for slow requests: a PROFILE_SAMPLE_RATE share of requests run under
+# cProfile and the profile is kept if the request took longer than PROFILE_SLOW_MS.
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "1000"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/dss_profiles")
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus exposition format."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        # Find the first bucket the value falls into; cumulative counts are built when rendering
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {key: list(series) for key, series in self._series.items()}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                labels = _format_labels(self.labelnames + ("le",), key + (bound,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {series[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+STAGE_LATENCY = Histogram(
+    "dss_stage_duration_seconds",
+    "Duration of pipeline stages (db fetch, rule evaluation, embedding, vector search, llm, tile read, forward pass, polygonization).",
+    ("stage",),
+)
+HTTP_LATENCY = Histogram("dss_http_request_duration_seconds", "API request duration by endpoint.", ("endpoint", "method", "status"))
+TASK_LATENCY = Histogram("cv_celery_task_duration_seconds", "Celery task run time.", ("task", "state"))
+TASKS_TOTAL = Counter("cv_celery_tasks_total", "Celery tasks finished, by final state.", ("task", "state"))
+PROFILES_TOTAL = Counter("dss_profiles_saved_total", "Slow-request profiles written to PROFILE_DIR.", ("endpoint",))
+STARTUP_SECONDS = Gauge("process_startup_seconds", "Cold-start time of this process by phase (imports, init).", ("component", "phase"))
+
+REGISTRY = [STAGE_LATENCY, HTTP_LATENCY, TASK_LATENCY, TASKS_TOTAL, PROFILES_TOTAL, STARTUP_SECONDS]
+
+# Cold-start budget in seconds; startup phases over it are logged so slow imports are noticed
+COLD_START_BUDGET_SECONDS = float(os.getenv("COLD_START_BUDGET_SECONDS", "2.0"))
+
+
+def record_startup(component, phase, seconds):
+    """Publishes a startup phase duration and warns when the component exceeds the cold-start budget."""
+    STARTUP_SECONDS.set(seconds, component=component, phase=phase)
+    if seconds > COLD_START_BUDGET_SECONDS:
+        print(f"Warning: {component} {phase} took {seconds:.2f}s, over the {COLD_START_BUDGET_SECONDS:.1f}s cold-start budget")
+
+
+def observe_stage(stage, seconds):
+    STAGE_LATENCY.observe(seconds, stage=stage)
+
+
+@contextmanager
+def timer(stage, timings=None):
+    """
+    Times a block as `stage` in the stage histogram. If a timings dict is given the
+    duration (seconds) is also added to timings[stage], e.g. for a Server-Timing header.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.observe(elapsed, stage=stage)
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+
+def timed(stage):
+    """Decorator form of timer()."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def render_prometheus():
+    """All metrics of this process in the Prometheus text exposition format (0.0.4)."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def start_metrics_server(port, host="0.0.0.0", ready=None):
+    """
+    Serves /metrics on a background thread, for processes without a web app (Celery workers).
+    Also answers /healthz (always 200 while the process runs) and /ready, which is 200 only
+    once the optional ready() callable returns true.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            if path == "/metrics":
+                status, content_type, body = 200, PROMETHEUS_CONTENT_TYPE, render_prometheus().encode()
+            elif path == "/healthz":
+                status, content_type, body = 200, "text/plain", b"ok\n"
+            elif path == "/ready":
+                is_ready = ready is None or ready()
+                status, content_type, body = (200, "text/plain", b"ready\n") if is_ready else (503, "text/plain", b"starting\n")
+            else:
+                self.send_response(404)
+                self.end_headers()
+                return
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class SlowRequestProfiler:
+    """
+    On-demand profiling of slow requests. start() begins a cProfile session for a sampled
+    share of requests (or when forced); stop() keeps the profile as a .prof file (readable
+    with pstats/snakeviz, convertible for flame graphs) only if the request was slow.
+    For whole-process sampling without code changes attach py-spy to the worker pid instead.
+    """
+
+    def __init__(self, sample_rate=PROFILE_SAMPLE_RATE, slow_ms=PROFILE_SLOW_MS, directory=PROFILE_DIR):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.directory = directory
+
+    def start(self, force=False):
+        if not force and (self.sample_rate <= 0 or random.random() >= self.sample_rate):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active on this thread
+            return None
+        return profiler
+
+    def stop(self, profiler, name, elapsed_seconds, force=False):
+        if profiler is None:
+            return None
+        profiler.disable()
+        if not force and elapsed_seconds * 1000 < self.slow_ms:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        safe_name = "".join(c if c.isalnum() else "_" for c in name).strip("_") or "request"
+        path = os.path.join(self.directory, f"{safe_name}-{int(time.time() * 1000)}-{elapsed_seconds * 1000:.0f}ms.prof")
+        profiler.dump_stats(path)
+        PROFILES_TOTAL.inc(endpoint=name)
+        return path
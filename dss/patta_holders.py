@@ -0,0 +1,164 @@
+import argparse
+import csv
+import time
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+from dss.database import VersionPoller, fetch_patta_holder_villages, get_db_connection
+
+
+class PattaHolderResolver:
+    """
+    Maps patta holder ids to village ids using the precomputed patta_holder_villages table.
+    The mapping is held in memory as two sorted numpy arrays, so single and batch lookups
+    are binary searches with no database round trip. It is reloaded when the
+    'patta_holder_villages' version in data_versions changes (checked at most every
+    `version_ttl` seconds), i.e. after an ingest or refresh_patta_holder_villages().
+    """
+
+    def __init__(self, version_ttl=5.0):
+        # (sorted patta_holder_ids, village_ids aligned with them), swapped as one object
+        self._state = None
+        self._versions = VersionPoller(["patta_holder_villages"], version_ttl, self._on_version_change)
+
+    def _on_version_change(self, previous, latest):
+        self._load(latest["patta_holder_villages"])
+
+    def _ensure_current(self):
+        self._versions.current()
+
+    def _load(self, version):
+        start = time.perf_counter()
+        rows = fetch_patta_holder_villages()
+        mapping = np.array(rows, dtype=np.int64).reshape(-1, 2)
+        mapping = mapping[np.argsort(mapping[:, 0], kind="stable")]
+        self._state = (np.ascontiguousarray(mapping[:, 0]), np.ascontiguousarray(mapping[:, 1]))
+        print(f"Loaded {len(mapping)} patta holder -> village mappings (version {version}) in {time.perf_counter() - start:.2f}s")
+
+    def resolve_many(self, patta_holder_ids):
+        """Returns {patta_holder_id: village_id} for the ids that have a mapping."""
+        self._ensure_current()
+        holder_ids, village_ids = self._state
+        query = np.asarray(list(patta_holder_ids), dtype=np.int64)
+        if not len(query) or not len(holder_ids):
+            return {}
+        positions = np.searchsorted(holder_ids, query)
+        positions[positions == len(holder_ids)] = 0
+        found = holder_ids[positions] == query
+        return dict(zip(query[found].tolist(), village_ids[positions[found]].tolist()))
+
+    def resolve(self, patta_holder_id):
+        """Village id of one patta holder, or None if it has no mapping."""
+        return self.resolve_many([patta_holder_id]).get(int(patta_holder_id))
+
+
+def ingest_patta_holders(records, village_index=None, page_size=1000):
+    """
+    Inserts digitized patta holder records and their village mapping in one transaction.
+    Each record is a dict with holder_name, claim_type, claim_status, area_hectares,
+    source_document and optionally village_id (declared on the claim) and lon/lat (claim
+    coordinates). Records without a declared village are resolved from their coordinates
+    with the in-memory village index. Returns a summary dict including the ids of patta
+    holders that could not be mapped to a village.
+    """
+    # Imported here so request-serving processes that only resolve ids do not load shapely
+    from dss.village_index import VillageIndex
+
+    records = list(records)
+    if not records:
+        return {"patta_holders": 0, "declared": 0, "located": 0, "unresolved": []}
+    village_index = village_index or VillageIndex()
+
+    def coordinate(record, key):
+        value = record.get(key)
+        return float(value) if value not in (None, "") else np.nan
+
+    declared = [int(r["village_id"]) if r.get("village_id") not in (None, "") else None for r in records]
+    lons = np.array([coordinate(r, "lon") for r in records])
+    lats = np.array([coordinate(r, "lat") for r in records])
+    has_location = ~(np.isnan(lons) | np.isnan(lats))
+    to_locate = np.flatnonzero(np.array([d is None for d in declared]) & has_location)
+    located = {}
+    if len(to_locate):
+        located = dict(zip(to_locate.tolist(), village_index.locate(lons[to_locate], lats[to_locate]).tolist()))
+
+    rows = [
+        (
+            r.get("holder_name"), r.get("claim_type"), r.get("claim_status"),
+            float(r["area_hectares"]) if r.get("area_hectares") not in (None, "") else None,
+            declared[i], r.get("source_document"),
+            f"SRID=4326;POINT({float(lons[i])!r} {float(lats[i])!r})" if has_location[i] else None,
+        )
+        for i, r in enumerate(records)
+    ]
+
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        # One multi-row INSERT per page; RETURNING yields the ids in VALUES order
+        inserted = execute_values(
+            cur,
+            """
+            INSERT INTO patta_holders (holder_name, claim_type, claim_status, area_hectares,
+                                       declared_village_id, source_document, location)
+            VALUES %s RETURNING patta_holder_id
+            """,
+            rows,
+            template="(%s, %s, %s, %s, %s, %s, ST_GeomFromEWKT(%s))",
+            page_size=page_size,
+            fetch=True,
+        )
+        patta_holder_ids = [row[0] for row in inserted]
+
+        mapping = []
+        unresolved = []
+        for i, patta_holder_id in enumerate(patta_holder_ids):
+            if declared[i] is not None:
+                mapping.append((patta_holder_id, declared[i], "declared"))
+            elif located.get(i, -1) >= 0:
+                mapping.append((patta_holder_id, located[i], "location"))
+            else:
+                unresolved.append(patta_holder_id)
+        execute_values(
+            cur,
+            """
+            INSERT INTO patta_holder_villages (patta_holder_id, village_id, resolved_by) VALUES %s
+            ON CONFLICT (patta_holder_id) DO UPDATE SET village_id = EXCLUDED.village_id, resolved_by = EXCLUDED.resolved_by
+            """,
+            mapping,
+            page_size=page_size,
+        )
+        cur.execute("SELECT bump_data_version('patta_holder_villages')")
+        conn.commit()
+        cur.close()
+    except Exception as e:
+        print(f"Error ingesting patta holders: {e}")
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+    summary = {
+        "patta_holders": len(patta_holder_ids),
+        "declared": sum(1 for m in mapping if m[2] == "declared"),
+        "located": sum(1 for m in mapping if m[2] == "location"),
+        "unresolved": unresolved,
+    }
+    print(f"Ingested {summary['patta_holders']} patta holders: {summary['declared']} by declared village, "
+          f"{summary['located']} by location, {len(unresolved)} unresolved")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest digitized patta holder records and map them to villages.")
+    parser.add_argument("csv_path", help="CSV with holder_name, claim_type, claim_status, area_hectares, "
+                                         "source_document and optionally village_id and lon/lat columns")
+    parser.add_argument("--page-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    with open(args.csv_path, newline="") as f:
+        ingest_patta_holders(csv.DictReader(f), page_size=args.page_size)
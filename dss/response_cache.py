@@ -0,0 +1,214 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from dss.database import VersionPoller
+
+# Versions in data_versions that recommendation results depend on
+DEPENDENCIES = ("village_dss_data", "eligibility_rules")
+
+RECOMMENDATION_CACHE_SIZE = int(os.getenv("RECOMMENDATION_CACHE_SIZE", "10000"))
+RECOMMENDATION_CACHE_TTL = int(os.getenv("RECOMMENDATION_CACHE_TTL", str(24 * 3600)))
+# Shared tier, e.g. redis://localhost:6379/2; unset keeps the cache process-local
+RECOMMENDATION_CACHE_REDIS_URL = os.getenv("RECOMMENDATION_CACHE_REDIS_URL")
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query):
+    """Case-, width- and punctuation-insensitive form of a free-text query, used in cache keys."""
+    if not query:
+        return ""
+    text = unicodedata.normalize("NFKC", query).casefold()
+    text = _PUNCTUATION.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class LocalLRU:
+    """Thread-safe in-process LRU with per-entry TTL."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RecommendationCache:
+    """
+    Two-tier cache for recommendation responses: a process-local LRU in front of an
+    optional shared Redis tier.
+
+    Keys combine the request kind and id, the normalized query and the current versions
+    of village_dss_data and eligibility_rules from data_versions, so a view refresh or a
+    rule change makes every older entry unreachable. Versions are polled at most every
+    `version_ttl` seconds; when they move on the local tier is cleared, and stale shared
+    entries simply expire.
+
+    Concurrent misses for the same key are coalesced: within a process one thread
+    computes while the others wait for its result; across processes a short Redis lock
+    lets one worker compute while the others poll for the value.
+    """
+
+    def __init__(self, max_entries=RECOMMENDATION_CACHE_SIZE, ttl=RECOMMENDATION_CACHE_TTL,
+                 redis_url=RECOMMENDATION_CACHE_REDIS_URL, version_ttl=5.0, lock_timeout=60.0):
+        self.ttl = ttl
+        self.version_ttl = version_ttl
+        self.lock_timeout = lock_timeout
+        self.local = LocalLRU(max_entries)
+        self.redis = None
+        if redis_url:
+            try:
+                import redis
+                self.redis = redis.Redis.from_url(redis_url)
+            except ImportError:
+                print("redis package not installed; recommendation cache is process-local only")
+        self._versions = VersionPoller(DEPENDENCIES, version_ttl, self._on_version_change)
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.stats = {"local_hits": 0, "shared_hits": 0, "misses": 0, "coalesced": 0}
+
+    def versions(self):
+        """Current {dependency: version}, refreshed at most every version_ttl seconds."""
+        return self._versions.current()
+
+    def _on_version_change(self, previous, latest):
+        if previous is not None:
+            print(f"DSS data versions changed {previous} -> {latest}; clearing recommendation cache")
+            self.local.clear()
+
+    def make_key(self, kind, input_type=None, input_id=None, query=None):
+        versions = self.versions()
+        version_part = ":".join(f"{versions.get(name, 0)}" for name in DEPENDENCIES)
+        query_hash = hashlib.sha1(normalize_query(query).encode()).hexdigest()[:16]
+        return f"dss:rec:{kind}:{version_part}:{input_type or '-'}:{input_id or '-'}:{query_hash}"
+
+    def _shared_get(self, key):
+        if self.redis is None:
+            return None
+        try:
+            raw = self.redis.get(key)
+        except Exception as e:
+            print(f"Recommendation cache: shared tier unavailable ({e})")
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    def _shared_put(self, key, value):
+        if self.redis is None:
+            return
+        try:
+            self.redis.set(key, json.dumps(value, default=str), ex=self.ttl)
+        except Exception as e:
+            print(f"Recommendation cache: could not write shared tier ({e})")
+
+    def _lookup(self, key):
+        value = self.local.get(key)
+        if value is not None:
+            self.stats["local_hits"] += 1
+            return value
+        value = self._shared_get(key)
+        if value is not None:
+            self.stats["shared_hits"] += 1
+            self.local.put(key, value, self.ttl)
+        return value
+
+    def _compute_with_shared_lock(self, key, compute, cacheable):
+        """Takes a cross-process lock on the key so only one worker computes a shared miss."""
+        lock_key = f"{key}:lock"
+        acquired = True
+        if self.redis is not None:
+            try:
+                acquired = bool(self.redis.set(lock_key, b"1", nx=True, px=int(self.lock_timeout * 1000)))
+            except Exception:
+                acquired = True
+            if not acquired:
+                deadline = time.monotonic() + self.lock_timeout
+                while time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    value = self._shared_get(key)
+                    if value is not None:
+                        self.stats["coalesced"] += 1
+                        self.local.put(key, value, self.ttl)
+                        return value
+                # The other worker failed or is too slow; compute anyway
+        try:
+            value = compute()
+            if cacheable(value):
+                self.local.put(key, value, self.ttl)
+                self._shared_put(key, value)
+            return value
+        finally:
+            if self.redis is not None and acquired:
+                try:
+                    self.redis.delete(lock_key)
+                except Exception:
+                    pass
+
+    def get_or_compute(self, key, compute, cacheable=lambda value: True):
+        """
+        Returns (value, status) with status "hit", "coalesced" or "miss". compute() runs
+        at most once per key at a time; values rejected by cacheable() (errors) are returned
+        but not stored.
+        """
+        value = self._lookup(key)
+        if value is not None:
+            return value, "hit"
+
+        with self._lock:
+            event = self._in_flight.get(key)
+            leader = event is None
+            if leader:
+                event = self._in_flight[key] = threading.Event()
+
+        if not leader:
+            event.wait(self.lock_timeout)
+            value = self.local.get(key)
+            if value is not None:
+                self.stats["coalesced"] += 1
+                return value, "coalesced"
+            # The leader's result was not cacheable or it timed out; compute our own
+            return compute(), "miss"
+
+        try:
+            self.stats["misses"] += 1
+            return self._compute_with_shared_lock(key, compute, cacheable), "miss"
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            event.set()
+
+    def invalidate(self):
+        """Clears the local tier and forces a version check on the next request."""
+        self.local.clear()
+        self._versions.expire()
@@ -0,0 +1,142 @@
+import os
+import threading
+import time
+
+import numpy as np
+import shapely
+
+from dss.database import VILLAGE_ATTRIBUTES, VersionPoller, fetch_village_geometries, fetch_village_records
+from dss.response_cache import LocalLRU
+
+# How often the index and record cache check data_versions for changes (seconds)
+VILLAGE_INDEX_CHECK_SECONDS = float(os.getenv("VILLAGE_INDEX_CHECK_SECONDS", "60"))
+VILLAGE_RECORD_CACHE_SIZE = int(os.getenv("VILLAGE_RECORD_CACHE_SIZE", "100000"))
+
+
+class VillageIndex:
+    """
+    In-memory STRtree over village polygons, for resolving coordinates (e.g. from digitized
+    claims or field apps) to village ids without spatial SQL. Built from the villages table
+    on first use and rebuilt when the 'villages' version in data_versions changes, which is
+    checked at most every `version_ttl` seconds. With background_rebuild, a rebuild runs on
+    a separate thread while lookups keep using the previous tree.
+
+    A point on a shared boundary belongs to the lowest village id, as in the SQL fallback
+    refresh_patta_holder_villages().
+    """
+
+    def __init__(self, version_ttl=VILLAGE_INDEX_CHECK_SECONDS, background_rebuild=False):
+        self.background_rebuild = background_rebuild
+        self._rebuilding = False
+        # (STRtree, its prepared geometries, village ids aligned with them), swapped as one object
+        self._state = None
+        self._version = None
+        self._versions = VersionPoller(["villages"], version_ttl, self._on_version_change)
+
+    def _on_version_change(self, previous, latest):
+        version = latest["villages"]
+        if self._state is None or not self.background_rebuild:
+            self._build(version)
+            return True
+        if self._version == version:
+            # A background rebuild has finished
+            return True
+        if not self._rebuilding:
+            self._rebuilding = True
+            threading.Thread(target=self._rebuild, args=(version,), daemon=True).start()
+        # Pending until the rebuild lands; a failed one is retried on a later poll
+        return False
+
+    def _ensure_current(self):
+        self._versions.current()
+
+    def _rebuild(self, version):
+        try:
+            self._build(version)
+        except Exception as e:
+            print(f"Village index rebuild failed, still serving version {self._version}: {e}")
+        finally:
+            self._rebuilding = False
+
+    def _build(self, version):
+        start = time.perf_counter()
+        rows = fetch_village_geometries()
+        village_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        geometries = shapely.from_wkb([bytes(row[1]) for row in rows])
+        shapely.prepare(geometries)
+        tree = shapely.STRtree(geometries)
+        self._state = (tree, geometries, village_ids)
+        self._version = version
+        print(f"Built village index over {len(village_ids)} villages (version {version}) in {time.perf_counter() - start:.2f}s")
+
+    def locate(self, lons, lats):
+        """
+        Village id covering each (lon, lat) point in EPSG:4326, or -1 where no village does.
+        Takes equal-length sequences or arrays and returns an int64 array.
+        """
+        self._ensure_current()
+        tree, geometries, village_ids = self._state
+        points = shapely.points(np.asarray(lons, dtype=np.float64), np.asarray(lats, dtype=np.float64))
+        result = np.full(len(points), -1, dtype=np.int64)
+        if not len(points) or not len(village_ids):
+            return result
+
+        # Bounding-box candidates from the tree, then one vectorized covers() on the prepared
+        # polygons (a tree predicate would be evaluated on the unprepared points instead)
+        point_index, tree_index = tree.query(points)
+        covered = shapely.covers(geometries[tree_index], points[point_index])
+        point_index, tree_index = point_index[covered], tree_index[covered]
+        if not len(point_index):
+            return result
+        candidates = village_ids[tree_index]
+        # Sort by point, then village id, and keep the first match of each point
+        order = np.lexsort((candidates, point_index))
+        point_index, candidates = point_index[order], candidates[order]
+        unique_points, first = np.unique(point_index, return_index=True)
+        result[unique_points] = candidates[first]
+        return result
+
+    def locate_one(self, lon, lat):
+        """Village id covering a single point, or None."""
+        village_id = int(self.locate([lon], [lat])[0])
+        return village_id if village_id >= 0 else None
+
+    def __len__(self):
+        self._ensure_current()
+        return len(self._state[2])
+
+
+class VillageRecordCache:
+    """
+    Process-local cache of village_dss_data records (geometry-free VillageRecords) by
+    village id. Misses are fetched together in one prepared query; the cache is cleared
+    when the 'village_dss_data' version changes (checked at most every `version_ttl` seconds).
+    """
+
+    def __init__(self, max_entries=VILLAGE_RECORD_CACHE_SIZE, version_ttl=5.0, columns=VILLAGE_ATTRIBUTES, ttl=24 * 3600):
+        self.records = LocalLRU(max_entries)
+        self.columns = tuple(columns)
+        self.ttl = ttl
+        self._versions = VersionPoller(["village_dss_data"], version_ttl, self._on_version_change)
+
+    def _on_version_change(self, previous, latest):
+        if previous is not None:
+            self.records.clear()
+
+    def get_many(self, village_ids):
+        """Returns {village_id: VillageRecord} for the ids that have DSS data."""
+        self._versions.current()
+        found = {}
+        missing = []
+        for village_id in set(village_ids):
+            record = self.records.get(village_id)
+            if record is None:
+                missing.append(village_id)
+            else:
+                found[village_id] = record
+        if missing:
+            fetched = fetch_village_records(missing, self.columns)
+            for village_id, record in fetched.items():
+                self.records.put(village_id, record, self.ttl)
+            found.update(fetched)
+        return found
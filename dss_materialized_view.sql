@@ -1,4 +1,21 @@
 -- Materialized View for DSS Data
+
+-- Migration: CREATE ... IF NOT EXISTS keeps an existing view's definition, so a view created
+-- before the CV asset summary columns were added is dropped here and rebuilt below (with the
+-- unique index REFRESH ... CONCURRENTLY needs). CASCADE also drops village_dss_tiles, which
+-- reads from this view; re-run dss_tile_layers.sql afterwards.
+DO $$
+BEGIN
+    IF to_regclass('village_dss_data') IS NOT NULL AND NOT EXISTS (
+        SELECT 1 FROM pg_attribute
+        WHERE attrelid = 'village_dss_data'::regclass AND attname = 'forest_cover_area_sq_m' AND NOT attisdropped
+    ) THEN
+        RAISE NOTICE 'Rebuilding village_dss_data with the asset summary columns; re-run dss_tile_layers.sql';
+        DROP MATERIALIZED VIEW village_dss_data CASCADE;
+    END IF;
+END;
+$$;
+
 CREATE MATERIALIZED VIEW IF NOT EXISTS village_dss_data AS
 SELECT
     v.village_id,
@@ -53,7 +70,14 @@ SELECT
         WHERE id.infra_type = 'Canal'
         ORDER BY v.geometry <-> id.geometry
         LIMIT 1
-    ) AS distance_to_canal
+    ) AS distance_to_canal,
+    -- Pre-aggregated CV asset totals (see village_asset_summary); 0 when no inference has covered the village
+    COALESCE(vat.asset_count, 0) AS asset_count,
+    COALESCE(vat.farmland_area_sq_m, 0) AS farmland_area_sq_m,
+    COALESCE(vat.water_body_count, 0) AS water_body_count,
+    COALESCE(vat.water_body_area_sq_m, 0) AS water_body_area_sq_m,
+    COALESCE(vat.homestead_count, 0) AS homestead_count,
+    COALESCE(vat.forest_cover_area_sq_m, 0) AS forest_cover_area_sq_m
 FROM
     villages v
 JOIN
@@ -62,13 +86,18 @@ JOIN
     states s ON d.state_id = s.state_id
 LEFT JOIN
     village_attributes va ON v.village_id = va.village_id
+LEFT JOIN
+    village_asset_totals vat ON v.village_id = vat.village_id
 LEFT JOIN
     forest_data fd ON ST_Intersects(v.geometry, fd.geometry)
 GROUP BY
-    v.village_id, v.village_name, d.district_id, d.district_name, s.state_id, s.state_name, v.geometry, va.land_type, va.water_index, va.population;
+    v.village_id, v.village_name, d.district_id, d.district_name, s.state_id, s.state_name, v.geometry, va.land_type, va.water_index, va.population,
+    vat.asset_count, vat.farmland_area_sq_m, vat.water_body_count, vat.water_body_area_sq_m, vat.homestead_count, vat.forest_cover_area_sq_m;
 
 -- Create indexes on the materialized view for faster querying
-CREATE INDEX IF NOT EXISTS idx_village_dss_data_village_id ON village_dss_data (village_id);
+-- Unique, so the view can be refreshed CONCURRENTLY (replaces the earlier plain index)
+DROP INDEX IF EXISTS idx_village_dss_data_village_id;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_village_dss_data_village_id_unique ON village_dss_data (village_id);
 CREATE INDEX IF NOT EXISTS idx_village_dss_data_district_id ON village_dss_data (district_id);
 CREATE INDEX IF NOT EXISTS idx_village_dss_data_state_id ON village_dss_data (state_id);
 CREATE INDEX IF NOT EXISTS idx_village_dss_data_land_type ON village_dss_data (land_type);
@@ -78,4 +107,13 @@ CREATE INDEX IF NOT EXISTS idx_village_dss_data_has_road_access ON village_dss_d
 CREATE INDEX IF NOT EXISTS idx_village_dss_data_geometry ON village_dss_data USING GIST (village_geometry);
 
 -- Command to refresh the materialized view (to be run periodically)
--- REFRESH MATERIALIZED VIEW village_dss_data;
\ No newline at end of file
+-- REFRESH MATERIALIZED VIEW village_dss_data;
+-- Refreshes the view and bumps its entry in data_versions so caches keyed on it are invalidated.
+-- Use this instead of a bare REFRESH: SELECT refresh_village_dss_data();
+-- CONCURRENTLY keeps the view readable during the refresh (it needs the unique index above).
+CREATE OR REPLACE FUNCTION refresh_village_dss_data() RETURNS BIGINT AS $$
+BEGIN
+    REFRESH MATERIALIZED VIEW CONCURRENTLY village_dss_data;
+    RETURN bump_data_version('village_dss_data');
+END;
+$$ LANGUAGE plpgsql;
@@ -74,4 +74,141 @@ CREATE TABLE IF NOT EXISTS infrastructure_data (
     infra_type VARCHAR(255), -- e.g., 'Road', 'Canal', 'Well'
     status VARCHAR(255),
     geometry GEOMETRY(MultiLineString, 4326) -- Can be LineString for roads/canals, Point for wells
-);
\ No newline at end of file
+);
+
+-- Table for assets detected by the CV pipeline (cv_models/inference.py)
+CREATE TABLE IF NOT EXISTS assets (
+    asset_id BIGSERIAL PRIMARY KEY,
+    class_id INTEGER NOT NULL,       -- Segmentation class (0 is background and never stored)
+    area_sq_m FLOAT,
+    source_image TEXT,               -- Scene the asset was detected in
+    detected_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    geometry GEOMETRY(MultiPolygon, 4326)
+);
+
+CREATE INDEX IF NOT EXISTS idx_assets_geometry ON assets USING GIST (geometry);
+CREATE INDEX IF NOT EXISTS idx_assets_class_id ON assets (class_id);
+
+-- Monotonic version counters for derived data (materialized views, tile layers).
+-- Caches key their entries on these versions so a refresh invalidates them.
+CREATE TABLE IF NOT EXISTS data_versions (
+    name VARCHAR(255) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    refreshed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION bump_data_version(p_name TEXT) RETURNS BIGINT AS $$
+    INSERT INTO data_versions (name, version, refreshed_at)
+    VALUES (p_name, 1, now())
+    ON CONFLICT (name) DO UPDATE
+        SET version = data_versions.version + 1, refreshed_at = now()
+    RETURNING version;
+$$ LANGUAGE sql;
+
+-- Per-village, per-class asset totals, maintained incrementally after each inference run
+-- by cv_models/asset_summary.py so the DSS never overlays asset polygons at query time.
+CREATE TABLE IF NOT EXISTS village_asset_summary (
+    village_id INTEGER NOT NULL REFERENCES villages(village_id),
+    class_id INTEGER NOT NULL,
+    asset_count INTEGER NOT NULL,
+    total_area_sq_m FLOAT NOT NULL,   -- Asset area clipped to the village boundary
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (village_id, class_id)
+);
+
+-- One row per village with the summary pivoted into named attributes.
+-- Class ids must match ASSET_CLASSES in cv_models/asset_summary.py.
+CREATE OR REPLACE VIEW village_asset_totals AS
+SELECT
+    village_id,
+    SUM(asset_count) AS asset_count,
+    COALESCE(SUM(total_area_sq_m) FILTER (WHERE class_id = 1), 0) AS farmland_area_sq_m,
+    COALESCE(SUM(asset_count) FILTER (WHERE class_id = 2), 0) AS water_body_count,
+    COALESCE(SUM(total_area_sq_m) FILTER (WHERE class_id = 2), 0) AS water_body_area_sq_m,
+    COALESCE(SUM(asset_count) FILTER (WHERE class_id = 3), 0) AS homestead_count,
+    COALESCE(SUM(total_area_sq_m) FILTER (WHERE class_id = 4), 0) AS forest_cover_area_sq_m
+FROM village_asset_summary
+GROUP BY village_id;
+
+CREATE INDEX IF NOT EXISTS idx_assets_source_image ON assets (source_image);
+
+-- Any change to schemes or their eligibility rules bumps the 'eligibility_rules' version,
+-- which keys the recommendation cache (dss/response_cache.py) and reloads the rule engine.
+CREATE OR REPLACE FUNCTION bump_eligibility_rules_version() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM bump_data_version('eligibility_rules');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_eligibility_rules_version ON eligibility_rules;
+CREATE TRIGGER trg_eligibility_rules_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON eligibility_rules
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_eligibility_rules_version();
+
+DROP TRIGGER IF EXISTS trg_schemes_version ON schemes;
+CREATE TRIGGER trg_schemes_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON schemes
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_eligibility_rules_version();
+
+-- Village boundary changes bump the 'villages' version, which tells the in-memory village
+-- polygon index (dss/village_index.py) to rebuild.
+CREATE OR REPLACE FUNCTION bump_villages_version() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM bump_data_version('villages');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_villages_version ON villages;
+CREATE TRIGGER trg_villages_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON villages
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_villages_version();
+
+CREATE INDEX IF NOT EXISTS idx_villages_geometry ON villages USING GIST (geometry);
+
+-- Patta holders (FRA title holders) digitized from claim documents. location holds the
+-- claim's coordinates when the document has them.
+CREATE TABLE IF NOT EXISTS patta_holders (
+    patta_holder_id SERIAL PRIMARY KEY,
+    holder_name VARCHAR(255),
+    claim_type VARCHAR(10),          -- 'IFR', 'CR' or 'CFR'
+    claim_status VARCHAR(50),        -- e.g., 'filed', 'approved', 'rejected'
+    area_hectares FLOAT,
+    declared_village_id INTEGER REFERENCES villages(village_id), -- Village named on the claim, if any
+    source_document TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    location GEOMETRY(Point, 4326)
+);
+
+-- Precomputed patta holder -> village mapping, written on ingest by dss/patta_holders.py so
+-- requests never run a point-in-polygon query. The declared village wins over the location.
+CREATE TABLE IF NOT EXISTS patta_holder_villages (
+    patta_holder_id INTEGER PRIMARY KEY REFERENCES patta_holders(patta_holder_id) ON DELETE CASCADE,
+    village_id INTEGER NOT NULL REFERENCES villages(village_id),
+    resolved_by VARCHAR(10) NOT NULL  -- 'declared' or 'location'
+);
+
+CREATE INDEX IF NOT EXISTS idx_patta_holder_villages_village_id ON patta_holder_villages (village_id);
+
+-- Rebuilds the whole mapping in SQL, e.g. after village boundaries are re-imported.
+-- Bumps 'patta_holder_villages' so in-memory resolvers reload.
+CREATE OR REPLACE FUNCTION refresh_patta_holder_villages() RETURNS BIGINT AS $$
+BEGIN
+    DELETE FROM patta_holder_villages;
+    INSERT INTO patta_holder_villages (patta_holder_id, village_id, resolved_by)
+    SELECT p.patta_holder_id, p.declared_village_id, 'declared'
+    FROM patta_holders p
+    WHERE p.declared_village_id IS NOT NULL;
+    INSERT INTO patta_holder_villages (patta_holder_id, village_id, resolved_by)
+    SELECT p.patta_holder_id, v.village_id, 'location'
+    FROM patta_holders p
+    CROSS JOIN LATERAL (
+        SELECT village_id FROM villages
+        WHERE ST_Covers(geometry, p.location)
+        ORDER BY village_id LIMIT 1
+    ) v
+    WHERE p.declared_village_id IS NULL AND p.location IS NOT NULL;
+    RETURN bump_data_version('patta_holder_villages');
+END;
+$$ LANGUAGE plpgsql;
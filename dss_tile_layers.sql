@@ -0,0 +1,169 @@
+-- Pre-simplified geometry for the vector tile layers served by tiles/tile_server.py.
+-- Each source geometry is transformed to Web Mercator once and stored at one
+-- simplification level per zoom band, so tile requests never simplify on the fly.
+--
+-- Zoom bands must match ZOOM_BANDS in tiles/layers.py. The tolerance of each band is
+-- the size of one tile pixel (4096 extent) at the band's highest zoom:
+--   band 0: z0-5   -> 305.7 m
+--   band 1: z6-9   ->  19.1 m
+--   band 2: z10-13 ->   1.2 m
+--   band 3: z14+   ->   full resolution
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS states_tiles AS
+SELECT
+    s.state_id,
+    s.state_name,
+    b.zoom_band,
+    ST_SimplifyPreserveTopology(ST_Transform(s.geometry, 3857), b.tolerance) AS geom_3857
+FROM states s
+CROSS JOIN (VALUES (0, 305.7), (1, 19.1), (2, 1.2), (3, 0.0)) AS b(zoom_band, tolerance);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS districts_tiles AS
+SELECT
+    d.district_id,
+    d.district_name,
+    d.state_id,
+    b.zoom_band,
+    ST_SimplifyPreserveTopology(ST_Transform(d.geometry, 3857), b.tolerance) AS geom_3857
+FROM districts d
+CROSS JOIN (VALUES (0, 305.7), (1, 19.1), (2, 1.2), (3, 0.0)) AS b(zoom_band, tolerance);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS villages_tiles AS
+SELECT
+    v.village_id,
+    v.village_name,
+    v.district_id,
+    b.zoom_band,
+    ST_SimplifyPreserveTopology(ST_Transform(v.geometry, 3857), b.tolerance) AS geom_3857
+FROM villages v
+CROSS JOIN (VALUES (0, 305.7), (1, 19.1), (2, 1.2), (3, 0.0)) AS b(zoom_band, tolerance);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS village_dss_tiles AS
+SELECT
+    d.village_id,
+    d.village_name,
+    d.land_type,
+    d.water_index,
+    d.population,
+    d.has_forest,
+    d.forest_area_percentage,
+    d.has_road_access,
+    b.zoom_band,
+    ST_SimplifyPreserveTopology(ST_Transform(d.village_geometry, 3857), b.tolerance) AS geom_3857
+FROM village_dss_data d
+CROSS JOIN (VALUES (0, 305.7), (1, 19.1), (2, 1.2), (3, 0.0)) AS b(zoom_band, tolerance);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS forest_tiles AS
+SELECT
+    f.forest_id,
+    f.forest_type,
+    f.area,
+    b.zoom_band,
+    ST_SimplifyPreserveTopology(ST_Transform(f.geometry, 3857), b.tolerance) AS geom_3857
+FROM forest_data f
+CROSS JOIN (VALUES (0, 305.7), (1, 19.1), (2, 1.2), (3, 0.0)) AS b(zoom_band, tolerance);
+
+-- Points cannot be simplified; a single band is shared by all zooms
+CREATE MATERIALIZED VIEW IF NOT EXISTS groundwater_tiles AS
+SELECT
+    g.gw_id,
+    g.water_level,
+    g.quality,
+    b.zoom_band,
+    ST_Transform(g.geometry, 3857) AS geom_3857
+FROM groundwater_data g
+CROSS JOIN (VALUES (0), (1), (2), (3)) AS b(zoom_band);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS infrastructure_tiles AS
+SELECT
+    i.infra_id,
+    i.infra_type,
+    i.status,
+    b.zoom_band,
+    ST_Simplify(ST_Transform(i.geometry, 3857), b.tolerance) AS geom_3857
+FROM infrastructure_data i
+CROSS JOIN (VALUES (0, 305.7), (1, 19.1), (2, 1.2), (3, 0.0)) AS b(zoom_band, tolerance);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS assets_tiles AS
+SELECT
+    a.asset_id,
+    a.class_id,
+    a.area_sq_m,
+    b.zoom_band,
+    ST_SimplifyPreserveTopology(ST_Transform(a.geometry, 3857), b.tolerance) AS geom_3857
+FROM assets a
+CROSS JOIN (VALUES (0, 305.7), (1, 19.1), (2, 1.2), (3, 0.0)) AS b(zoom_band, tolerance);
+
+-- Tile queries filter on zoom_band and the tile envelope, so index both
+CREATE INDEX IF NOT EXISTS idx_states_tiles_geom ON states_tiles USING GIST (geom_3857);
+CREATE INDEX IF NOT EXISTS idx_states_tiles_band ON states_tiles (zoom_band);
+CREATE INDEX IF NOT EXISTS idx_districts_tiles_geom ON districts_tiles USING GIST (geom_3857);
+CREATE INDEX IF NOT EXISTS idx_districts_tiles_band ON districts_tiles (zoom_band);
+CREATE INDEX IF NOT EXISTS idx_villages_tiles_geom ON villages_tiles USING GIST (geom_3857);
+CREATE INDEX IF NOT EXISTS idx_villages_tiles_band ON villages_tiles (zoom_band);
+CREATE INDEX IF NOT EXISTS idx_village_dss_tiles_geom ON village_dss_tiles USING GIST (geom_3857);
+CREATE INDEX IF NOT EXISTS idx_village_dss_tiles_band ON village_dss_tiles (zoom_band);
+CREATE INDEX IF NOT EXISTS idx_forest_tiles_geom ON forest_tiles USING GIST (geom_3857);
+CREATE INDEX IF NOT EXISTS idx_forest_tiles_band ON forest_tiles (zoom_band);
+CREATE INDEX IF NOT EXISTS idx_groundwater_tiles_geom ON groundwater_tiles USING GIST (geom_3857);
+CREATE INDEX IF NOT EXISTS idx_groundwater_tiles_band ON groundwater_tiles (zoom_band);
+CREATE INDEX IF NOT EXISTS idx_infrastructure_tiles_geom ON infrastructure_tiles USING GIST (geom_3857);
+CREATE INDEX IF NOT EXISTS idx_infrastructure_tiles_band ON infrastructure_tiles (zoom_band);
+CREATE INDEX IF NOT EXISTS idx_assets_tiles_geom ON assets_tiles USING GIST (geom_3857);
+CREATE INDEX IF NOT EXISTS idx_assets_tiles_band ON assets_tiles (zoom_band);
+
+-- Refreshes a tile layer and bumps its data version, which invalidates the tile cache for it.
+-- Example: SELECT refresh_tile_layer('assets_tiles');
+CREATE OR REPLACE FUNCTION refresh_tile_layer(p_view TEXT) RETURNS BIGINT AS $$
+BEGIN
+    EXECUTE format('REFRESH MATERIALIZED VIEW %I', p_view);
+    RETURN bump_data_version(p_view);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Refreshes every tile layer; run after boundary imports or a village_dss_data refresh.
+CREATE OR REPLACE FUNCTION refresh_tile_layers() RETURNS VOID AS $$
+BEGIN
+    PERFORM refresh_tile_layer('states_tiles');
+    PERFORM refresh_tile_layer('districts_tiles');
+    PERFORM refresh_tile_layer('villages_tiles');
+    PERFORM refresh_tile_layer('village_dss_tiles');
+    PERFORM refresh_tile_layer('forest_tiles');
+    PERFORM refresh_tile_layer('groundwater_tiles');
+    PERFORM refresh_tile_layer('infrastructure_tiles');
+    PERFORM refresh_tile_layer('assets_tiles');
+END;
+$$ LANGUAGE plpgsql;
+
+-- Envelopes of boundary geometries touched since the last seed, consumed by
+-- tiles/seed_tiles.py so reruns only regenerate the affected tiles.
+CREATE TABLE IF NOT EXISTS tile_dirty_regions (
+    change_id BIGSERIAL PRIMARY KEY,
+    source_table VARCHAR(255) NOT NULL,
+    envelope GEOMETRY(Polygon, 4326) NOT NULL,
+    changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION record_tile_dirty_region() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.geometry IS NOT NULL THEN
+        INSERT INTO tile_dirty_regions (source_table, envelope)
+        VALUES (TG_TABLE_NAME, ST_Envelope(ST_Buffer(ST_Envelope(OLD.geometry), 0.000001)));
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.geometry IS NOT NULL THEN
+        INSERT INTO tile_dirty_regions (source_table, envelope)
+        VALUES (TG_TABLE_NAME, ST_Envelope(ST_Buffer(ST_Envelope(NEW.geometry), 0.000001)));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_states_tile_dirty ON states;
+CREATE TRIGGER trg_states_tile_dirty AFTER INSERT OR UPDATE OR DELETE ON states
+    FOR EACH ROW EXECUTE FUNCTION record_tile_dirty_region();
+DROP TRIGGER IF EXISTS trg_districts_tile_dirty ON districts;
+CREATE TRIGGER trg_districts_tile_dirty AFTER INSERT OR UPDATE OR DELETE ON districts
+    FOR EACH ROW EXECUTE FUNCTION record_tile_dirty_region();
+DROP TRIGGER IF EXISTS trg_villages_tile_dirty ON villages;
+CREATE TRIGGER trg_villages_tile_dirty AFTER INSERT OR UPDATE OR DELETE ON villages
+    FOR EACH ROW EXECUTE FUNCTION record_tile_dirty_region();
@@ -0,0 +1,230 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from psycopg2.extras import execute_values
+
+from dss.database import get_db_connection
+
+TARGET_SRID = 4326
+
+# Each administrative level, the table it lands in and the level it hangs off.
+# Levels are listed parent-first so that foreign keys can be resolved in order.
+LEVELS = {
+    "state": {"table": "states", "id_column": "state_id", "name_column": "state_name", "parent": None},
+    "district": {"table": "districts", "id_column": "district_id", "name_column": "district_name", "parent": "state"},
+    "village": {"table": "villages", "id_column": "village_id", "name_column": "village_name", "parent": "district"},
+}
+
+
+def to_multipolygons(geometries):
+    """
+    Coerces an array of geometries to MultiPolygons.
+    Polygons are wrapped, invalid geometries are repaired and anything that does not
+    end up polygonal is returned as None so the caller can drop it.
+    """
+    geometries = shapely.make_valid(np.asarray(geometries, dtype=object))
+    out = np.full(len(geometries), None, dtype=object)
+
+    # Split everything into single parts and regroup the polygonal ones per feature;
+    # this handles Polygons, MultiPolygons and the GeometryCollections make_valid can return
+    parts, owner = shapely.get_parts(geometries, return_index=True)
+    polygonal = shapely.get_type_id(parts) == 3
+    if polygonal.any():
+        grouped = shapely.multipolygons(parts[polygonal], indices=owner[polygonal])
+        present = np.unique(owner[polygonal])
+        out[present] = grouped[present]
+    return out
+
+
+def read_level(level, path, name_field):
+    """
+    Reads one boundary file, reprojects it to EPSG:4326 and normalises geometries.
+    Runs in a worker process, so it returns plain arrays rather than a GeoDataFrame.
+    """
+    start = time.perf_counter()
+    gdf = gpd.read_file(path)
+    if gdf.crs is None:
+        print(f"Warning: {path} has no CRS, assuming EPSG:{TARGET_SRID}")
+        gdf = gdf.set_crs(epsg=TARGET_SRID)
+    elif gdf.crs.to_epsg() != TARGET_SRID:
+        gdf = gdf.to_crs(epsg=TARGET_SRID)
+
+    if name_field not in gdf.columns:
+        raise ValueError(f"Name field '{name_field}' not found in {path}. Columns: {gdf.columns.tolist()}")
+
+    geometries = to_multipolygons(gdf.geometry.values)
+    keep = np.array([g is not None and not g.is_empty for g in geometries], dtype=bool)
+    dropped = int((~keep).sum())
+    if dropped:
+        print(f"  {level}: dropped {dropped} non-polygonal or empty features")
+
+    names = gdf[name_field].astype(str).to_numpy()[keep]
+    wkb = shapely.to_wkb(geometries[keep], hex=False)
+    return {
+        "level": level,
+        "names": names,
+        "wkb": wkb,
+        "read_seconds": time.perf_counter() - start,
+    }
+
+
+def resolve_parents(child_geometries, parent_geometries, parent_ids):
+    """
+    Assigns each child geometry to the parent polygon containing it, using a single
+    bulk STRtree query instead of one spatial lookup per row.
+    A representative point of the child is used so slivers along shared borders do
+    not produce multiple matches; children outside every parent fall back to the
+    nearest parent. Returns an array of parent ids aligned with child_geometries.
+    """
+    tree = shapely.STRtree(parent_geometries)
+    points = shapely.point_on_surface(child_geometries)
+
+    child_idx, parent_idx = tree.query(points, predicate="within")
+    resolved = np.full(len(child_geometries), -1, dtype=np.int64)
+    # Reverse so the first match for each child wins the assignment
+    resolved[child_idx[::-1]] = parent_ids[parent_idx[::-1]]
+
+    missing = np.flatnonzero(resolved == -1)
+    if len(missing):
+        near_child, near_parent = tree.query_nearest(points[missing], return_distance=False)
+        resolved[missing[near_child[::-1]]] = parent_ids[near_parent[::-1]]
+        print(f"  {len(missing)} features fell outside every parent polygon; assigned to nearest parent")
+    return resolved
+
+
+def bulk_insert(conn, level, names, wkb, parent_ids=None, page_size=1000):
+    """Bulk-loads one level and returns the generated primary keys in input order."""
+    config = LEVELS[level]
+    columns = [config["name_column"], "geometry"]
+    template = f"(%s, ST_Multi(ST_GeomFromWKB(%s, {TARGET_SRID})))"
+    rows = [(name, geom) for name, geom in zip(names, wkb)]
+    if parent_ids is not None:
+        parent_column = LEVELS[config["parent"]]["id_column"]
+        columns.insert(1, parent_column)
+        template = f"(%s, %s, ST_Multi(ST_GeomFromWKB(%s, {TARGET_SRID})))"
+        rows = [(name, int(pid), geom) for name, pid, geom in zip(names, parent_ids, wkb)]
+
+    query = f"INSERT INTO {config['table']} ({', '.join(columns)}) VALUES %s RETURNING {config['id_column']}"
+    with conn.cursor() as cur:
+        returned = execute_values(cur, query, rows, template=template, page_size=page_size, fetch=True)
+    return np.array([r[0] for r in returned], dtype=np.int64)
+
+
+def import_boundaries(level_files, name_fields=None, workers=None, truncate=False):
+    """
+    Loads state, district and village boundaries into PostGIS in one pass.
+    Args:
+        level_files (dict): Maps 'state'/'district'/'village' to a boundary file path.
+        name_fields (dict): Maps each level to the attribute holding its name.
+        workers (int): Number of processes used to read and reproject files.
+        truncate (bool): Empty the boundary tables before loading.
+    Returns:
+        dict: Per-level summary with feature counts and timings.
+    """
+    name_fields = name_fields or {}
+    levels = [level for level in LEVELS if level_files.get(level)]
+    for level in levels:
+        if not os.path.exists(level_files[level]):
+            print(f"Error: Shapefile not found at {level_files[level]}")
+            return None
+        parent = LEVELS[level]["parent"]
+        if parent and parent not in levels:
+            print(f"Error: loading {level} boundaries requires the {parent} file as well")
+            return None
+
+    total_start = time.perf_counter()
+    read_results = {}
+    with ProcessPoolExecutor(max_workers=workers or len(levels)) as pool:
+        futures = {
+            level: pool.submit(read_level, level, level_files[level], name_fields.get(level, "name"))
+            for level in levels
+        }
+        for level, future in futures.items():
+            read_results[level] = future.result()
+            print(f"Read {len(read_results[level]['names'])} {level} features in {read_results[level]['read_seconds']:.2f}s")
+
+    summary = {}
+    conn = None
+    try:
+        conn = get_db_connection()
+        if truncate:
+            with conn.cursor() as cur:
+                cur.execute("TRUNCATE villages, districts, states RESTART IDENTITY CASCADE")
+
+        loaded = {}
+        for level in levels:
+            result = read_results[level]
+            parent = LEVELS[level]["parent"]
+
+            join_seconds = 0.0
+            parent_ids = None
+            if parent:
+                join_start = time.perf_counter()
+                parent_ids = resolve_parents(
+                    shapely.from_wkb(result["wkb"]),
+                    shapely.from_wkb(read_results[parent]["wkb"]),
+                    loaded[parent],
+                )
+                join_seconds = time.perf_counter() - join_start
+
+            load_start = time.perf_counter()
+            loaded[level] = bulk_insert(conn, level, result["names"], result["wkb"], parent_ids)
+            load_seconds = time.perf_counter() - load_start
+
+            count = len(loaded[level])
+            summary[level] = {
+                "features": count,
+                "read_seconds": round(result["read_seconds"], 3),
+                "join_seconds": round(join_seconds, 3),
+                "load_seconds": round(load_seconds, 3),
+                "features_per_second": round(count / load_seconds, 1) if load_seconds else None,
+            }
+        conn.commit()
+    except Exception as e:
+        print(f"Error importing boundaries: {e}")
+        if conn:
+            conn.rollback()
+        return None
+    finally:
+        if conn:
+            conn.close()
+
+    total_seconds = time.perf_counter() - total_start
+    total_features = sum(s["features"] for s in summary.values())
+    print("\nBoundary import summary:")
+    for level, stats in summary.items():
+        print(f"  {level:<9} {stats['features']:>8} features | read {stats['read_seconds']}s | "
+              f"join {stats['join_seconds']}s | load {stats['load_seconds']}s | {stats['features_per_second']} features/s")
+    print(f"  total     {total_features:>8} features in {total_seconds:.2f}s "
+          f"({total_features / total_seconds:.1f} features/s)")
+    summary["total"] = {"features": total_features, "seconds": round(total_seconds, 3)}
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import state, district and village boundaries into PostGIS.")
+    parser.add_argument("--states", default="data/geospatial/state_boundaries.shp")
+    parser.add_argument("--districts", default="data/geospatial/district_boundaries.shp")
+    parser.add_argument("--villages", default="data/geospatial/village_boundaries.shp")
+    parser.add_argument("--state-name-field", default="name")
+    parser.add_argument("--district-name-field", default="name")
+    parser.add_argument("--village-name-field", default="name")
+    parser.add_argument("--workers", type=int, default=None, help="Processes used to read and reproject files")
+    parser.add_argument("--truncate", action="store_true", help="Empty the boundary tables before loading")
+    args = parser.parse_args()
+
+    import_boundaries(
+        {"state": args.states, "district": args.districts, "village": args.villages},
+        name_fields={
+            "state": args.state_name_field,
+            "district": args.district_name_field,
+            "village": args.village_name_field,
+        },
+        workers=args.workers,
+        truncate=args.truncate,
+    )
@@ -0,0 +1,138 @@
+import math
+
+# (min_zoom, max_zoom) for each simplification band in dss_tile_layers.sql
+ZOOM_BANDS = [(0, 5), (6, 9), (10, 13), (14, 24)]
+MAX_ZOOM = ZOOM_BANDS[-1][1]
+
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+
+# Boundary layers change rarely and can be pre-seeded with tiles/seed_tiles.py
+BOUNDARY_LAYERS = ["states", "districts", "villages"]
+
+# Layer name -> materialized view holding its pre-simplified geometry and the
+# attribute columns written into each feature. The view name doubles as the
+# data_versions key bumped by refresh_tile_layer().
+LAYERS = {
+    "states": {
+        "view": "states_tiles",
+        "id_column": "state_id",
+        "attributes": ["state_name"],
+    },
+    "districts": {
+        "view": "districts_tiles",
+        "id_column": "district_id",
+        "attributes": ["district_name", "state_id"],
+    },
+    "villages": {
+        "view": "villages_tiles",
+        "id_column": "village_id",
+        "attributes": ["village_name", "district_id"],
+    },
+    "village_dss_data": {
+        "view": "village_dss_tiles",
+        "id_column": "village_id",
+        "attributes": [
+            "village_name", "land_type", "water_index", "population",
+            "has_forest", "forest_area_percentage", "has_road_access",
+        ],
+    },
+    "forest": {
+        "view": "forest_tiles",
+        "id_column": "forest_id",
+        "attributes": ["forest_type", "area"],
+    },
+    "groundwater": {
+        "view": "groundwater_tiles",
+        "id_column": "gw_id",
+        "attributes": ["water_level", "quality"],
+    },
+    "infrastructure": {
+        "view": "infrastructure_tiles",
+        "id_column": "infra_id",
+        "attributes": ["infra_type", "status"],
+    },
+    "assets": {
+        "view": "assets_tiles",
+        "id_column": "asset_id",
+        "attributes": ["class_id", "area_sq_m"],
+    },
+}
+
+
+def zoom_band(z):
+    """Returns the index of the simplification band used for zoom level z."""
+    for band, (min_zoom, max_zoom) in enumerate(ZOOM_BANDS):
+        if min_zoom <= z <= max_zoom:
+            return band
+    raise ValueError(f"Zoom level {z} is outside the supported range 0-{MAX_ZOOM}")
+
+
+def is_valid_tile(z, x, y):
+    """Checks that (z, x, y) addresses an existing tile in the XYZ scheme."""
+    if not 0 <= z <= MAX_ZOOM:
+        return False
+    n = 1 << z
+    return 0 <= x < n and 0 <= y < n
+
+
+def tile_range(bbox, z):
+    """
+    Returns the inclusive (min_x, min_y, max_x, max_y) XYZ tile range at zoom z
+    covering a (min_lon, min_lat, max_lon, max_lat) bounding box.
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    max_index = (1 << z) - 1
+
+    def to_tile(lon, lat):
+        lat = max(min(lat, 85.0511287798), -85.0511287798)
+        n = 1 << z
+        x = int((lon + 180.0) / 360.0 * n)
+        y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+        return min(max(x, 0), max_index), min(max(y, 0), max_index)
+
+    min_x, min_y = to_tile(min_lon, max_lat)
+    max_x, max_y = to_tile(max_lon, min_lat)
+    return min_x, min_y, max_x, max_y
+
+
+def tiles_in_bbox(bbox, min_zoom, max_zoom):
+    """Yields every (z, x, y) tile covering bbox between min_zoom and max_zoom inclusive."""
+    for z in range(min_zoom, max_zoom + 1):
+        min_x, min_y, max_x, max_y = tile_range(bbox, z)
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                yield z, x, y
+
+
+def build_tile_query(layer):
+    """
+    Builds the ST_AsMVT query for a layer. The query takes z, x, y and band as
+    named parameters and returns a single bytea row (empty for empty tiles).
+    """
+    config = LAYERS[layer]
+    columns = ", ".join(["t." + config["id_column"]] + ["t." + c for c in config["attributes"]])
+    return f"""
+        WITH bounds AS (
+            SELECT ST_TileEnvelope(%(z)s, %(x)s, %(y)s) AS geom
+        ),
+        mvtgeom AS (
+            SELECT
+                ST_AsMVTGeom(t.geom_3857, bounds.geom, {TILE_EXTENT}, {TILE_BUFFER}, true) AS geom,
+                {columns}
+            FROM {config['view']} t, bounds
+            WHERE t.zoom_band = %(band)s AND t.geom_3857 && bounds.geom
+        )
+        SELECT ST_AsMVT(mvtgeom.*, '{layer}', {TILE_EXTENT}, 'geom', '{config['id_column']}') FROM mvtgeom
+    """
+
+
+# Queries are static per layer, so build them once
+_TILE_QUERIES = {layer: build_tile_query(layer) for layer in LAYERS}
+
+
+def render_mvt(cur, layer, z, x, y):
+    """Renders one uncompressed MVT tile for a layer with an open cursor. Returns b"" for empty tiles."""
+    cur.execute(_TILE_QUERIES[layer], {"z": z, "x": x, "y": y, "band": zoom_band(z)})
+    row = cur.fetchone()
+    return bytes(row[0]) if row and row[0] is not None else b""
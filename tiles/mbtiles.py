@@ -0,0 +1,93 @@
+import sqlite3
+import threading
+
+
+class MBTiles:
+    """
+    Minimal reader/writer for the MBTiles 1.3 container (a SQLite file).
+    Tiles are addressed with XYZ coordinates; the TMS row flip required by the
+    spec is handled internally. Connections are per-thread so a single instance
+    can be shared by a threaded web server.
+    """
+
+    def __init__(self, path, metadata=None):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS tiles (
+                zoom_level INTEGER,
+                tile_column INTEGER,
+                tile_row INTEGER,
+                tile_data BLOB,
+                PRIMARY KEY (zoom_level, tile_column, tile_row)
+            );
+        """)
+        conn.commit()
+        if metadata:
+            self.set_metadata(metadata)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _tms_row(z, y):
+        return (1 << z) - 1 - y
+
+    def get_tile(self, z, x, y):
+        """Returns the stored tile bytes or None if the tile is not present."""
+        row = self._connection().execute(
+            "SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+            (z, x, self._tms_row(z, y)),
+        ).fetchone()
+        return row[0] if row else None
+
+    def put_tile(self, z, x, y, data):
+        self.put_tiles([(z, x, y, data)])
+
+    def put_tiles(self, tiles):
+        """Writes an iterable of (z, x, y, data) in a single transaction."""
+        conn = self._connection()
+        conn.executemany(
+            "INSERT OR REPLACE INTO tiles (zoom_level, tile_column, tile_row, tile_data) VALUES (?, ?, ?, ?)",
+            ((z, x, self._tms_row(z, y), sqlite3.Binary(data)) for z, x, y, data in tiles),
+        )
+        conn.commit()
+
+    def delete_tiles(self, tiles):
+        """Removes an iterable of (z, x, y) tiles."""
+        conn = self._connection()
+        conn.executemany(
+            "DELETE FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+            ((z, x, self._tms_row(z, y)) for z, x, y in tiles),
+        )
+        conn.commit()
+
+    def clear(self):
+        conn = self._connection()
+        conn.execute("DELETE FROM tiles")
+        conn.commit()
+
+    def get_metadata(self):
+        return dict(self._connection().execute("SELECT name, value FROM metadata").fetchall())
+
+    def set_metadata(self, metadata):
+        conn = self._connection()
+        conn.executemany(
+            "INSERT OR REPLACE INTO metadata (name, value) VALUES (?, ?)",
+            [(k, str(v)) for k, v in metadata.items()],
+        )
+        conn.commit()
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -0,0 +1,224 @@
+import argparse
+import gzip
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dss.database import get_db_connection
+from tiles.layers import BOUNDARY_LAYERS, LAYERS, render_mvt, tiles_in_bbox
+from tiles.mbtiles import MBTiles
+
+# Rough extent of India, used when the boundary tables are empty
+DEFAULT_BOUNDS = (68.0, 6.5, 97.5, 37.5)
+
+_local = threading.local()
+
+
+def _cursor():
+    # One connection per worker thread, reused for every tile that thread renders
+    conn = getattr(_local, "conn", None)
+    if conn is None or conn.closed:
+        conn = get_db_connection()
+        conn.autocommit = True
+        _local.conn = conn
+    return conn.cursor()
+
+
+def render_combined_tile(layers, z, x, y):
+    """
+    Renders all requested layers for one tile. MVT layers are independent protobuf
+    messages, so concatenating them yields a single valid multi-layer tile.
+    """
+    cur = _cursor()
+    try:
+        data = b"".join(render_mvt(cur, layer, z, x, y) for layer in layers)
+    finally:
+        cur.close()
+    return z, x, y, data
+
+
+def fetch_layer_bounds(layers):
+    """Returns the lon/lat bounding box covering the source tables of the given layers."""
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        # Boundary layers are named after their source tables
+        extents = " UNION ALL ".join(f"SELECT geometry FROM {layer}" for layer in layers)
+        cur.execute(f"SELECT ST_XMin(e), ST_YMin(e), ST_XMax(e), ST_YMax(e) FROM (SELECT ST_Extent(geometry) AS e FROM ({extents}) g) b")
+        row = cur.fetchone()
+        cur.close()
+        if row and row[0] is not None:
+            return tuple(float(v) for v in row)
+        return DEFAULT_BOUNDS
+    finally:
+        if conn:
+            conn.close()
+
+
+def refresh_tile_views(layers):
+    """Refreshes the pre-simplified tile views of the given layers so seeding sees current data."""
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        for layer in layers:
+            cur.execute("SELECT refresh_tile_layer(%s)", (LAYERS[layer]["view"],))
+        conn.commit()
+        cur.close()
+    finally:
+        if conn:
+            conn.close()
+
+
+def fetch_dirty_regions(layers, since_change_id):
+    """
+    Returns (bboxes, changed_layers, last_change_id) for boundary edits recorded in
+    tile_dirty_regions after since_change_id.
+    """
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT change_id, source_table, ST_XMin(envelope), ST_YMin(envelope), ST_XMax(envelope), ST_YMax(envelope) "
+            "FROM tile_dirty_regions WHERE change_id > %s AND source_table = ANY(%s) ORDER BY change_id",
+            (since_change_id, list(layers)),
+        )
+        rows = cur.fetchall()
+        cur.close()
+        last_change_id = rows[-1][0] if rows else since_change_id
+        changed_layers = sorted({row[1] for row in rows})
+        return [tuple(float(v) for v in row[2:]) for row in rows], changed_layers, last_change_id
+    finally:
+        if conn:
+            conn.close()
+
+
+def seed_tiles(output_path, layers=None, min_zoom=0, max_zoom=10, bbox=None, workers=8, full=False, batch_size=500):
+    """
+    Pre-renders vector tiles for the boundary layers into a single MBTiles file.
+
+    On the first run (or with full=True) every tile covering the data extent is rendered.
+    Later runs only re-render tiles intersecting boundaries edited since the previous run,
+    as recorded by the tile_dirty_regions trigger, or the explicit bbox if one is given.
+    """
+    layers = layers or BOUNDARY_LAYERS
+    start = time.perf_counter()
+    exists = os.path.exists(output_path)
+    mbtiles = MBTiles(output_path)
+    metadata = mbtiles.get_metadata()
+
+    last_change_id = int(metadata.get("last_change_id", 0))
+    dirty_regions, changed_layers, latest_change_id = fetch_dirty_regions(layers, last_change_id)
+    bounds = fetch_layer_bounds(layers)
+    if bbox:
+        regions = [bbox]
+        refresh_tile_views(layers)
+        print(f"Regenerating tiles in bbox {bbox}")
+    elif full or not exists or "last_change_id" not in metadata:
+        # Everything is re-rendered, so edits recorded so far are covered by this run
+        regions = [bounds]
+        last_change_id = latest_change_id
+        refresh_tile_views(layers)
+        print(f"Seeding all tiles in {bounds}")
+    else:
+        if not dirty_regions:
+            print("No boundary changes since the last seed; nothing to do.")
+            return {"rendered": 0, "written": 0, "deleted": 0, "seconds": round(time.perf_counter() - start, 3)}
+        regions = dirty_regions
+        last_change_id = latest_change_id
+        refresh_tile_views(changed_layers)
+        print(f"Regenerating tiles for {len(regions)} changed regions")
+
+    # Deduplicate tiles shared by overlapping regions
+    tiles = sorted({tile for region in regions for tile in tiles_in_bbox(region, min_zoom, max_zoom)})
+    print(f"Rendering {len(tiles)} tiles for layers {layers} at zooms {min_zoom}-{max_zoom} with {workers} workers")
+
+    written, deleted = 0, 0
+    pending_writes, pending_deletes = [], []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(lambda t: render_combined_tile(layers, *t), tiles)
+        for i, (z, x, y, data) in enumerate(results, 1):
+            if data:
+                pending_writes.append((z, x, y, gzip.compress(data, compresslevel=9)))
+            else:
+                # Empty tiles are not stored; drop any stale copy from a previous run
+                pending_deletes.append((z, x, y))
+            if len(pending_writes) + len(pending_deletes) >= batch_size:
+                mbtiles.put_tiles(pending_writes)
+                mbtiles.delete_tiles(pending_deletes)
+                written += len(pending_writes)
+                deleted += len(pending_deletes)
+                pending_writes, pending_deletes = [], []
+            if i % 10000 == 0:
+                elapsed = time.perf_counter() - start
+                print(f"  {i}/{len(tiles)} tiles ({i / elapsed:.0f} tiles/s)")
+
+    mbtiles.put_tiles(pending_writes)
+    mbtiles.delete_tiles(pending_deletes)
+    written += len(pending_writes)
+    deleted += len(pending_deletes)
+
+    mbtiles.set_metadata({
+        "name": "fra_atlas_boundaries",
+        "format": "pbf",
+        "type": "baselayer",
+        "minzoom": min_zoom,
+        "maxzoom": max_zoom,
+        "bounds": ",".join(str(v) for v in bounds),
+        "json": json.dumps({"vector_layers": [
+            {"id": layer, "fields": {}, "minzoom": min_zoom, "maxzoom": max_zoom} for layer in layers
+        ]}),
+        "last_change_id": last_change_id,
+    })
+    mbtiles.close()
+
+    seconds = time.perf_counter() - start
+    print(f"Seeded {output_path}: {written} tiles written, {deleted} empty tiles removed in {seconds:.1f}s "
+          f"({len(tiles) / seconds:.0f} tiles/s)")
+    return {"rendered": len(tiles), "written": written, "deleted": deleted, "seconds": round(seconds, 3)}
+
+
+def export_pmtiles(mbtiles_path, pmtiles_path, max_zoom):
+    """Converts a seeded MBTiles file into a single PMTiles archive (requires the `pmtiles` package)."""
+    try:
+        from pmtiles.convert import mbtiles_to_pmtiles
+    except ImportError:
+        print("PMTiles export requires the pmtiles package: pip install pmtiles")
+        return False
+    mbtiles_to_pmtiles(mbtiles_path, pmtiles_path, max_zoom)
+    print(f"Exported {pmtiles_path}")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-render boundary vector tiles into an MBTiles/PMTiles file.")
+    parser.add_argument("output", help="Output .mbtiles or .pmtiles path")
+    parser.add_argument("--layers", nargs="+", default=BOUNDARY_LAYERS, choices=BOUNDARY_LAYERS)
+    parser.add_argument("--min-zoom", type=int, default=0)
+    parser.add_argument("--max-zoom", type=int, default=10)
+    parser.add_argument("--bbox", type=float, nargs=4, metavar=("MIN_LON", "MIN_LAT", "MAX_LON", "MAX_LAT"),
+                        help="Only regenerate tiles in this bounding box")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent tile renderers")
+    parser.add_argument("--full", action="store_true", help="Re-render everything instead of only changed regions")
+    args = parser.parse_args()
+
+    # PMTiles is a read-only archive, so seeding always goes through an MBTiles file
+    mbtiles_path = args.output
+    if args.output.endswith(".pmtiles"):
+        mbtiles_path = args.output[:-len(".pmtiles")] + ".mbtiles"
+
+    seed_tiles(
+        mbtiles_path,
+        layers=args.layers,
+        min_zoom=args.min_zoom,
+        max_zoom=args.max_zoom,
+        bbox=tuple(args.bbox) if args.bbox else None,
+        workers=args.workers,
+        full=args.full,
+    )
+    if args.output.endswith(".pmtiles"):
+        export_pmtiles(mbtiles_path, args.output, args.max_zoom)
@@ -0,0 +1,145 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from dss.database import VersionPoller
+from tiles.layers import LAYERS
+from tiles.mbtiles import MBTiles
+
+
+class LRUTileCache:
+    """Thread-safe in-memory LRU bounded by the total size of the cached tiles in bytes."""
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        size = len(entry["data"])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= len(previous["data"])
+            self._entries[key] = entry
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted["data"])
+
+    def drop_layer(self, layer):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == layer]:
+                self.current_bytes -= len(self._entries.pop(key)["data"])
+
+
+class TileCache:
+    """
+    Two-level tile cache: an in-memory LRU in front of one MBTiles file per layer.
+
+    Every entry is tagged with the layer's version from data_versions. Versions are
+    polled at most every `version_ttl` seconds; when a layer's version moves on, its
+    memory entries are dropped and its MBTiles file is cleared, so a refreshed tile
+    view is never served stale for longer than the poll interval.
+    """
+
+    def __init__(self, cache_dir="tile_cache", max_memory_bytes=256 * 1024 * 1024, version_ttl=5.0):
+        self.cache_dir = cache_dir
+        self.version_ttl = version_ttl
+        self.memory = LRUTileCache(max_memory_bytes)
+        self._disk = {}
+        self._disk_versions = {}
+        self._lock = threading.Lock()
+        self._versions = VersionPoller([config["view"] for config in LAYERS.values()], version_ttl, self._on_version_change)
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _disk_cache(self, layer):
+        disk = self._disk.get(layer)
+        if disk is None:
+            with self._lock:
+                disk = self._disk.get(layer)
+                if disk is None:
+                    disk = MBTiles(
+                        os.path.join(self.cache_dir, f"{layer}.mbtiles"),
+                        metadata={"name": layer, "format": "pbf", "type": "overlay"},
+                    )
+                    self._disk_versions[layer] = disk.get_metadata().get("data_version")
+                    self._disk[layer] = disk
+        return disk
+
+    def _sync_disk_version(self, layer, disk, version):
+        # A file left behind by an older process may hold tiles from a previous version
+        if self._disk_versions.get(layer) != str(version):
+            with self._lock:
+                if self._disk_versions.get(layer) != str(version):
+                    disk.clear()
+                    disk.set_metadata({"data_version": version})
+                    self._disk_versions[layer] = str(version)
+
+    def layer_version(self, layer):
+        """Returns the current data version of a layer, refreshing the versions at most every version_ttl."""
+        return self._versions.current().get(LAYERS[layer]["view"], 0)
+
+    def _on_version_change(self, previous, latest):
+        if previous is None:
+            return
+        with self._lock:
+            for name, config in LAYERS.items():
+                view = config["view"]
+                if previous.get(view) != latest.get(view):
+                    self._invalidate_locked(name)
+
+    def _invalidate_locked(self, layer):
+        print(f"Tile layer '{layer}' changed; invalidating cached tiles")
+        self.memory.drop_layer(layer)
+        disk = self._disk.get(layer)
+        if disk is not None:
+            disk.clear()
+            self._disk_versions[layer] = None
+
+    def invalidate(self, layer):
+        with self._lock:
+            self._invalidate_locked(layer)
+
+    @staticmethod
+    def make_etag(layer, version, data):
+        return '"' + hashlib.sha1(f"{layer}:{version}:".encode() + data).hexdigest() + '"'
+
+    def get_or_render(self, layer, z, x, y, render):
+        """
+        Returns {"data", "etag", "version"} for a tile, calling render(layer, z, x, y)
+        only on a miss in both levels. Rendered tiles are written through to both levels.
+        """
+        version = self.layer_version(layer)
+        key = (layer, z, x, y)
+
+        entry = self.memory.get(key)
+        if entry is not None and entry["version"] == version:
+            self.stats["memory_hits"] += 1
+            return entry
+
+        disk = self._disk_cache(layer)
+        self._sync_disk_version(layer, disk, version)
+        data = disk.get_tile(z, x, y)
+        if data is not None:
+            self.stats["disk_hits"] += 1
+        else:
+            self.stats["misses"] += 1
+            data = render(layer, z, x, y)
+            disk.put_tile(z, x, y, data)
+
+        entry = {"data": data, "etag": self.make_etag(layer, version, data), "version": version}
+        self.memory.put(key, entry)
+        return entry
@@ -0,0 +1,105 @@
+import gzip
+import os
+
+from flask import Blueprint, Response, jsonify, request
+
+from dss.database import get_db_connection
+from tiles.layers import LAYERS, is_valid_tile, render_mvt
+from tiles.mbtiles import MBTiles
+from tiles.tile_cache import TileCache
+
+tiles_bp = Blueprint("tiles", __name__)
+
+TILE_CACHE_DIR = os.getenv("TILE_CACHE_DIR", "tile_cache")
+TILE_MEMORY_CACHE_MB = int(os.getenv("TILE_MEMORY_CACHE_MB", "256"))
+TILE_MAX_AGE = int(os.getenv("TILE_MAX_AGE", "300"))
+# MBTiles file produced by tiles/seed_tiles.py; served without touching PostgreSQL
+BASE_TILES_MBTILES = os.getenv("BASE_TILES_MBTILES")
+BASE_TILES_MAX_AGE = int(os.getenv("BASE_TILES_MAX_AGE", "86400"))
+
+tile_cache = TileCache(TILE_CACHE_DIR, max_memory_bytes=TILE_MEMORY_CACHE_MB * 1024 * 1024)
+base_tiles = MBTiles(BASE_TILES_MBTILES) if BASE_TILES_MBTILES and os.path.exists(BASE_TILES_MBTILES) else None
+
+
+def render_tile(layer, z, x, y):
+    """Renders one MVT tile from PostGIS and returns it gzip-compressed."""
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        tile = render_mvt(cur, layer, z, x, y)
+        cur.close()
+        return gzip.compress(tile, compresslevel=6)
+    finally:
+        if conn:
+            conn.close()
+
+
+@tiles_bp.route('/tiles/<layer>/<int:z>/<int:x>/<int:y>.pbf', methods=['GET'])
+def get_tile(layer, z, x, y):
+    """
+    Serves a Mapbox Vector Tile for one of the FRA Atlas layers.
+    Tiles come from the two-level cache and are only rendered from PostGIS on a miss.
+    Supports conditional requests via ETag / If-None-Match.
+    """
+    if layer not in LAYERS:
+        return jsonify({"error": f"Unknown layer '{layer}'. Available layers: {sorted(LAYERS)}"}), 404
+    if not is_valid_tile(z, x, y):
+        return jsonify({"error": f"Invalid tile coordinates {z}/{x}/{y}"}), 400
+
+    try:
+        entry = tile_cache.get_or_render(layer, z, x, y, render_tile)
+    except Exception as e:
+        print(f"Error rendering tile {layer}/{z}/{x}/{y}: {e}")
+        return jsonify({"error": "Failed to render tile"}), 500
+
+    headers = {
+        "ETag": entry["etag"],
+        "Cache-Control": f"public, max-age={TILE_MAX_AGE}",
+        "Access-Control-Allow-Origin": "*",
+    }
+    # if_none_match holds unquoted tags while the cached ETag is quoted
+    if request.if_none_match.contains(entry["etag"].strip('"')):
+        return Response(status=304, headers=headers)
+
+    headers["Content-Encoding"] = "gzip"
+    return Response(entry["data"], status=200, mimetype="application/vnd.mapbox-vector-tile", headers=headers)
+
+
+@tiles_bp.route('/tiles/base/<int:z>/<int:x>/<int:y>.pbf', methods=['GET'])
+def get_base_tile(z, x, y):
+    """Serves pre-seeded boundary tiles (states, districts, villages) straight from the MBTiles file."""
+    if base_tiles is None:
+        return jsonify({"error": "No pre-seeded base tiles configured. Set BASE_TILES_MBTILES."}), 404
+    if not is_valid_tile(z, x, y):
+        return jsonify({"error": f"Invalid tile coordinates {z}/{x}/{y}"}), 400
+
+    headers = {"Cache-Control": f"public, max-age={BASE_TILES_MAX_AGE}", "Access-Control-Allow-Origin": "*"}
+    data = base_tiles.get_tile(z, x, y)
+    if data is None:
+        # Empty tiles are not stored by the seeder
+        return Response(status=204, headers=headers)
+    headers["Content-Encoding"] = "gzip"
+    return Response(data, status=200, mimetype="application/vnd.mapbox-vector-tile", headers=headers)
+
+
+@tiles_bp.route('/tiles/layers', methods=['GET'])
+def list_layers():
+    """Lists the available tile layers with their URL templates and current data versions."""
+    layers = []
+    for name, config in LAYERS.items():
+        layers.append({
+            "name": name,
+            "attributes": [config["id_column"]] + config["attributes"],
+            "url": f"{request.host_url.rstrip('/')}/tiles/{name}/{{z}}/{{x}}/{{y}}.pbf",
+            "version": tile_cache.layer_version(name),
+        })
+    return jsonify({"layers": layers}), 200
+
+
+@tiles_bp.route('/tiles/stats', methods=['GET'])
+def cache_stats():
+    """Reports tile cache hit counters and memory usage."""
+    stats = dict(tile_cache.stats)
+    stats["memory_bytes"] = tile_cache.memory.current_bytes
+    return jsonify(stats), 200